@@ -0,0 +1,309 @@
+import functools
+import math
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, jsonify, request
+
+from api.helpers.model_settings import model_setting
+
+# Weight of the newest sample in the moving average of upstream call durations
+SERVICE_TIME_ALPHA = 0.2
+
+# Scheduling classes, most urgent first
+PRIORITIES = ('interactive', 'standard', 'batch')
+
+PRIORITY_HEADER = 'X-Priority'
+
+DEFAULT_PRIORITY_WEIGHTS = {'interactive': 8, 'standard': 4, 'batch': 1}
+
+
+class AdmissionRejected(Exception):
+    """A model is at capacity: its wait queue is full or the wait timed out"""
+
+    def __init__(self, model, reason, retry_after):
+        super().__init__(f'Model {model} is busy ({reason}); retry in {retry_after}s')
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def rejection_response(error):
+    """429 with ``Retry-After`` for an ``AdmissionRejected``"""
+    return jsonify({
+        'success': False,
+        'error': 'Model busy',
+        'message': str(error),
+        'model': error.model,
+        'retry_after': error.retry_after
+    }), 429, {'Retry-After': str(error.retry_after)}
+
+
+def prioritized(default):
+    """Route decorator: the scheduling class upstream calls made by this view get.
+
+    A request may lower its class with the ``X-Priority`` header, never raise it.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            g.admission_priority = default
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_priority():
+    """Scheduling class for an upstream call made now.
+
+    Inside a request: the route's ``@prioritized`` default (else
+    ``standard``), or a less urgent class named by the ``X-Priority`` header.
+    The header can't raise the class, so clients can't jump ahead of chat
+    turns. Outside a request (background jobs): ``batch``.
+    """
+    if not has_request_context():
+        return 'batch'
+    default = g.get('admission_priority', 'standard')
+    requested = request.headers.get(PRIORITY_HEADER, '').strip().lower()
+    if requested in PRIORITIES and PRIORITIES.index(requested) > PRIORITIES.index(default):
+        return requested
+    return default
+
+
+class _Waiter:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class _ClassState:
+    def __init__(self):
+        self.active = 0
+        self.waiters = deque()
+        self.credit = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.waited = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class _ModelState:
+    def __init__(self, limit, max_queue, reserved):
+        self.limit = limit
+        self.max_queue = max_queue
+        # Slots batch work can never take, so interactive and standard calls always find room
+        self.batch_limit = max(1, limit - reserved)
+        self.active = 0
+        self.classes = {name: _ClassState() for name in PRIORITIES}
+        self.service_time = None
+
+    def class_limit(self, name):
+        return self.batch_limit if name == 'batch' else self.limit
+
+
+class Ticket:
+    """A held upstream slot; release it (or leave the ``with`` block) when the call is done"""
+
+    def __init__(self, controller, state, model, priority):
+        self._controller = controller
+        self._state = state
+        self.model = model
+        self.priority = priority
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            if self._state is not None:
+                self._controller._release(self._state, self.priority, time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class AdmissionController:
+    """Per-model concurrency limit with bounded, prioritized wait queues.
+
+    At most ADMISSION_MAX_CONCURRENCY requests (or the model's entry in
+    ADMISSION_MODEL_LIMITS) are in flight to one Foundry model from this
+    process. Models that share hardware can be put in one pool with
+    ADMISSION_MODEL_POOLS; a pool's limit is looked up by its name.
+
+    Each call has a class: ``interactive``, ``standard`` or ``batch``. Per
+    class up to ADMISSION_MAX_QUEUE calls wait for a slot, each for at most
+    ADMISSION_QUEUE_TIMEOUT seconds; anything beyond that is rejected at once
+    with ``AdmissionRejected``, whose ``retry_after`` is estimated from the
+    queue ahead and the model's recent call durations. A released slot goes
+    to the head of one class's queue, chosen by smooth weighted round robin
+    over ADMISSION_PRIORITY_WEIGHTS so urgent work goes first without
+    starving the rest. Batch calls never hold more than the limit minus
+    ADMISSION_RESERVED_SLOTS (but at least one) slots at once.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._enabled = True
+        self._default_limit = 2
+        self._limits = {}
+        self._pools = {}
+        self._max_queue = 16
+        self._queue_timeout = 30
+        self._weights = dict(DEFAULT_PRIORITY_WEIGHTS)
+        self._reserved = 1
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ADMISSION_ENABLED', True)
+        app.config.setdefault('ADMISSION_MAX_CONCURRENCY', 2)
+        app.config.setdefault('ADMISSION_MODEL_LIMITS', {})
+        app.config.setdefault('ADMISSION_MODEL_POOLS', {})
+        app.config.setdefault('ADMISSION_MAX_QUEUE', 16)
+        app.config.setdefault('ADMISSION_QUEUE_TIMEOUT', 30)
+        app.config.setdefault('ADMISSION_PRIORITY_WEIGHTS', {})
+        app.config.setdefault('ADMISSION_RESERVED_SLOTS', 1)
+        self._enabled = bool(app.config['ADMISSION_ENABLED'])
+        self._default_limit = int(app.config['ADMISSION_MAX_CONCURRENCY'])
+        self._limits = dict(app.config['ADMISSION_MODEL_LIMITS'])
+        self._pools = dict(app.config['ADMISSION_MODEL_POOLS'])
+        self._max_queue = int(app.config['ADMISSION_MAX_QUEUE'])
+        self._queue_timeout = float(app.config['ADMISSION_QUEUE_TIMEOUT'])
+        self._weights = dict(DEFAULT_PRIORITY_WEIGHTS)
+        self._weights.update({
+            name: max(1, int(weight))
+            for name, weight in app.config['ADMISSION_PRIORITY_WEIGHTS'].items() if name in PRIORITIES
+        })
+        self._reserved = max(0, int(app.config['ADMISSION_RESERVED_SLOTS']))
+        app.extensions['admission'] = self
+
+    def _state(self, key):
+        # Caller holds the lock
+        state = self._models.get(key)
+        if state is None:
+            limit = max(1, int(model_setting(self._limits, key, self._default_limit)))
+            state = self._models[key] = _ModelState(limit, self._max_queue, self._reserved)
+        return state
+
+    def _retry_after(self, state, priority):
+        # Caller holds the lock; roughly how long until the queues at or above this class have drained
+        ahead = sum(len(state.classes[name].waiters) for name in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        service_time = state.service_time or 1.0
+        return max(1, math.ceil(service_time * (ahead + 1) / state.class_limit(priority)))
+
+    def acquire(self, model, priority=None):
+        """Wait for an upstream slot for ``model``; raises ``AdmissionRejected`` when none comes.
+
+        ``priority`` defaults to ``current_priority()``.
+        """
+        priority = priority if priority in PRIORITIES else current_priority()
+        if not self._enabled:
+            return Ticket(self, None, model, priority)
+        model = model or 'default'
+        started = time.monotonic()
+        with self._lock:
+            state = self._state(model_setting(self._pools, model, model))
+            cls = state.classes[priority]
+            # Free slots only sit unused while the waiters left are batch calls at their cap
+            ahead = any(state.classes[name].waiters for name in PRIORITIES[:PRIORITIES.index(priority) + 1])
+            if state.active < state.limit and cls.active < state.class_limit(priority) and not ahead:
+                self._grant(state, priority)
+                return Ticket(self, state, model, priority)
+            if len(cls.waiters) >= state.max_queue:
+                cls.rejected += 1
+                raise AdmissionRejected(model, 'queue full', self._retry_after(state, priority))
+            waiter = _Waiter()
+            cls.waiters.append(waiter)
+            cls.queued += 1
+
+        waiter.event.wait(self._queue_timeout)
+        with self._lock:
+            if not waiter.granted:
+                cls.waiters.remove(waiter)
+                cls.timed_out += 1
+                raise AdmissionRejected(model, 'queue timeout', self._retry_after(state, priority))
+            waited = time.monotonic() - started
+            cls.waited += 1
+            cls.wait_total += waited
+            cls.wait_max = max(cls.wait_max, waited)
+        return Ticket(self, state, model, priority)
+
+    def _grant(self, state, priority):
+        # Caller holds the lock
+        cls = state.classes[priority]
+        state.active += 1
+        cls.active += 1
+        cls.admitted += 1
+
+    def _release(self, state, priority, duration):
+        with self._lock:
+            if state.service_time is None:
+                state.service_time = duration
+            else:
+                state.service_time += SERVICE_TIME_ALPHA * (duration - state.service_time)
+            state.active -= 1
+            state.classes[priority].active -= 1
+            while state.active < state.limit:
+                eligible = [
+                    name for name in PRIORITIES
+                    if state.classes[name].waiters and state.classes[name].active < state.class_limit(name)
+                ]
+                if not eligible:
+                    break
+                # Smooth weighted round robin: each turn every candidate earns its weight,
+                # the richest wins and pays back the total
+                for name in eligible:
+                    state.classes[name].credit += self._weights[name]
+                chosen = max(eligible, key=lambda name: state.classes[name].credit)
+                state.classes[chosen].credit -= sum(self._weights[name] for name in eligible)
+                waiter = state.classes[chosen].waiters.popleft()
+                self._grant(state, chosen)
+                waiter.granted = True
+                waiter.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self._enabled,
+                'max_queue': self._max_queue,
+                'queue_timeout': self._queue_timeout,
+                'priority_weights': dict(self._weights),
+                'reserved_slots': self._reserved,
+                'models': {
+                    key: {
+                        'limit': state.limit,
+                        'batch_limit': state.batch_limit,
+                        'active': state.active,
+                        'queue_depth': sum(len(cls.waiters) for cls in state.classes.values()),
+                        'avg_service_ms': round(state.service_time * 1000, 1) if state.service_time else None,
+                        'classes': {
+                            name: {
+                                'active': cls.active,
+                                'queue_depth': len(cls.waiters),
+                                'admitted': cls.admitted,
+                                'queued': cls.queued,
+                                'rejected': cls.rejected,
+                                'timed_out': cls.timed_out,
+                                'avg_wait_ms': round(cls.wait_total / cls.waited * 1000, 1) if cls.waited else 0.0,
+                                'max_wait_ms': round(cls.wait_max * 1000, 1)
+                            }
+                            for name, cls in state.classes.items()
+                        }
+                    }
+                    for key, state in self._models.items()
+                }
+            }
+
+
+admission = AdmissionController()
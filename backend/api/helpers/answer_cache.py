@@ -0,0 +1,169 @@
+import threading
+import time
+
+import numpy as np
+
+from api.helpers.vector_search import as_matrix, normalize_rows
+
+
+class _Scope:
+    """Cached answers for one (chat model, embedding model, top_k, file set, corpus version):
+    question embeddings as one normalized float32 matrix plus the stored responses row by row"""
+
+    def __init__(self, dim):
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        self.questions = []
+        self.responses = []
+        self.expires = []
+        self.last_used = []
+
+    def remove(self, position):
+        self.matrix = np.delete(self.matrix, position, axis=0)
+        for column in (self.questions, self.responses, self.expires, self.last_used):
+            del column[position]
+
+
+class SemanticAnswerCache:
+    """Reuses ``/rag/query`` answers for questions that mean the same thing.
+
+    Answers are grouped by scope: chat model, embedding model, ``top_k``,
+    the queried file set (``None`` for all files) and the version of those
+    files in the database, so a file processed by any worker moves queries
+    over it to a fresh scope. A lookup is one
+    matrix-vector product of the question embedding, which the route has
+    already computed, against the scope's cached questions. The best match
+    is reused when its cosine similarity is at least
+    RAG_ANSWER_CACHE_THRESHOLD and it is younger than RAG_ANSWER_CACHE_TTL.
+    The least recently used answers are evicted beyond
+    RAG_ANSWER_CACHE_MAX_ENTRIES. Storing into a new version drops the
+    scope's older versions, and ``invalidate_file`` drops every scope that
+    could have drawn on a file.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._scopes = {}
+        self._entries = 0
+        self._enabled = True
+        self._threshold = 0.95
+        self._ttl = 86400
+        self._max_entries = 2000
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RAG_ANSWER_CACHE_ENABLED', True)
+        app.config.setdefault('RAG_ANSWER_CACHE_THRESHOLD', 0.95)
+        app.config.setdefault('RAG_ANSWER_CACHE_TTL', 86400)
+        app.config.setdefault('RAG_ANSWER_CACHE_MAX_ENTRIES', 2000)
+        self._enabled = bool(app.config['RAG_ANSWER_CACHE_ENABLED'])
+        self._threshold = float(app.config['RAG_ANSWER_CACHE_THRESHOLD'])
+        self._ttl = float(app.config['RAG_ANSWER_CACHE_TTL'])
+        self._max_entries = int(app.config['RAG_ANSWER_CACHE_MAX_ENTRIES'])
+        app.extensions['rag_answer_cache'] = self
+
+    @staticmethod
+    def scope_key(model, embedding_model, top_k, file_ids, version):
+        return model, embedding_model, int(top_k), tuple(sorted(set(file_ids))) if file_ids else None, version
+
+    def lookup(self, scope_key, embedding):
+        """``(response, similarity, question)`` of the closest cached answer, or ``None``"""
+        if not self._enabled:
+            return None
+        query = normalize_rows(as_matrix(embedding))[0]
+        now = time.monotonic()
+        with self._lock:
+            scope = self._scopes.get(scope_key)
+            if scope is None or not scope.questions or scope.matrix.shape[1] != query.shape[0]:
+                self._misses += 1
+                return None
+            similarities = scope.matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self._threshold:
+                self._misses += 1
+                return None
+            if scope.expires[best] <= now:
+                scope.remove(best)
+                self._entries -= 1
+                self._misses += 1
+                return None
+            scope.last_used[best] = now
+            self._hits += 1
+            return scope.responses[best], similarity, scope.questions[best]
+
+    def put(self, scope_key, embedding, question, response):
+        if not self._enabled:
+            return
+        row = normalize_rows(as_matrix(embedding)).astype(np.float32, copy=False)
+        now = time.monotonic()
+        with self._lock:
+            scope = self._scopes.get(scope_key)
+            if scope is None or scope.matrix.shape[1] != row.shape[1]:
+                if scope is not None:
+                    self._entries -= len(scope.questions)
+                # Answers over an older version of the same files can't be served any more
+                for key in [key for key in self._scopes if key[:4] == scope_key[:4] and key != scope_key]:
+                    self._entries -= len(self._scopes.pop(key).questions)
+                    self._invalidations += 1
+                scope = self._scopes[scope_key] = _Scope(row.shape[1])
+            if question in scope.questions:
+                # A refreshed answer (e.g. after a bypassed lookup) replaces the old one
+                scope.remove(scope.questions.index(question))
+                self._entries -= 1
+            scope.matrix = np.vstack([scope.matrix, row])
+            scope.questions.append(question)
+            scope.responses.append(response)
+            scope.expires.append(now + self._ttl)
+            scope.last_used.append(now)
+            self._entries += 1
+            while self._entries > self._max_entries:
+                self._evict_one()
+
+    def _evict_one(self):
+        # Caller holds the lock; the cache is small enough that a linear scan is fine
+        key, position = min(
+            ((key, int(np.argmin(scope.last_used))) for key, scope in self._scopes.items() if scope.questions),
+            key=lambda item: self._scopes[item[0]].last_used[item[1]]
+        )
+        scope = self._scopes[key]
+        scope.remove(position)
+        if not scope.questions:
+            del self._scopes[key]
+        self._entries -= 1
+        self._evictions += 1
+
+    def invalidate_file(self, file_id):
+        """Forget answers that were (or could have been) drawn from ``file_id``"""
+        with self._lock:
+            for key in [key for key in self._scopes if key[3] is None or file_id in key[3]]:
+                self._entries -= len(self._scopes.pop(key).questions)
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            self._entries = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self._enabled,
+                'threshold': self._threshold,
+                'scopes': len(self._scopes),
+                'entries': self._entries,
+                'max_entries': self._max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidated_scopes': self._invalidations,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else None
+            }
+
+
+answer_cache = SemanticAnswerCache()
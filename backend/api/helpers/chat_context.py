@@ -0,0 +1,96 @@
+from flask import current_app
+
+from models import db, Message
+from models.message.message import estimate_tokens
+from api.helpers.model_settings import model_setting
+from api.helpers.pagination import after_position, encode_cursor, keyset_page
+
+# Role markers and separators a chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# History is read newest-first in pages of this size until the budget is spent
+FETCH_BATCH = 16
+
+SUMMARY_HEADER = 'Summary of the earlier conversation:\n'
+
+
+def context_window(model):
+    """Context length of ``model`` in tokens from MODEL_CONTEXT_WINDOWS, else CHAT_CONTEXT_WINDOW"""
+    return model_setting(
+        current_app.config['MODEL_CONTEXT_WINDOWS'], model, current_app.config['CHAT_CONTEXT_WINDOW']
+    )
+
+
+def message_tokens(message):
+    """Prompt tokens a stored message costs, using its cached count when it has one"""
+    count = message.token_count if message.token_count is not None else estimate_tokens(message.content)
+    return count + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_message(conversation):
+    """The conversation's rolling summary as a system message, or ``None``"""
+    if not conversation.summary:
+        return None
+    return {'role': 'system', 'content': SUMMARY_HEADER + conversation.summary}
+
+
+def unsummarized_messages(conversation, *columns):
+    """Query for the conversation's messages newer than its summary watermark"""
+    query = db.session.query(*columns).filter(Message.conversation_id == conversation.id)
+    if conversation.summarized_until is not None:
+        watermark = encode_cursor(conversation.summarized_until, conversation.summarized_until_id)
+        query = query.filter(after_position(Message.created_at, Message.id, watermark, descending=False))
+    return query
+
+
+def build_context(conversation, model, max_tokens):
+    """The conversation's summary plus the newest messages that fit the model's prompt budget.
+
+    The budget is the model's context window minus the ``max_tokens``
+    reserved for the reply. Messages already folded into the rolling summary
+    are represented by it; of the rest, messages are taken newest first
+    until the next one would overflow the budget or ``CHAT_HISTORY_MESSAGES``
+    are selected. The latest message is always kept. Returns ``(history,
+    context)`` where ``history`` is in chronological order and ``context``
+    reports the ``messages``, ``tokens`` and ``budget`` used, whether a
+    ``summary`` was included and whether the history ``overflowed``.
+    """
+    budget = context_window(model) - int(max_tokens or 0)
+    limit = current_app.config['CHAT_HISTORY_MESSAGES']
+    summary = summary_message(conversation)
+    used = 0
+    if summary is not None:
+        summary_tokens = conversation.summary_token_count
+        if summary_tokens is None:
+            summary_tokens = estimate_tokens(conversation.summary)
+        used = summary_tokens + estimate_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD_TOKENS
+    query = unsummarized_messages(
+        conversation, Message.id, Message.role, Message.content, Message.token_count, Message.created_at
+    )
+
+    selected, cursor, full = [], None, False
+    while not full and len(selected) < limit:
+        rows, cursor = keyset_page(
+            query, Message.created_at, Message.id,
+            min(FETCH_BATCH, limit - len(selected)), cursor=cursor, descending=True
+        )
+        for row in rows:
+            cost = message_tokens(row)
+            if selected and used + cost > budget:
+                full = True
+                break
+            selected.append(row)
+            used += cost
+        if cursor is None:
+            break
+
+    history = [{'role': row.role, 'content': row.content} for row in reversed(selected)]
+    if summary is not None:
+        history.insert(0, summary)
+    return history, {
+        'messages': len(selected),
+        'tokens': used,
+        'budget': budget,
+        'summary': summary is not None,
+        'overflowed': full or cursor is not None
+    }
@@ -0,0 +1,197 @@
+from flask import current_app
+
+from models import db, Conversation, Message, ProcessingJob
+from models.message.message import BYTES_PER_TOKEN, estimate_tokens
+from api.helpers.admission import admission
+from api.helpers.chat_context import FETCH_BATCH, context_window, message_tokens, unsummarized_messages
+from api.helpers.foundry_client import foundry
+from api.helpers.job_queue import ACTIVE_STATUSES, PermanentJobError, job_queue
+from api.helpers.pagination import keyset_page
+
+SUMMARY_PROMPT = (
+    'You keep a running summary of a conversation between a user and an assistant. '
+    'Merge the new messages into the current summary and reply with the updated summary only. '
+    'Keep facts, names, numbers, decisions, code identifiers, the user\'s preferences and open questions; '
+    'drop greetings and repetition. Write compact plain prose.'
+)
+
+# Room left in the summarizer's own prompt for its instructions and the current summary's framing
+PROMPT_OVERHEAD_TOKENS = 200
+
+MESSAGE_COLUMNS = (Message.id, Message.role, Message.content, Message.token_count, Message.created_at)
+
+
+def _update_conversation(conversation_id, values, *conditions):
+    """Write conversation columns without bumping ``updated_at`` (which orders the conversation list).
+
+    Extra ``conditions`` make the write conditional; returns whether a row was updated.
+    """
+    # Assigning the column to itself keeps onupdate=datetime.utcnow from firing
+    updated = db.session.query(Conversation).filter(Conversation.id == conversation_id, *conditions).update(
+        dict(values, updated_at=Conversation.updated_at), synchronize_session=False
+    )
+    db.session.commit()
+    return bool(updated)
+
+
+def schedule_summary(conversation, model, context):
+    """Queue a background summary refresh when a turn's history nears the budget.
+
+    ``context`` is what ``build_context`` reported for the turn. A refresh is
+    queued when the history overflowed or used more than
+    CHAT_SUMMARY_TRIGGER of the budget, unless one is already pending. Never
+    raises: a failure here must not fail the chat turn.
+    """
+    config = current_app.config
+    if not config['CHAT_SUMMARY_ENABLED']:
+        return None
+    if not context['overflowed'] and context['tokens'] < config['CHAT_SUMMARY_TRIGGER'] * context['budget']:
+        return None
+    try:
+        if conversation.summary_job_id:
+            job = db.session.get(ProcessingJob, conversation.summary_job_id)
+            if job is not None and job.status in ACTIVE_STATUSES:
+                return job
+        job = job_queue.enqueue('chat_summary', conversation.user_id, payload={
+            'conversation_id': conversation.id,
+            'model': model,
+            'budget': context['budget']
+        })
+        _update_conversation(conversation.id, {'summary_job_id': job.id})
+        return job
+    except Exception as e:
+        db.session.rollback()
+        print(f'Failed to schedule summary for conversation {conversation.id}: {e}')
+        return None
+
+
+def _clip(text, tokens):
+    limit = tokens * BYTES_PER_TOKEN
+    return text if len(text) <= limit else text[:limit] + ' [...]'
+
+
+def _summarize(model, summary, rows, message_limit):
+    transcript = '\n\n'.join(f'{row.role}: {_clip(row.content, message_limit)}' for row in rows)
+    payload = {
+        'model': model,
+        'messages': [
+            {'role': 'system', 'content': SUMMARY_PROMPT},
+            {'role': 'user', 'content': f'Current summary:\n{summary or "(none yet)"}\n\nNew messages:\n{transcript}'}
+        ],
+        'max_tokens': current_app.config['CHAT_SUMMARY_MAX_TOKENS'],
+        'temperature': 0.2
+    }
+    # Jobs run at batch priority, behind the model's chat turns; a rejection is retried like any failure
+    with admission.acquire(model):
+        response = foundry.post('/v1/chat/completions', json=payload)
+    if 400 <= response.status_code < 500:
+        raise PermanentJobError(f'Foundry summary failed: {response.status_code} {response.text[:500]}')
+    if response.status_code != 200:
+        raise RuntimeError(f'Foundry summary failed: {response.status_code} {response.text[:500]}')
+    text = (response.json().get('choices') or [{}])[0].get('message', {}).get('content', '').strip()
+    if not text:
+        raise RuntimeError('Foundry returned an empty summary')
+    return text
+
+
+def _summary_cut(query, keep_tokens, keep_messages, trigger_tokens, max_messages):
+    """The newest message to fold into the summary, or ``None`` if no refresh is needed.
+
+    Everything newer than the cut (up to ``keep_tokens`` / ``keep_messages``,
+    at least one message) stays verbatim. The history is re-checked against
+    the trigger here because the turn that queued the job may have seen it
+    before an earlier refresh finished.
+    """
+    cut, kept, total_tokens, total, cursor = None, 0, 0, 0, None
+    while True:
+        rows, cursor = keyset_page(query, Message.created_at, Message.id, FETCH_BATCH, cursor=cursor, descending=True)
+        for row in rows:
+            cost = message_tokens(row)
+            if cut is None:
+                if kept and (kept >= keep_messages or total_tokens + cost > keep_tokens):
+                    cut = row
+                else:
+                    kept += 1
+            total_tokens += cost
+            total += 1
+            if cut is not None and (total_tokens >= trigger_tokens or total > max_messages):
+                return cut
+        if cursor is None:
+            return None
+
+
+def _run_summary_job(job):
+    """Job handler: fold the messages that no longer fit the context into the conversation's summary.
+
+    Only messages newer than the current watermark are read. They are sent
+    to the model in batches that fit its window, and the summary and
+    watermark are committed after each batch so an interrupted refresh
+    resumes where it stopped.
+    """
+    payload = job.payload or {}
+    conversation = db.session.get(Conversation, payload.get('conversation_id'))
+    if conversation is None:
+        return {'summarized_messages': 0}
+
+    config = current_app.config
+    model = config['CHAT_SUMMARY_MODEL'] or payload.get('model') or conversation.model_used
+    budget = int(payload.get('budget') or context_window(model))
+    query = unsummarized_messages(conversation, *MESSAGE_COLUMNS)
+    cut = _summary_cut(
+        query,
+        keep_tokens=budget * config['CHAT_SUMMARY_KEEP'],
+        keep_messages=max(1, config['CHAT_HISTORY_MESSAGES'] // 2),
+        trigger_tokens=budget * config['CHAT_SUMMARY_TRIGGER'],
+        max_messages=config['CHAT_HISTORY_MESSAGES']
+    )
+    if cut is None:
+        return {'summarized_messages': 0}
+
+    summary = conversation.summary
+    watermark_id = conversation.summarized_until_id
+    input_budget = context_window(model) - 2 * config['CHAT_SUMMARY_MAX_TOKENS'] - PROMPT_OVERHEAD_TOKENS
+    if input_budget <= 0:
+        raise PermanentJobError(f'Context window of {model} is too small to summarize into')
+
+    def fold(batch):
+        nonlocal summary, watermark_id
+        summary = _summarize(model, summary, batch, input_budget)
+        # Only move the watermark from where this job found it, so two refreshes can't fold the same messages
+        unchanged = (Conversation.summarized_until_id.is_(None) if watermark_id is None
+                     else Conversation.summarized_until_id == watermark_id)
+        if not _update_conversation(conversation.id, {
+            'summary': summary,
+            'summary_token_count': estimate_tokens(summary),
+            'summarized_until': batch[-1].created_at,
+            'summarized_until_id': batch[-1].id
+        }, unchanged):
+            return False
+        watermark_id = batch[-1].id
+        return True
+
+    batch, batch_tokens, summarized, cursor = [], 0, 0, None
+    while True:
+        rows, cursor = keyset_page(query, Message.created_at, Message.id, FETCH_BATCH, cursor=cursor, descending=False)
+        for row in rows:
+            cost = min(message_tokens(row), input_budget)
+            if batch and batch_tokens + cost > input_budget:
+                if not fold(batch):
+                    return {'summarized_messages': summarized, 'superseded': True}
+                summarized += len(batch)
+                batch, batch_tokens = [], 0
+            batch.append(row)
+            batch_tokens += cost
+            if row.id == cut.id:
+                cursor = None
+                break
+        if cursor is None:
+            break
+
+    if batch:
+        if not fold(batch):
+            return {'summarized_messages': summarized, 'superseded': True}
+        summarized += len(batch)
+    return {'summarized_messages': summarized, 'summary_tokens': estimate_tokens(summary)}
+
+
+job_queue.register('chat_summary', _run_summary_job)
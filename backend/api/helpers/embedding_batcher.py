@@ -0,0 +1,150 @@
+import threading
+
+
+class _Batch:
+    def __init__(self):
+        self.texts = []
+        self.closed = False
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.vectors = None
+        self.usage = None
+        self.error = None
+
+
+def _share_usage(usage, count, total):
+    """The caller's proportional slice of a batched request's token usage"""
+    share = {}
+    for key, value in (usage or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            share[key] = round(value * count / total) if isinstance(value, int) else value * count / total
+    return share
+
+
+def _add_usage(total, usage):
+    for key, value in (usage or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into one upstream call per model.
+
+    The first caller to arrive for a key (``embed_texts`` uses model, path
+    and priority) opens a batch and becomes its leader: it waits up to
+    EMBEDDING_BATCH_DELAY_MS (or until EMBEDDING_BATCH_MAX_SIZE inputs have
+    joined), sends the batch and hands every caller its own slice. Callers
+    that join an open batch just wait for the leader. A batch that ends up
+    larger than EMBEDDING_BATCH_MAX_SIZE (one caller brought many texts) is
+    sent as several requests of at most that size, and a caller that fills a
+    batch by itself doesn't wait at all. A delay of 0 disables batching.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._open = {}
+        self._delay = 0.005
+        self._max_size = 64
+        self._batches = 0
+        self._requests = 0
+        self._items = 0
+        self._largest = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EMBEDDING_BATCH_DELAY_MS', 5)
+        app.config.setdefault('EMBEDDING_BATCH_MAX_SIZE', 64)
+        self._delay = max(0.0, float(app.config['EMBEDDING_BATCH_DELAY_MS']) / 1000)
+        self._max_size = max(1, int(app.config['EMBEDDING_BATCH_MAX_SIZE']))
+        app.extensions['embedding_batcher'] = self
+
+    def submit(self, key, texts, send):
+        """Embed ``texts`` as part of the open batch for ``key``.
+
+        ``send(texts)`` performs the upstream call and returns
+        ``(vectors, usage)``. Returns this caller's vectors and its share of
+        the usage; upstream errors are re-raised in every caller of the batch.
+        """
+        if not texts:
+            return [], {}
+        if not self._delay:
+            return self._send(texts, send)
+
+        with self._lock:
+            self._requests += 1
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            offset = len(batch.texts)
+            batch.texts.extend(texts)
+            if len(batch.texts) >= self._max_size:
+                self._close(key, batch)
+                batch.full.set()
+
+        if leader:
+            # Already full when a lone caller brought max_size texts: send right away
+            batch.full.wait(self._delay)
+            with self._lock:
+                self._close(key, batch)
+            self._flush(batch, send)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return (
+            batch.vectors[offset:offset + len(texts)],
+            _share_usage(batch.usage, len(texts), len(batch.texts))
+        )
+
+    def _close(self, key, batch):
+        # Caller holds the lock
+        if not batch.closed:
+            batch.closed = True
+            if self._open.get(key) is batch:
+                del self._open[key]
+            self._batches += 1
+            self._items += len(batch.texts)
+            self._largest = max(self._largest, len(batch.texts))
+
+    def _flush(self, batch, send):
+        try:
+            # Callers in one batch often ask for the same text; send each once
+            unique = list(dict.fromkeys(batch.texts))
+            vectors, batch.usage = self._send(unique, send)
+            by_text = dict(zip(unique, vectors))
+            batch.vectors = [by_text[text] for text in batch.texts]
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def _send(self, texts, send):
+        """``send`` in requests of at most EMBEDDING_BATCH_MAX_SIZE texts, usage summed over them"""
+        if len(texts) <= self._max_size:
+            return send(texts)
+        vectors, usage = [], {}
+        for start in range(0, len(texts), self._max_size):
+            part_vectors, part_usage = send(texts[start:start + self._max_size])
+            vectors.extend(part_vectors)
+            _add_usage(usage, part_usage)
+        return vectors, usage
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': bool(self._delay),
+                'delay_ms': self._delay * 1000,
+                'max_batch_size': self._max_size,
+                'requests': self._requests,
+                'batches': self._batches,
+                'items': self._items,
+                'largest_batch': self._largest,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else None
+            }
+
+
+embedding_batcher = EmbeddingBatcher()
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-entry bookkeeping cost (key, dict slot, ndarray header) on top of the vector bytes
+ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text):
+    """Unicode NFC plus collapsed whitespace; trivially different copies of a text share one entry"""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def cache_key(model, text):
+    return hashlib.sha256(f'{model}\0{normalize_text(text)}'.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed LRU cache of embedding vectors.
+
+    Entries are keyed by ``sha256(model, normalized text)`` and held as
+    float32 arrays until EMBEDDING_CACHE_MAX_BYTES is reached, after which the
+    least recently used entries are evicted. With EMBEDDING_CACHE_DIR set,
+    vectors are also written to disk and survive restarts.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._max_bytes = 64 * 1024 * 1024
+        self._directory = None
+        self._enabled = True
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EMBEDDING_CACHE_ENABLED', True)
+        app.config.setdefault('EMBEDDING_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('EMBEDDING_CACHE_DIR', None)
+        self._enabled = bool(app.config['EMBEDDING_CACHE_ENABLED'])
+        self._max_bytes = int(app.config['EMBEDDING_CACHE_MAX_BYTES'])
+        self._directory = app.config['EMBEDDING_CACHE_DIR']
+        if self._directory:
+            os.makedirs(self._directory, exist_ok=True)
+        app.extensions['embedding_cache'] = self
+
+    def _disk_path(self, key):
+        return os.path.join(self._directory, key[:2], f'{key}.f32')
+
+    def _read_disk(self, key):
+        if not self._directory:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return np.frombuffer(f.read(), dtype='<f4')
+        except OSError:
+            return None
+
+    def _write_disk(self, key, vector):
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(vector.astype('<f4').tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f'Failed to persist embedding cache entry: {e}')
+
+    def _store(self, key, vector):
+        # Caller holds the lock
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = vector
+        self._bytes += vector.nbytes + ENTRY_OVERHEAD
+        while self._bytes > self._max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + ENTRY_OVERHEAD
+            self._evictions += 1
+
+    def get_many(self, model, texts):
+        """Cached vectors for ``texts`` in order, ``None`` where there is no entry"""
+        if not self._enabled:
+            return [None] * len(texts)
+        keys = [cache_key(model, text) for text in texts]
+        results = []
+        disk_lookups = []
+        with self._lock:
+            for position, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                else:
+                    disk_lookups.append(position)
+                results.append(vector)
+
+        for position in disk_lookups:
+            vector = self._read_disk(keys[position])
+            with self._lock:
+                if vector is not None:
+                    self._disk_hits += 1
+                    self._store(keys[position], vector)
+                    results[position] = vector
+                else:
+                    self._misses += 1
+        return results
+
+    def put_many(self, model, texts, vectors):
+        if not self._enabled:
+            return
+        entries = []
+        for text, vector in zip(texts, vectors):
+            if vector is None:
+                continue
+            entries.append((cache_key(model, text), np.asarray(vector, dtype=np.float32)))
+        with self._lock:
+            for key, vector in entries:
+                self._store(key, vector)
+        if self._directory:
+            for key, vector in entries:
+                self._write_disk(key, vector)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                'enabled': self._enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self._max_bytes,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round((self._hits + self._disk_hits) / lookups, 4) if lookups else None,
+                'persistent': bool(self._directory)
+            }
+
+
+embedding_cache = EmbeddingCache()
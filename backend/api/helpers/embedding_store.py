@@ -0,0 +1,57 @@
+import numpy as np
+
+# Stored vectors are always little-endian so blobs are portable between machines
+DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2'),
+}
+
+
+def pack_embedding(vector, dtype='float32'):
+    """Pack a vector into ``(blob, dim, dtype)`` for the RAGDocument embedding columns"""
+    if vector is None:
+        return None, None, None
+    if dtype not in DTYPES:
+        raise ValueError(f'Unsupported embedding dtype: {dtype}')
+    array = np.asarray(vector, dtype=DTYPES[dtype]).ravel()
+    return array.tobytes(), int(array.shape[0]), dtype
+
+
+def unpack_embedding(blob, dim, dtype):
+    """Zero-copy view of a packed vector (read-only; copy before mutating)"""
+    array = np.frombuffer(blob, dtype=DTYPES[dtype])
+    if dim is not None and array.shape[0] != dim:
+        raise ValueError(f'Embedding blob holds {array.shape[0]} values, expected {dim}')
+    return array
+
+
+def document_embedding(blob, dim, dtype, legacy=None):
+    """Vector of one chunk from its packed columns, falling back to the legacy JSON column"""
+    if blob is not None:
+        return unpack_embedding(blob, dim, dtype)
+    if legacy:
+        return np.asarray(legacy, dtype=np.float32)
+    return None
+
+
+def stack_embeddings(rows):
+    """Decode ``(blob, dim, dtype, legacy_json)`` rows into one float32 matrix.
+
+    When every row is packed with the same dtype and dimension the blobs are
+    joined and decoded with a single ``frombuffer``; mixed or legacy rows are
+    decoded one at a time. Returns ``(matrix, kept)`` where ``kept`` are the
+    positions of rows that had an embedding.
+    """
+    kept = [i for i, (blob, _, _, legacy) in enumerate(rows) if blob is not None or legacy]
+    if not kept:
+        return np.empty((0, 0), dtype=np.float32), kept
+
+    packed = [rows[i] for i in kept]
+    formats = {(dim, dtype) for blob, dim, dtype, _ in packed if blob is not None}
+    if len(formats) == 1 and all(blob is not None for blob, _, _, _ in packed):
+        dim, dtype = formats.pop()
+        flat = np.frombuffer(b''.join(blob for blob, _, _, _ in packed), dtype=DTYPES[dtype])
+        return flat.reshape(len(packed), dim).astype(np.float32, copy=False), kept
+
+    vectors = [document_embedding(*row) for row in packed]
+    return np.vstack([np.asarray(v, dtype=np.float32) for v in vectors]), kept
@@ -0,0 +1,62 @@
+import numpy as np
+
+from api.helpers.admission import admission, current_priority
+from api.helpers.embedding_batcher import embedding_batcher
+from api.helpers.embedding_cache import cache_key, embedding_cache
+from api.helpers.foundry_client import foundry
+
+
+class EmbeddingError(Exception):
+    """Foundry rejected an embedding request; carries the upstream status and body"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _request_embeddings(model, texts, path, priority):
+    with admission.acquire(model, priority):
+        response = foundry.post(path, json={'model': model, 'input': texts})
+    if response.status_code != 200:
+        raise EmbeddingError(response.status_code, response.text)
+    result = response.json()
+    data = sorted(result.get('data', []), key=lambda item: item.get('index', 0))
+    vectors = [item.get('embedding') for item in data]
+    if len(vectors) != len(texts) or any(v is None for v in vectors):
+        raise EmbeddingError(502, f'Foundry returned {len(vectors)} embeddings for {len(texts)} inputs')
+    return vectors, result.get('usage', {})
+
+
+def embed_texts(model, texts, path='/v1/embeddings'):
+    """Embed ``texts`` with ``model``, serving repeats from the embedding cache.
+
+    Only cache misses are sent to Foundry, deduplicated, and coalesced with
+    concurrent callers of the same model into one batched request.
+    Returns ``(vectors, usage, cached)``: float32 arrays in input order, the
+    upstream usage share for the misses and the number of inputs served from cache.
+    Upstream calls go through admission control at the caller's priority,
+    so a query's embedding never waits in a batch opened by bulk ingest.
+    """
+    vectors = embedding_cache.get_many(model, texts)
+    cached = sum(1 for v in vectors if v is not None)
+
+    # Identical texts within one call are only embedded once
+    pending = {}
+    for position, vector in enumerate(vectors):
+        if vector is None:
+            pending.setdefault(cache_key(model, texts[position]), []).append(position)
+
+    usage = {}
+    if pending:
+        miss_texts = [texts[positions[0]] for positions in pending.values()]
+        priority = current_priority()
+        fresh, usage = embedding_batcher.submit(
+            (model, path, priority), miss_texts, lambda batch: _request_embeddings(model, batch, path, priority)
+        )
+        embedding_cache.put_many(model, miss_texts, fresh)
+        for positions, vector in zip(pending.values(), fresh):
+            array = np.asarray(vector, dtype=np.float32)
+            for position in positions:
+                vectors[position] = array
+    return vectors, usage, cached
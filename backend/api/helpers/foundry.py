@@ -1,10 +1,13 @@
-import requests
+from api.helpers.foundry_client import foundry
 
 
-def is_foundry_available(foundry_url, timeout=2):
+def is_foundry_available(foundry_url=None, timeout=2):
     try:
-        url = f"{foundry_url.rstrip('/')}/health"
-        resp = requests.get(url, timeout=timeout)
+        if foundry_url:
+            url = f"{foundry_url.rstrip('/')}/health"
+            resp = foundry.session.get(url, headers=foundry.headers(json_body=False), timeout=timeout)
+        else:
+            resp = foundry.get('/health', timeout=timeout)
         if resp.status_code == 200:
             return True, resp.json()
         return False, None
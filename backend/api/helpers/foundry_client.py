@@ -0,0 +1,165 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+
+
+# Upstream timeouts (seconds) keyed by Foundry path prefix. The longest matching
+# prefix wins; FOUNDRY_TIMEOUTS in the app config can override any entry.
+DEFAULT_TIMEOUTS = {
+    '/health': 2,
+    '/v1/chat/completions': 60,
+    '/chat/completions': 60,
+    '/v1/completions': 60,
+    '/v1/embeddings': 30,
+    '/embeddings': 30,
+    '/models': 10,
+    '/models/stop': 30,
+    '/rag/process': 120,
+    '/vision/analyze': 120,
+    '/vision/caption': 60,
+    '/audio/transcribe': 300,
+    '/train': 60,
+}
+DEFAULT_TIMEOUT = 30
+
+
+class FoundryClient:
+    """Process-wide HTTP client for Foundry Local.
+
+    Wraps a single ``requests.Session`` so every blueprint reuses keep-alive
+    connections instead of opening a new TCP connection per call. Configure it
+    like the other Flask extensions::
+
+        foundry.init_app(app)
+        response = foundry.post('/v1/chat/completions', json=payload)
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._errors = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FOUNDRY_BASE_URL', 'http://127.0.0.1:56831')
+        app.config.setdefault('FOUNDRY_API_KEY', '')
+        app.config.setdefault('FOUNDRY_POOL_CONNECTIONS', 4)
+        app.config.setdefault('FOUNDRY_POOL_MAXSIZE', 16)
+        app.config.setdefault('FOUNDRY_TIMEOUTS', {})
+        app.extensions['foundry_client'] = self
+
+    @property
+    def base_url(self):
+        return current_app.config.get('FOUNDRY_BASE_URL', 'http://127.0.0.1:56831').rstrip('/')
+
+    @property
+    def session(self):
+        # Sessions hold sockets, so never share one across a fork (gunicorn --preload)
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+        return self._session
+
+    def _build_session(self):
+        config = current_app.config
+        adapter = HTTPAdapter(
+            pool_connections=int(config.get('FOUNDRY_POOL_CONNECTIONS', 4)),
+            pool_maxsize=int(config.get('FOUNDRY_POOL_MAXSIZE', 16)),
+            pool_block=False
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def headers(self, json_body=True, extra=None):
+        """Build the standard Foundry request headers (auth + content type)"""
+        headers = {}
+        if json_body:
+            headers['Content-Type'] = 'application/json'
+        api_key = current_app.config.get('FOUNDRY_API_KEY')
+        if api_key:
+            headers['Authorization'] = f'Bearer {api_key}'
+        if extra:
+            headers.update(extra)
+        return headers
+
+    def timeout_for(self, path):
+        timeouts = dict(DEFAULT_TIMEOUTS)
+        timeouts.update(current_app.config.get('FOUNDRY_TIMEOUTS') or {})
+        matches = [prefix for prefix in timeouts if path.startswith(prefix)]
+        if not matches:
+            return DEFAULT_TIMEOUT
+        return timeouts[max(matches, key=len)]
+
+    def url(self, path):
+        return f'{self.base_url}/{path.lstrip("/")}'
+
+    def request(self, method, path, timeout=None, headers=None, **kwargs):
+        """Send a request to Foundry Local using the pooled session.
+
+        ``path`` is relative to FOUNDRY_BASE_URL. Raises the usual
+        ``requests.exceptions.RequestException`` subclasses on failure.
+        """
+        if timeout is None:
+            timeout = self.timeout_for(path)
+        request_headers = self.headers(json_body='json' in kwargs, extra=headers)
+        health = current_app.extensions.get('foundry_health')
+        try:
+            response = self.session.request(method, self.url(path), headers=request_headers,
+                                            timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectionError as e:
+            self._errors += 1
+            if health is not None:
+                health.mark_down(str(e))
+            raise
+        except requests.exceptions.RequestException:
+            self._errors += 1
+            raise
+        if health is not None:
+            health.mark_up()
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def stats(self):
+        """Connection pool counters: a hit is a request served on a reused connection"""
+        requests_total = 0
+        connections = 0
+        idle = 0
+        session = self._session
+        if session is not None and self._pid == os.getpid():
+            adapters = {id(a): a for a in session.adapters.values()}
+            for adapter in adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_total += pool.num_requests
+                    connections += pool.num_connections
+                    if pool.pool is not None:
+                        # The pool queue is pre-filled with None placeholders for unopened slots
+                        idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return {
+            'requests': requests_total,
+            'pool_hits': max(requests_total - connections, 0),
+            'pool_misses': connections,
+            'idle_connections': idle,
+            'errors': self._errors
+        }
+
+
+foundry = FoundryClient()
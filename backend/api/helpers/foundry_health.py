@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from api.helpers.foundry import is_foundry_available
+
+
+class FoundryHealthProber:
+    """Background Foundry Local reachability check with a cached result.
+
+    A daemon thread probes ``/health`` every FOUNDRY_HEALTH_INTERVAL seconds.
+    Request handlers read the cached status instead of paying a round trip,
+    and the Foundry client calls ``mark_down`` as soon as a real request
+    fails to connect, so the cache never lags behind an outage.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._available = None  # None until the first probe or upstream call
+        self._payload = None
+        self._checked_at = None
+        self._checked_monotonic = None
+        self._last_error = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FOUNDRY_HEALTH_INTERVAL', 10)
+        app.config.setdefault('FOUNDRY_HEALTH_TIMEOUT', 2)
+        app.extensions['foundry_health'] = self
+        self._app = app
+
+    def _ensure_started(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        pid = os.getpid()
+        if self._app is None or (self._thread is not None and self._pid == pid):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='foundry-health', daemon=True)
+            self._pid = pid
+            self._thread.start()
+
+    def _run(self):
+        interval = float(self._app.config.get('FOUNDRY_HEALTH_INTERVAL', 10))
+        while not self._stop.is_set():
+            try:
+                with self._app.app_context():
+                    self.refresh()
+            except Exception as e:
+                print(f'Foundry health probe failed: {e}')
+            self._stop.wait(interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        """Probe Foundry now and update the cached status"""
+        timeout = float(self._app.config.get('FOUNDRY_HEALTH_TIMEOUT', 2)) if self._app else 2
+        ok, payload = is_foundry_available(timeout=timeout)
+        self._record(ok, payload=payload, error=None if ok else 'health check failed')
+        return ok
+
+    def _record(self, available, payload=None, error=None):
+        with self._lock:
+            self._available = available
+            if payload is not None or not available:
+                self._payload = payload
+            self._last_error = error
+            self._checked_at = datetime.utcnow()
+            self._checked_monotonic = time.monotonic()
+
+    def mark_down(self, reason=None):
+        """Flag Foundry as unreachable immediately (e.g. after a connection error)"""
+        self._record(False, error=reason or 'connection failed')
+
+    def mark_up(self):
+        """Flag Foundry as reachable after any upstream response"""
+        if self._available is not True:
+            self._record(True)
+
+    def is_available(self):
+        """Cached reachability; optimistic until the first probe has finished"""
+        self._ensure_started()
+        return self._available is not False
+
+    def status(self):
+        self._ensure_started()
+        with self._lock:
+            age = None
+            if self._checked_monotonic is not None:
+                age = round(time.monotonic() - self._checked_monotonic, 3)
+            if self._available is None:
+                state = 'unknown'
+            else:
+                state = 'up' if self._available else 'down'
+            return {
+                'state': state,
+                'available': self._available,
+                'payload': self._payload,
+                'checked_at': self._checked_at.isoformat() if self._checked_at else None,
+                'age_seconds': age,
+                'last_error': self._last_error
+            }
+
+
+foundry_health = FoundryHealthProber()
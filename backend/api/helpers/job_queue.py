@@ -0,0 +1,332 @@
+import os
+import signal
+import socket
+import threading
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from models import db, ProcessingJob
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying can't fix (bad input, unsupported file, 4xx from Foundry)"""
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and it was handed to another worker; this run must stop writing"""
+
+
+class JobQueue:
+    """Database-backed job queue with an in-process worker pool.
+
+    Jobs are ``ProcessingJob`` rows. JOB_WORKERS daemon threads per process
+    claim queued jobs with a conditional UPDATE, so several gunicorn workers
+    can share one queue. At most JOB_USER_CONCURRENCY jobs of each type run
+    per user, enforced under a lock on the user's active jobs of that type;
+    so a long document ingest never holds up a user's chat summaries.
+    Failures are retried with exponential backoff until ``max_attempts``, and
+    jobs whose worker died are re-queued once their lock is older than
+    JOB_LEASE_SECONDS. Long handlers keep their lease by calling
+    ``heartbeat`` in each transaction they commit. A run is identified by the
+    job's ``attempts`` at claim time: once the job is re-queued and claimed
+    again, the old run's heartbeat raises ``LeaseLost`` and its outcome is
+    discarded. Handlers are registered per ``job_type``.
+    """
+
+    def __init__(self, app=None):
+        self._app = None
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._handlers = {}
+        self._local = threading.local()
+        self._processed = 0
+        self._failed = 0
+        self._retried = 0
+        self._abandoned = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOB_RETRY_BACKOFF', 10)
+        app.config.setdefault('JOB_USER_CONCURRENCY', 1)
+        app.config.setdefault('JOB_POLL_INTERVAL', 2)
+        app.config.setdefault('JOB_LEASE_SECONDS', 1800)
+        app.extensions['job_queue'] = self
+        self._app = app
+        # Workers start with the first request so jobs left queued by a restart are picked up
+        app.before_request(self._ensure_started)
+        app.cli.add_command(jobs_command)
+
+    def register(self, job_type, handler, on_failure=None):
+        """``handler(job)`` returns the job result; ``on_failure(job)`` runs once retries are exhausted"""
+        self._handlers[job_type] = (handler, on_failure)
+
+    def _ensure_started(self, workers=None):
+        # Threads don't survive a fork, so each worker process starts its own pool
+        pid = os.getpid()
+        if self._app is None or self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._stop.clear()
+            self._threads = []
+            if workers is None:
+                workers = self._app.config['JOB_WORKERS']
+            for number in range(int(workers)):
+                name = f'{socket.gethostname()}:{pid}:job-{number}'
+                thread = threading.Thread(target=self._run, args=(name,), name=f'job-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = pid
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def serve(self, workers=None):
+        """Run ``workers`` job threads in the foreground until interrupted.
+
+        For deployments whose web workers can't host the pool (gevent workers
+        run with JOB_WORKERS=0), a separate ``flask jobs`` process serves the
+        same database queue.
+        """
+        # SIGTERM (systemd, docker stop) lets running jobs finish like Ctrl+C does
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        self._ensure_started(workers)
+        try:
+            while any(thread.is_alive() for thread in self._threads):
+                self._stop.wait(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            for thread in self._threads:
+                thread.join()
+            signal.signal(signal.SIGTERM, previous)
+
+    def enqueue(self, job_type, user_id, file_id=None, payload=None):
+        if job_type not in self._handlers:
+            raise ValueError(f'No handler registered for job type {job_type}')
+        job = ProcessingJob(
+            job_type=job_type,
+            user_id=user_id,
+            file_id=file_id,
+            payload=payload or {},
+            max_attempts=int(self._app.config['JOB_MAX_ATTEMPTS'])
+        )
+        db.session.add(job)
+        db.session.commit()
+        self._ensure_started()
+        self._wake.set()
+        return job
+
+    def active_job_for_file(self, file_id):
+        return ProcessingJob.query.filter(
+            ProcessingJob.file_id == file_id,
+            ProcessingJob.status.in_(ACTIVE_STATUSES)
+        ).order_by(ProcessingJob.created_at.desc()).first()
+
+    def _run(self, worker_name):
+        interval = float(self._app.config['JOB_POLL_INTERVAL'])
+        while not self._stop.is_set():
+            try:
+                with self._app.app_context():
+                    job = self._claim(worker_name)
+                    if job is not None:
+                        self._execute(job)
+                        continue
+            except Exception as e:
+                print(f'Job worker {worker_name} error: {e}')
+            self._wake.wait(interval)
+            self._wake.clear()
+
+    def _requeue_stale(self, now):
+        lease = timedelta(seconds=float(self._app.config['JOB_LEASE_SECONDS']))
+        db.session.query(ProcessingJob).filter(
+            ProcessingJob.status == 'running',
+            ProcessingJob.locked_at < now - lease
+        ).update({'status': 'queued', 'locked_by': None, 'locked_at': None}, synchronize_session=False)
+
+    def _claim(self, worker_name):
+        # The lock keeps this process's workers from all claiming at once; correctness across
+        # processes comes from the row locks and conditional UPDATE in _claim_job
+        with self._claim_lock:
+            now = datetime.utcnow()
+            self._requeue_stale(now)
+            running = {
+                (user_id, job_type): count
+                for user_id, job_type, count in db.session.query(
+                    ProcessingJob.user_id, ProcessingJob.job_type, db.func.count(ProcessingJob.id)
+                ).filter(
+                    ProcessingJob.status == 'running'
+                ).group_by(ProcessingJob.user_id, ProcessingJob.job_type).all()
+            }
+            cap = int(self._app.config['JOB_USER_CONCURRENCY'])
+            candidates = db.session.query(ProcessingJob.id, ProcessingJob.user_id, ProcessingJob.job_type).filter(
+                ProcessingJob.status == 'queued',
+                ProcessingJob.run_after <= now
+            ).order_by(ProcessingJob.created_at).limit(50).all()
+            db.session.commit()
+
+            for job_id, user_id, job_type in candidates:
+                # Cheap pre-check from the snapshot; _claim_job re-checks under the user's locks
+                if running.get((user_id, job_type), 0) >= cap:
+                    continue
+                if self._claim_job(job_id, user_id, job_type, cap, worker_name, now):
+                    return db.session.get(ProcessingJob, job_id)
+            return None
+
+    def _claim_job(self, job_id, user_id, job_type, cap, worker_name, now):
+        """Mark one queued job running unless its user already has ``cap`` jobs of its type running.
+
+        The user's queued and running jobs of that type are locked first
+        (``SELECT ... FOR UPDATE``), so concurrent claims for one user from
+        any process are serialized: counting the running jobs and the UPDATE
+        happen in one transaction no other such claim can interleave with. On
+        SQLite, which ignores ``FOR UPDATE``, the single writer does the same.
+        """
+        statuses = db.session.query(ProcessingJob.status).filter(
+            ProcessingJob.user_id == user_id,
+            ProcessingJob.job_type == job_type,
+            ProcessingJob.status.in_(ACTIVE_STATUSES)
+        ).with_for_update().all()
+        if sum(1 for (status,) in statuses if status == 'running') >= cap:
+            db.session.commit()
+            return False
+        claimed = db.session.query(ProcessingJob).filter(
+            ProcessingJob.id == job_id,
+            ProcessingJob.status == 'queued'
+        ).update({
+            'status': 'running',
+            'locked_by': worker_name,
+            'locked_at': now,
+            'started_at': now,
+            'attempts': ProcessingJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(claimed)
+
+    def heartbeat(self):
+        """Renew the current job's lease inside the caller's transaction.
+
+        Call it before committing work the job produces. When the job has been
+        re-queued since this run claimed it, the transaction is rolled back and
+        ``LeaseLost`` is raised, so a stalled run can't write alongside the
+        worker that took the job over. Does nothing outside a job.
+        """
+        run = getattr(self._local, 'run', None)
+        if run is None:
+            return
+        if not self._owned(*run).update({'locked_at': datetime.utcnow()}, synchronize_session=False):
+            db.session.rollback()
+            raise LeaseLost(f'Job {run[0]} was re-queued after its lease expired')
+
+    def _owned(self, job_id, attempt):
+        # The row as long as this run still holds it: attempts only grows when the job is claimed again
+        return db.session.query(ProcessingJob).filter(
+            ProcessingJob.id == job_id,
+            ProcessingJob.status == 'running',
+            ProcessingJob.attempts == attempt
+        )
+
+    def _settle(self, job_id, attempt, values):
+        """Record a run's outcome unless the job has been handed to another worker since"""
+        updated = self._owned(job_id, attempt).update(
+            dict(values, locked_by=None, locked_at=None), synchronize_session=False
+        )
+        db.session.commit()
+        return bool(updated)
+
+    def _execute(self, job):
+        handler, on_failure = self._handlers.get(job.job_type, (None, None))
+        job_id, attempt, max_attempts = job.id, job.attempts, job.max_attempts
+        self._local.run = (job_id, attempt)
+        try:
+            try:
+                if handler is None:
+                    raise PermanentJobError(f'No handler registered for job type {job.job_type}')
+                result = handler(job)
+            except LeaseLost as e:
+                db.session.rollback()
+                self._abandoned += 1
+                print(f'Job {job_id} abandoned: {e}')
+                return
+            except Exception as e:
+                db.session.rollback()
+                if not isinstance(e, PermanentJobError) and attempt < max_attempts:
+                    backoff = float(self._app.config['JOB_RETRY_BACKOFF']) * 2 ** (attempt - 1)
+                    if self._settle(job_id, attempt, {
+                        'status': 'queued',
+                        'error_message': str(e),
+                        'run_after': datetime.utcnow() + timedelta(seconds=backoff)
+                    }):
+                        self._retried += 1
+                    return
+                if not self._settle(job_id, attempt, {
+                    'status': 'failed',
+                    'error_message': str(e),
+                    'completed_at': datetime.utcnow()
+                }):
+                    return
+                self._failed += 1
+                if on_failure is not None:
+                    try:
+                        on_failure(db.session.get(ProcessingJob, job_id))
+                    except Exception as hook_error:
+                        db.session.rollback()
+                        print(f'Job {job_id} failure hook error: {hook_error}')
+                return
+
+            if self._settle(job_id, attempt, {
+                'status': 'completed',
+                'result': result,
+                'error_message': None,
+                'completed_at': datetime.utcnow()
+            }):
+                self._processed += 1
+        finally:
+            self._local.run = None
+
+    def stats(self):
+        counts = dict(db.session.query(ProcessingJob.status, db.func.count(ProcessingJob.id)).group_by(
+            ProcessingJob.status
+        ).all())
+        return {
+            'workers': sum(1 for t in self._threads if t.is_alive()) if self._pid == os.getpid() else 0,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0),
+            'processed_here': self._processed,
+            'failed_here': self._failed,
+            'retried_here': self._retried,
+            'abandoned_here': self._abandoned
+        }
+
+
+job_queue = JobQueue()
+
+
+@click.command('jobs')
+@click.option('--workers', type=int, default=None, help='Worker threads (defaults to JOB_WORKERS).')
+@with_appcontext
+def jobs_command(workers):
+    """Run background jobs in this process instead of the web workers."""
+    if workers is None:
+        workers = int(current_app.config['JOB_WORKERS'])
+    if workers < 1:
+        raise click.UsageError('JOB_WORKERS is 0 for this process; pass --workers')
+    click.echo(f'Running {workers} job worker(s), Ctrl+C to stop')
+    current_app.extensions['job_queue'].serve(workers)
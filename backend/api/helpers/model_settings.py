@@ -0,0 +1,19 @@
+def parse_model_settings(value, cast=int):
+    """``"phi-3.5-mini=4096,qwen2.5=32768"`` to ``{'phi-3.5-mini': 4096, 'qwen2.5': 32768}``"""
+    settings = {}
+    for item in (value or '').split(','):
+        name, _, setting = item.partition('=')
+        if name.strip() and setting.strip():
+            settings[name.strip()] = cast(setting.strip())
+    return settings
+
+
+def model_setting(settings, model, default):
+    """A per-model setting: the exact entry, else the longest entry the model id starts with
+    (Foundry ids carry variant suffixes such as ``-generic-cpu``), else ``default``"""
+    if model in settings:
+        return settings[model]
+    prefixes = [name for name in settings if model and model.startswith(name)]
+    if prefixes:
+        return settings[max(prefixes, key=len)]
+    return default
@@ -0,0 +1,111 @@
+import base64
+import json
+from datetime import datetime
+
+from models import db, Message
+
+
+class CursorError(ValueError):
+    """A pagination cursor that can't be decoded"""
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque cursor for a row's position in a ``(timestamp, id)`` ordering"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(timestamp), str(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise CursorError(f'Invalid cursor: {cursor}') from e
+
+
+def parse_limit(value, default, maximum):
+    """Page size from a query string value, clamped to ``1..maximum``"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise CursorError(f'Invalid limit: {value}')
+    return max(1, min(limit, maximum))
+
+
+def after_position(timestamp_column, id_column, cursor, descending):
+    """Rows strictly past ``cursor`` in the given ``(timestamp, id)`` direction.
+
+    Written as a row-value comparison spelled out with OR so it works on
+    SQLite and PostgreSQL alike and can use a ``(timestamp, id)`` index.
+    """
+    timestamp, row_id = decode_cursor(cursor)
+    if descending:
+        return db.or_(
+            timestamp_column < timestamp,
+            db.and_(timestamp_column == timestamp, id_column < row_id)
+        )
+    return db.or_(
+        timestamp_column > timestamp,
+        db.and_(timestamp_column == timestamp, id_column > row_id)
+    )
+
+
+def keyset_page(query, timestamp_column, id_column, limit, cursor=None, descending=True, key=None):
+    """Fetch one page of ``query`` ordered by ``(timestamp, id)``.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last
+    page. ``key(row)`` extracts ``(timestamp, id)`` from a result row when
+    the query returns more than the model.
+    """
+    if cursor:
+        query = query.filter(after_position(timestamp_column, id_column, cursor, descending))
+    if descending:
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(timestamp_column.asc(), id_column.asc())
+
+    # One extra row tells us whether another page exists without a COUNT
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        timestamp, row_id = key(rows[-1]) if key else (
+            getattr(rows[-1], timestamp_column.key), getattr(rows[-1], id_column.key)
+        )
+        next_cursor = encode_cursor(timestamp, row_id)
+    return rows, next_cursor
+
+
+def message_page(conversation_id, before=None, after=None, limit=None, default_limit=50, max_limit=500):
+    """A window of a conversation's messages in chronological order.
+
+    Without ``before``/``after``/``limit`` every message is returned, as the
+    history endpoints always did. Otherwise at most ``limit`` messages are
+    read: the latest ones, the ones just older than ``before`` or the ones
+    just newer than ``after`` (cursors from a previous page). Returns
+    ``(messages, page)`` where ``page`` holds ``prev_cursor`` (pass as
+    ``before`` for older messages) and ``next_cursor`` (pass as ``after``
+    for newer ones), each ``None`` when there is nothing further that way.
+    """
+    query = Message.query.filter(Message.conversation_id == conversation_id)
+    if before is None and after is None and limit in (None, ''):
+        messages = query.order_by(Message.created_at, Message.id).all()
+        return messages, {'prev_cursor': None, 'next_cursor': None, 'limit': None}
+
+    if before and after:
+        raise CursorError('Pass either before or after, not both')
+    limit = parse_limit(limit, default_limit, max_limit)
+
+    if after:
+        messages, next_cursor = keyset_page(query, Message.created_at, Message.id, limit, cursor=after, descending=False)
+        prev_cursor = encode_cursor(messages[0].created_at, messages[0].id) if messages else None
+        return messages, {'prev_cursor': prev_cursor, 'next_cursor': next_cursor, 'limit': limit}
+
+    # Newest first so only the requested tail is read, then flipped to chronological order
+    messages, prev_cursor = keyset_page(query, Message.created_at, Message.id, limit, cursor=before, descending=True)
+    messages.reverse()
+    next_cursor = encode_cursor(messages[-1].created_at, messages[-1].id) if before and messages else None
+    return messages, {'prev_cursor': prev_cursor, 'next_cursor': next_cursor, 'limit': limit}
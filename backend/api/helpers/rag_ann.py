@@ -0,0 +1,281 @@
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+
+from models import db, RAGDocument, UploadedFile
+from api.helpers.embedding_store import stack_embeddings
+from api.helpers.vector_search import normalize_rows, top_k
+
+
+def _kmeans(vectors, nlist, iterations, seed=0):
+    """Spherical k-means: centroids are re-normalized so cosine == dot product"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random points so every list stays useful
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums).astype(np.float32)
+    return centroids
+
+
+def _assign(vectors, centroids, batch_size=65536):
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start:start + batch_size]
+        assignments[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def _nlist(nlist, count):
+    if nlist is None:
+        nlist = max(1, int(np.sqrt(count)))
+    return max(1, min(int(nlist), count))
+
+
+class IVFIndex:
+    """Inverted-file ANN index over normalized RAG chunk embeddings.
+
+    Vectors are clustered into ``nlist`` lists around k-means centroids and
+    stored grouped by list. A query scores the centroids, scans only the
+    ``nprobe`` closest lists and runs exact cosine inside them: higher
+    ``nprobe`` means better recall and slower queries.
+    """
+
+    def __init__(self, centroids, offsets, vectors, doc_ids, file_ids, built_at=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.doc_ids = doc_ids
+        self.file_ids = file_ids
+        self.built_at = built_at or time.time()
+        self.indexed_files = set(np.unique(file_ids).tolist())
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, doc_ids, file_ids, vectors, nlist=None, iterations=20, sample_size=None, built_at=None):
+        vectors = normalize_rows(np.ascontiguousarray(vectors, dtype=np.float32)).astype(np.float32)
+        nlist = _nlist(nlist, len(vectors))
+        # Train on a sample; 256 points per list is plenty for stable centroids
+        sample_size = sample_size or min(len(vectors), nlist * 256)
+        rng = np.random.default_rng(0)
+        centroids = _kmeans(vectors[rng.choice(len(vectors), size=sample_size, replace=False)], nlist, iterations)
+        return cls.grouped(centroids, _assign(vectors, centroids), vectors, doc_ids, file_ids, built_at)
+
+    @classmethod
+    def grouped(cls, centroids, assignments, vectors, doc_ids, file_ids, built_at=None):
+        """Lay assigned vectors out list by list; ``vectors`` may be a memmap"""
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(
+            centroids,
+            offsets,
+            np.ascontiguousarray(vectors[order]),
+            np.asarray(doc_ids, dtype=object)[order],
+            np.asarray(file_ids, dtype=object)[order],
+            built_at
+        )
+
+    def search(self, query_embedding, k=5, nprobe=8, file_ids=None):
+        query = normalize_rows(np.asarray([query_embedding], dtype=np.float32))[0]
+        if query.shape[0] != self.dim:
+            return []
+        nprobe = max(1, min(int(nprobe), self.nlist))
+        probe_lists, _ = top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe_lists[0]
+        ])
+        if file_ids:
+            rows = rows[np.isin(self.file_ids[rows], list(file_ids))]
+        if not len(rows):
+            return []
+        indices, values = top_k(self.vectors[rows] @ query, k)
+        return [(self.doc_ids[rows[i]], float(v)) for i, v in zip(indices[0], values[0])]
+
+    def save(self, path):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                offsets=self.offsets,
+                vectors=self.vectors,
+                doc_ids=self.doc_ids.astype(str),
+                file_ids=self.file_ids.astype(str),
+                built_at=np.array([self.built_at])
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['centroids'],
+                data['offsets'],
+                data['vectors'],
+                data['doc_ids'].astype(object),
+                data['file_ids'].astype(object),
+                float(data['built_at'][0])
+            )
+
+
+def default_index_path(app=None):
+    """Where the IVF index lives: RAG_ANN_INDEX_PATH, else beside the SQLite file, else the instance folder"""
+    app = app or current_app
+    path = app.config.get('RAG_ANN_INDEX_PATH')
+    if path:
+        return path
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if uri.startswith('sqlite:///') and uri != 'sqlite:///:memory:':
+        db_path = uri[len('sqlite:///'):]
+        if not os.path.isabs(db_path):
+            db_path = os.path.join(app.instance_path, db_path)
+        return os.path.splitext(db_path)[0] + '.rag_ivf.npz'
+    return os.path.join(app.instance_path, 'rag_ivf.npz')
+
+
+def build_from_database(nlist=None, iterations=20, batch_size=10000):
+    """Build an IVF index from the chunk embeddings of every processed document.
+
+    Embeddings are streamed in pages of ``batch_size`` rows, twice: the first
+    pass keeps a random sample to train the centroids on, the second assigns
+    each page to its list and spills it to a scratch file. Only the sample,
+    one page and the finished index are held in memory.
+
+    ``built_at`` is when the build started, so a file that finished
+    processing while its chunks were being read counts as newer than the index.
+    """
+    built_at = time.time()
+    total = _embedded_chunks().count()
+    if not total:
+        raise ValueError('No RAG embeddings stored yet')
+    nlist = _nlist(nlist, total)
+
+    # Sample by position in the id order, so no pass needs the whole table
+    rng = np.random.default_rng(0)
+    picks = np.sort(rng.choice(total, size=min(total, nlist * 256), replace=False))
+    sample = [
+        matrix[np.isin(positions, picks)]
+        for positions, _, _, matrix in _pages(batch_size)
+    ]
+    sample = np.vstack(sample) if sample else np.empty((0, 0), dtype=np.float32)
+    if not len(sample):
+        raise ValueError('No RAG embeddings stored yet')
+    centroids = _kmeans(sample, min(nlist, len(sample)), iterations)
+    del sample
+
+    doc_ids, file_ids, assignments = [], [], []
+    with tempfile.TemporaryFile() as scratch:
+        for _, page_doc_ids, page_file_ids, matrix in _pages(batch_size):
+            if matrix.shape[1] != centroids.shape[1]:
+                raise ValueError(f'Mixed embedding dimensions: {matrix.shape[1]} and {centroids.shape[1]}')
+            scratch.write(matrix.tobytes())
+            assignments.append(_assign(matrix, centroids))
+            doc_ids.extend(page_doc_ids)
+            file_ids.extend(page_file_ids)
+        scratch.flush()
+        if not doc_ids:
+            raise ValueError('No RAG embeddings stored yet')
+        vectors = np.memmap(scratch, dtype=np.float32, mode='r', shape=(len(doc_ids), centroids.shape[1]))
+        index = IVFIndex.grouped(centroids, np.concatenate(assignments), vectors, doc_ids, file_ids, built_at)
+        del vectors
+    return index
+
+
+def _embedded_chunks():
+    return db.session.query(RAGDocument).join(
+        UploadedFile, UploadedFile.id == RAGDocument.file_id
+    ).filter(
+        UploadedFile.is_processed.is_(True),
+        db.or_(RAGDocument.embedding_blob.isnot(None), RAGDocument.embedding.isnot(None))
+    )
+
+
+def _pages(batch_size):
+    """Yield ``(positions, doc_ids, file_ids, normalized matrix)`` per page of chunks, in id order"""
+    query = _embedded_chunks().with_entities(
+        RAGDocument.id,
+        RAGDocument.file_id,
+        RAGDocument.embedding_blob,
+        RAGDocument.embedding_dim,
+        RAGDocument.embedding_dtype,
+        RAGDocument.embedding
+    ).order_by(RAGDocument.id).yield_per(batch_size)
+
+    start, rows = 0, []
+    for row in query:
+        rows.append(row)
+        if len(rows) >= batch_size:
+            yield from _page(start, rows)
+            start, rows = start + len(rows), []
+    yield from _page(start, rows)
+
+
+def _page(start, rows):
+    matrix, kept = stack_embeddings([row[2:] for row in rows])
+    if kept:
+        yield (
+            start + np.asarray(kept),
+            [rows[i][0] for i in kept],
+            [rows[i][1] for i in kept],
+            normalize_rows(matrix).astype(np.float32)
+        )
+
+
+class ANNIndexStore:
+    """Lazily loads the persisted IVF index and reloads it when the file is rebuilt"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._path = None
+        self._mtime = None
+
+    def get(self):
+        path = default_index_path()
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if self._index is None or self._path != path or self._mtime != mtime:
+            with self._lock:
+                if self._index is None or self._path != path or self._mtime != mtime:
+                    self._index = IVFIndex.load(path)
+                    self._path = path
+                    self._mtime = mtime
+        return self._index
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {'loaded': False}
+        return {
+            'loaded': True,
+            'path': self._path,
+            'vectors': len(index),
+            'nlist': index.nlist,
+            'built_at': index.built_at
+        }
+
+
+ann_index = ANNIndexStore()
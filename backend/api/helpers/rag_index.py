@@ -0,0 +1,234 @@
+import hashlib
+import itertools
+import threading
+
+import numpy as np
+
+from models import db, RAGDocument, UploadedFile
+from api.helpers.embedding_store import stack_embeddings
+from api.helpers.vector_search import normalize_rows, top_k
+
+# Files whose chunks are read with one query when loading
+LOAD_BATCH = 500
+
+
+class _Corpus:
+    """Loaded chunk embeddings of one dimension.
+
+    One contiguous float32 matrix of L2-normalized rows plus the RAGDocument
+    id and file code of every row. Rows past ``size`` are spare capacity, so
+    appending a file rarely copies the matrix. Removing a file builds new
+    arrays instead of compacting in place, so a search still holding the old
+    ones is unaffected.
+    """
+
+    def __init__(self, dim):
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+        self.doc_ids = np.empty(0, dtype=object)
+        self.file_codes = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.files = 0
+
+    def append(self, code, doc_ids, matrix):
+        needed = self.size + len(doc_ids)
+        if needed > len(self.matrix):
+            capacity = max(needed, 2 * len(self.matrix), 1024)
+            self.matrix = _grown(self.matrix, self.size, capacity)
+            self.doc_ids = _grown(self.doc_ids, self.size, capacity)
+            self.file_codes = _grown(self.file_codes, self.size, capacity)
+        self.matrix[self.size:needed] = matrix
+        self.doc_ids[self.size:needed] = doc_ids
+        self.file_codes[self.size:needed] = code
+        self.size = needed
+        self.files += 1
+
+    def remove(self, code):
+        keep = np.flatnonzero(self.file_codes[:self.size] != code)
+        self.matrix = self.matrix[keep]
+        self.doc_ids = self.doc_ids[keep]
+        self.file_codes = self.file_codes[keep]
+        self.size = len(keep)
+        self.files -= 1
+
+    def snapshot(self):
+        return self.matrix[:self.size], self.doc_ids[:self.size], self.file_codes[:self.size]
+
+
+def _grown(array, size, capacity):
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:size] = array[:size]
+    return grown
+
+
+def _to_normalized_matrix(embeddings):
+    matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32))
+    if matrix.ndim != 2:
+        raise ValueError('Embeddings must be equal-length vectors')
+    return normalize_rows(matrix)
+
+
+def rag_files(file_ids=None):
+    """``{file_id: processed_at}`` for a retrieval over ``file_ids``.
+
+    Without ``file_ids`` these are the processed documents. With them, every
+    requested id is included, and files still being processed map to ``None``.
+    """
+    query = db.session.query(UploadedFile.id, UploadedFile.processed_at)
+    if not file_ids:
+        return dict(query.filter(UploadedFile.is_processed.is_(True), UploadedFile.content_type == 'document').all())
+    files = dict.fromkeys(file_ids)
+    files.update(query.filter(UploadedFile.id.in_(list(files)), UploadedFile.is_processed.is_(True)).all())
+    return files
+
+
+def corpus_version(files):
+    """Digest of a ``rag_files()`` mapping that changes whenever one of the files is (re)processed;
+    ``None`` while any of them is still being processed"""
+    if any(processed_at is None for processed_at in files.values()):
+        return None
+    digest = hashlib.sha1()
+    for file_id, processed_at in sorted(files.items()):
+        digest.update(f'{file_id}:{processed_at.isoformat()};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RAGIndex:
+    """Process-resident cosine index over RAG chunk embeddings.
+
+    All loaded chunks of one embedding dimension live in a single
+    contiguous float32 matrix whose rows are L2-normalized once at load
+    time, so a query is one matrix-vector product over the whole corpus;
+    restricting it to some files is a boolean mask over the row -> file
+    array. Files are loaded from the database (ids and embeddings only,
+    never chunk text) by the first query that needs them, or by ``add`` when
+    this process finishes processing one. Only processed files are kept,
+    tagged with ``UploadedFile.processed_at``: a processed file's chunks never
+    change, so rows whose tag still matches the database are current in
+    every worker, and a file reprocessed elsewhere is reloaded. Files that
+    are still being processed are read afresh on every query. ``remove`` and
+    ``prune`` drop the rows of files that were discarded or deleted.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._corpora = {}
+        # file_id -> (code, dim or None when it has no embeddings, processed_at)
+        self._files = {}
+        self._codes = itertools.count()
+
+    def _load(self, file_ids):
+        """``{file_id: (doc_ids, normalized matrix)}`` of the files that have embeddings"""
+        loaded = {}
+        for start in range(0, len(file_ids), LOAD_BATCH):
+            rows = db.session.query(
+                RAGDocument.file_id,
+                RAGDocument.id,
+                RAGDocument.embedding_blob,
+                RAGDocument.embedding_dim,
+                RAGDocument.embedding_dtype,
+                RAGDocument.embedding
+            ).filter(
+                RAGDocument.file_id.in_(file_ids[start:start + LOAD_BATCH]),
+                db.or_(RAGDocument.embedding_blob.isnot(None), RAGDocument.embedding.isnot(None))
+            ).order_by(RAGDocument.file_id, RAGDocument.chunk_index).all()
+            for file_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+                group = list(group)
+                matrix, kept = stack_embeddings([row[2:] for row in group])
+                if kept:
+                    loaded[file_id] = (
+                        [group[i][1] for i in kept], normalize_rows(matrix).astype(np.float32, copy=False)
+                    )
+        return loaded
+
+    def _store(self, files, loaded):
+        with self._lock:
+            for file_id, processed_at in files.items():
+                current = self._files.get(file_id)
+                if current is not None and current[2] == processed_at:
+                    continue
+                self._drop(file_id)
+                code = next(self._codes)
+                doc_ids, matrix = loaded.get(file_id, (None, None))
+                dim = None
+                if doc_ids:
+                    dim = matrix.shape[1]
+                    corpus = self._corpora.get(dim)
+                    if corpus is None:
+                        corpus = self._corpora[dim] = _Corpus(dim)
+                    corpus.append(code, doc_ids, matrix)
+                self._files[file_id] = (code, dim, processed_at)
+
+    def _drop(self, file_id):
+        # Caller holds the lock
+        entry = self._files.pop(file_id, None)
+        if entry is not None and entry[1] is not None:
+            self._corpora[entry[1]].remove(entry[0])
+
+    def add(self, file_id, processed_at):
+        """Load a file that has just been processed, replacing any older rows of it"""
+        self._store({file_id: processed_at}, self._load([file_id]))
+
+    def remove(self, file_id):
+        with self._lock:
+            self._drop(file_id)
+
+    def prune(self, files):
+        """Drop loaded files missing from ``files``, a complete ``rag_files()`` mapping"""
+        with self._lock:
+            for file_id in [file_id for file_id in self._files if file_id not in files]:
+                self._drop(file_id)
+
+    def search(self, query_embedding, k=5, files=None):
+        """Cosine top-k over ``files``, a ``rag_files()`` mapping (all processed documents when ``None``).
+
+        Returns ``[(doc_id, similarity), ...]`` best first. Chunks whose
+        dimension differs from the query (another embedding model) are skipped.
+        """
+        query = _to_normalized_matrix([query_embedding])[0]
+        if files is None:
+            files = rag_files()
+            self.prune(files)
+        with self._lock:
+            stale = [
+                file_id for file_id, processed_at in files.items()
+                if processed_at is not None and self._files.get(file_id, (None, None, None))[2] != processed_at
+            ]
+        if stale:
+            self._store({file_id: files[file_id] for file_id in stale}, self._load(stale))
+
+        candidates = []
+        with self._lock:
+            corpus = self._corpora.get(query.shape[0])
+            codes = [
+                self._files[file_id][0] for file_id, processed_at in files.items()
+                if processed_at is not None and file_id in self._files and self._files[file_id][1] == query.shape[0]
+            ]
+            snapshot = corpus.snapshot() if corpus is not None and codes else None
+            everything = snapshot is not None and len(codes) == corpus.files
+        if snapshot is not None:
+            matrix, doc_ids, file_codes = snapshot
+            scores = matrix @ query
+            if not everything:
+                scores = np.where(np.isin(file_codes, codes), scores, -np.inf)
+            indices, values = top_k(scores, k)
+            candidates.extend((doc_ids[i], float(v)) for i, v in zip(indices[0], values[0]) if v != -np.inf)
+
+        pending = [file_id for file_id, processed_at in files.items() if processed_at is None]
+        for doc_ids, matrix in self._load(pending).values():
+            if matrix.shape[1] != query.shape[0]:
+                continue
+            indices, values = top_k(matrix @ query, k)
+            candidates.extend((doc_ids[i], float(v)) for i, v in zip(indices[0], values[0]))
+        candidates.sort(key=lambda item: item[1], reverse=True)
+        return candidates[:k]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'files': len(self._files),
+                'vectors': sum(corpus.size for corpus in self._corpora.values()),
+                'bytes': sum(corpus.matrix.nbytes for corpus in self._corpora.values())
+            }
+
+
+rag_index = RAGIndex()
@@ -0,0 +1,274 @@
+import codecs
+import csv
+import os
+import uuid
+from datetime import datetime
+
+from flask import current_app
+
+from models import db, RAGDocument
+from api.helpers.embedding_store import pack_embedding
+from api.helpers.embeddings import embed_texts
+from api.helpers.job_queue import job_queue
+from api.helpers.rag_index import rag_index
+
+# Text formats are read in blocks of this many bytes so memory stays flat for any file size
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class IngestError(Exception):
+    """The document can't be ingested locally (unsupported type or missing parser)"""
+
+
+def _iter_text_file(path):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            text = decoder.decode(block)
+            if text:
+                yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def _iter_csv(path):
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        for row in reader:
+            # "column: value" keeps each chunk self-describing once rows are split apart
+            yield '; '.join(f'{name}: {value}' for name, value in zip(header, row) if value) + '\n'
+
+
+def _iter_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise IngestError('PDF ingest requires the pypdf package')
+    reader = PdfReader(path)
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        if text:
+            yield text + '\n'
+
+
+def _iter_docx(path):
+    try:
+        import docx
+    except ImportError:
+        raise IngestError('DOCX ingest requires the python-docx package')
+    document = docx.Document(path)
+    for paragraph in document.paragraphs:
+        if paragraph.text:
+            yield paragraph.text + '\n'
+
+
+READERS = {
+    'txt': _iter_text_file,
+    'md': _iter_text_file,
+    'json': _iter_text_file,
+    'csv': _iter_csv,
+    'pdf': _iter_pdf,
+    'docx': _iter_docx
+}
+
+
+def iter_document_text(path):
+    """Yield a document's text piece by piece (blocks, rows, pages or paragraphs)"""
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    reader = READERS.get(extension)
+    if reader is None:
+        raise IngestError(f'No local reader for .{extension} files')
+    return reader(path)
+
+
+def iter_chunks(pieces, chunk_size=1000, overlap=200):
+    """Split streamed text into overlapping chunks of at most ``chunk_size`` characters.
+
+    Cuts prefer the last whitespace in the final fifth of the window so words
+    stay whole. Consecutive chunks start at least half of ``chunk_size -
+    overlap`` apart, so a whitespace cut never shrinks the step to a few
+    characters. Yields ``(text, start_offset)``; only one window plus the
+    current piece is ever held in memory.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError('Chunk overlap must be smaller than the chunk size')
+    min_step = max(1, (chunk_size - overlap) // 2)
+    buffer = ''
+    position = 0  # start of the current window in buffer
+    offset = 0    # document offset of buffer[0]
+    for piece in pieces:
+        # Consumed text is dropped once per piece; slicing it off per chunk is quadratic in the block size
+        buffer = buffer[position:] + piece
+        offset += position
+        position = 0
+        while len(buffer) - position >= chunk_size:
+            end = position + chunk_size
+            cut = end
+            boundary = max(buffer.rfind(' ', position, end), buffer.rfind('\n', position, end))
+            if boundary - position > chunk_size * 4 // 5:
+                cut = boundary + 1
+            chunk = buffer[position:cut].strip()
+            if chunk:
+                yield chunk, offset + position
+            position += max(min_step, cut - position - overlap)
+    chunk = buffer[position:].strip()
+    if chunk:
+        yield chunk, offset + position
+
+
+def committed_chunks(file_id):
+    """Number of chunks of ``file_id`` already committed, i.e. where an interrupted run resumes"""
+    last = db.session.query(db.func.max(RAGDocument.chunk_index)).filter(RAGDocument.file_id == file_id).scalar()
+    return 0 if last is None else last + 1
+
+
+def discard_chunks(file_id):
+    db.session.query(RAGDocument).filter(RAGDocument.file_id == file_id).delete(synchronize_session=False)
+    db.session.commit()
+    rag_index.remove(file_id)
+
+
+class ChunkWriter:
+    """Writes RAG chunks with executemany inserts, committing every ``batch_size`` rows.
+
+    Each commit also records progress on ``UploadedFile.processing_status``
+    as ``processing:<written>/<total>`` (just ``processing:<written>`` while the
+    total is unknown), so an interrupted run can pick up after the last
+    committed chunk, and renews the job's lease.
+    """
+
+    def __init__(self, uploaded_file, start_index=0, total=None, batch_size=None):
+        self.uploaded_file = uploaded_file
+        self.next_index = start_index
+        self.total = total
+        self.batch_size = batch_size or current_app.config['RAG_WRITE_BATCH_SIZE']
+        self.embedding_dtype = current_app.config.get('RAG_EMBEDDING_DTYPE', 'float32')
+        self._rows = []
+
+    def add(self, content, embedding, metadata=None):
+        blob, dim, dtype = pack_embedding(embedding, self.embedding_dtype)
+        self.add_packed(content, blob, dim, dtype, metadata)
+
+    def add_packed(self, content, blob, dim, dtype, metadata=None):
+        self._rows.append({
+            'id': str(uuid.uuid4()),
+            'file_id': self.uploaded_file.id,
+            'chunk_index': self.next_index,
+            'content': content,
+            'chunk_metadata': metadata,
+            'embedding_blob': blob,
+            'embedding_dim': dim,
+            'embedding_dtype': dtype,
+            'created_at': datetime.utcnow()
+        })
+        self.next_index += 1
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            db.session.execute(RAGDocument.__table__.insert(), self._rows)
+            self._rows = []
+        progress = f'{self.next_index}/{self.total}' if self.total is not None else str(self.next_index)
+        self.uploaded_file.processing_status = f'processing:{progress}'
+        # Commits only while this run still holds the job; a run that lost its lease writes nothing
+        job_queue.heartbeat()
+        db.session.commit()
+
+
+def ingest_settings(mode='local', model=None, chunk_size=None, overlap=None):
+    """Everything that determines a file's chunks; two uploads with equal settings get identical chunks"""
+    if mode != 'local':
+        return {'mode': mode}
+    config = current_app.config
+    return {
+        'mode': 'local',
+        'embedding_model': model or config['RAG_EMBEDDING_MODEL'],
+        'chunk_size': int(chunk_size or config['RAG_CHUNK_SIZE']),
+        'chunk_overlap': int(config['RAG_CHUNK_OVERLAP'] if overlap is None else overlap)
+    }
+
+
+def record_settings(uploaded_file, settings):
+    """Store the ingest settings on the file, dropping chunks written under different ones"""
+    metadata = dict(uploaded_file.file_metadata or {})
+    if metadata.get('ingest') != settings and committed_chunks(uploaded_file.id):
+        discard_chunks(uploaded_file.id)
+    metadata['ingest'] = settings
+    uploaded_file.file_metadata = metadata
+    db.session.commit()
+
+
+def ingest_file(uploaded_file, settings, batch_size=None):
+    """Parse, chunk, embed and store an uploaded document in-process.
+
+    Chunks are embedded ``RAG_EMBED_BATCH_SIZE`` at a time through the shared
+    embedding cache and handed to a ``ChunkWriter``, so neither the upstream
+    requests nor memory grow with the document. Chunks committed by an
+    earlier, interrupted run with the same settings are skipped without
+    being embedded again. Returns the total number of chunks stored.
+    """
+    batch_size = batch_size or current_app.config['RAG_EMBED_BATCH_SIZE']
+
+    # Resuming is only safe when the document would be chunked exactly as before
+    record_settings(uploaded_file, settings)
+    resume_from = committed_chunks(uploaded_file.id)
+
+    writer = ChunkWriter(uploaded_file, start_index=resume_from)
+    batch = []
+
+    def embed_batch():
+        vectors, _, _ = embed_texts(settings['embedding_model'], [text for text, _ in batch])
+        for (text, start), vector in zip(batch, vectors):
+            writer.add(text, vector, {'start': start, 'end': start + len(text), 'source': uploaded_file.filename})
+
+    pieces = iter_document_text(uploaded_file.file_path)
+    for position, chunk in enumerate(iter_chunks(pieces, settings['chunk_size'], settings['chunk_overlap'])):
+        if position < resume_from:
+            continue
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            embed_batch()
+            batch = []
+    if batch:
+        embed_batch()
+    writer.flush()
+    return writer.next_index
+
+
+def copy_chunks(source_file_id, uploaded_file):
+    """Reuse another upload's chunks and embeddings for ``uploaded_file`` without re-embedding"""
+    writer = ChunkWriter(uploaded_file, start_index=committed_chunks(uploaded_file.id))
+    last_index = writer.next_index - 1
+    while True:
+        # Page through the source by chunk_index so each batch is committed before the next one is read
+        rows = db.session.query(
+            RAGDocument.chunk_index,
+            RAGDocument.content,
+            RAGDocument.embedding_blob,
+            RAGDocument.embedding_dim,
+            RAGDocument.embedding_dtype,
+            RAGDocument.embedding,
+            RAGDocument.chunk_metadata
+        ).filter(
+            RAGDocument.file_id == source_file_id,
+            RAGDocument.chunk_index > last_index
+        ).order_by(RAGDocument.chunk_index).limit(writer.batch_size).all()
+        if not rows:
+            break
+        for _, content, blob, dim, dtype, legacy, metadata in rows:
+            if blob is None and legacy:
+                writer.add(content, legacy, metadata)
+            else:
+                writer.add_packed(content, blob, dim, dtype, metadata)
+        last_index = rows[-1].chunk_index
+        writer.flush()
+    writer.flush()
+    return writer.next_index
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Rough per-entry bookkeeping cost (key, dict slot, tuple) on top of the serialized response
+ENTRY_OVERHEAD = 200
+
+BYPASS_HEADER = 'X-Cache-Bypass'
+
+
+def _canonical(value):
+    # 0 and 0.0 (or 500 and 500.0) must hash the same
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def response_key(path, payload):
+    """sha256 of the upstream path and the payload as canonical JSON (sorted keys, no ``stream``)"""
+    body = {key: value for key, value in payload.items() if key != 'stream'}
+    raw = json.dumps(_canonical(body), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f'{path}\0{raw}'.encode('utf-8')).hexdigest()
+
+
+def is_deterministic(payload):
+    """Only greedy, single-choice sampling gives the same answer for the same payload"""
+    try:
+        temperature = float(payload.get('temperature', 1))
+    except (TypeError, ValueError):
+        return False
+    return temperature == 0 and payload.get('n', 1) == 1
+
+
+def bypass_requested(headers):
+    """``X-Cache-Bypass: true`` or ``Cache-Control: no-cache`` / ``no-store`` skips the lookup"""
+    if headers.get(BYPASS_HEADER, '').lower() in ('1', 'true', 'yes'):
+        return True
+    cache_control = headers.get('Cache-Control', '').lower()
+    return 'no-cache' in cache_control or 'no-store' in cache_control
+
+
+class ResponseCache:
+    """Exact-match LRU cache of Foundry responses to deterministic requests.
+
+    Entries are keyed by ``response_key(path, payload)`` and expire after
+    RESPONSE_CACHE_TTL seconds. The least recently used entries are evicted
+    once RESPONSE_CACHE_MAX_ENTRIES or RESPONSE_CACHE_MAX_BYTES is reached.
+    The cache is per process.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._enabled = True
+        self._ttl = 3600
+        self._max_entries = 10000
+        self._max_bytes = 32 * 1024 * 1024
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._expired = 0
+        self._evictions = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 3600)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 10000)
+        app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        self._enabled = bool(app.config['RESPONSE_CACHE_ENABLED'])
+        self._ttl = float(app.config['RESPONSE_CACHE_TTL'])
+        self._max_entries = int(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        self._max_bytes = int(app.config['RESPONSE_CACHE_MAX_BYTES'])
+        app.extensions['response_cache'] = self
+
+    def lookup(self, path, payload, headers):
+        """Decide how a request uses the cache.
+
+        Returns ``(status, key, response)``: ``('HIT', key, response)`` for a
+        fresh entry, ``('MISS', key, None)`` when the response should be
+        stored with ``put`` once fetched, or ``('BYPASS', key_or_None, None)``.
+        A bypassed deterministic request still gets a key so its fresh
+        response replaces the cached one.
+        """
+        if not self._enabled or not is_deterministic(payload):
+            return 'BYPASS', None, None
+        key = response_key(path, payload)
+        if bypass_requested(headers):
+            with self._lock:
+                self._bypassed += 1
+            return 'BYPASS', key, None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                self._expired += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return 'MISS', key, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return 'HIT', key, json.loads(entry[1])
+
+    def put(self, key, response):
+        if not self._enabled or key is None:
+            return
+        raw = json.dumps(response, separators=(',', ':'))
+        size = len(raw) + ENTRY_OVERHEAD
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self._ttl, raw, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self._max_entries or self._bytes > self._max_bytes):
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key):
+        # Caller holds the lock
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'enabled': self._enabled,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self._max_entries,
+                'max_bytes': self._max_bytes,
+                'ttl': self._ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'bypassed': self._bypassed,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else None
+            }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,50 @@
+import json
+
+# Headers for text/event-stream responses; X-Accel-Buffering stops nginx from buffering the stream
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+
+def streaming_payload(payload):
+    """``payload`` for an upstream streaming request, asking for a final usage chunk (OpenAI ``stream_options``)"""
+    return dict(payload, stream=True, stream_options=dict(payload.get('stream_options') or {}, include_usage=True))
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event frame"""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = []
+    if event:
+        lines.append(f'event: {event}')
+    for line in payload.split('\n'):
+        lines.append(f'data: {line}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def iter_sse_lines(response):
+    """Yield the raw ``data:`` payloads of an upstream SSE response as they arrive.
+
+    Reads with ``chunk_size=None`` so every network chunk is handed over
+    immediately instead of waiting for a fixed-size buffer to fill.
+    """
+    for raw in response.iter_lines(chunk_size=None):
+        if not raw:
+            continue
+        line = raw.decode('utf-8', errors='replace') if isinstance(raw, bytes) else raw
+        if not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        yield data
+
+
+def iter_sse_json(response):
+    """Like ``iter_sse_lines`` but parses each payload as JSON, skipping malformed frames"""
+    for data in iter_sse_lines(response):
+        try:
+            yield json.loads(data)
+        except ValueError:
+            print(f'Skipping malformed SSE frame from Foundry: {data[:200]}')
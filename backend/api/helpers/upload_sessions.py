@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+
+from api.helpers.upload_store import COPY_BLOCK_SIZE
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class UploadRangeError(Exception):
+    """A chunk's Content-Range is malformed or outside the declared file size"""
+
+
+def parse_content_range(header, total_size):
+    """``Content-Range: bytes <start>-<end>/<total>`` to a half-open ``(start, end)``"""
+    match = CONTENT_RANGE.match((header or '').strip())
+    if not match:
+        raise UploadRangeError('Content-Range header must look like "bytes <start>-<end>/<total>"')
+    start, last, total = match.groups()
+    start, end = int(start), int(last) + 1
+    if total != '*' and int(total) != total_size:
+        raise UploadRangeError(f'Content-Range total {total} does not match the declared size {total_size}')
+    if start >= end or end > total_size:
+        raise UploadRangeError(f'Range {start}-{last} is outside the file (size {total_size})')
+    return start, end
+
+
+def merge_ranges(ranges, start, end):
+    merged = []
+    for range_start, range_end in sorted([*map(tuple, ranges or []), (start, end)]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def missing_ranges(ranges, total_size):
+    missing, position = [], 0
+    for range_start, range_end in ranges or []:
+        if range_start > position:
+            missing.append([position, range_start])
+        position = max(position, range_end)
+    if position < total_size:
+        missing.append([position, total_size])
+    return missing
+
+
+def create_part_file(path, size):
+    """Pre-size the temp file so every chunk can be written straight to its offset"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+
+def write_chunk(path, start, end, stream):
+    """Copy ``end - start`` bytes from ``stream`` to ``path`` at ``start``.
+
+    Returns the number of bytes written; fewer than expected means the
+    client sent a short body.
+    """
+    remaining = end - start
+    written = 0
+    with open(path, 'r+b') as f:
+        f.seek(start)
+        while remaining > 0:
+            block = stream.read(min(COPY_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            f.write(block)
+            written += len(block)
+            remaining -= len(block)
+    return written
+
+
+def file_hash(path, total_size):
+    """SHA-256 of the assembled file.
+
+    Chunks may land on any worker in any order, so the hash is taken from
+    disk once every range has arrived rather than carried between requests.
+    """
+    hasher = hashlib.sha256()
+    offset = 0
+    with open(path, 'rb') as f:
+        while offset < total_size:
+            block = f.read(min(COPY_BLOCK_SIZE, total_size - offset))
+            if not block:
+                break
+            hasher.update(block)
+            offset += len(block)
+    return hasher.hexdigest()
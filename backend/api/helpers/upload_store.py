@@ -0,0 +1,113 @@
+import hashlib
+import os
+import uuid
+
+from flask import current_app
+
+from models import UploadedFile
+
+# Uploads are copied to disk in blocks of this size while being hashed
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# How many earlier uploads of the same bytes are searched for a reusable result
+RESULT_LOOKUP_LIMIT = 20
+
+
+def upload_folder():
+    return current_app.config.get('UPLOAD_FOLDER', 'uploads')
+
+
+def blob_path(checksum, filename):
+    """Content-addressed location of an upload: ``<uploads>/blobs/ab/<sha256>.<ext>``.
+
+    The extension is kept because Foundry and the local ingest pick a parser from it.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return os.path.join(upload_folder(), 'blobs', checksum[:2], f'{checksum}{extension}')
+
+
+def commit_blob(tmp_path, checksum, filename):
+    """Move a fully written temp file into the blob store.
+
+    Returns ``(file_path, reused)``; when a blob with the same content already
+    exists the temp file is dropped and the existing blob is reused.
+    """
+    path = blob_path(checksum, filename)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return path, True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return path, False
+
+
+def store_upload(stream, filename):
+    """Stream an upload to disk while hashing it; identical bytes share one blob.
+
+    Returns ``(file_path, checksum, size, reused)``.
+    """
+    tmp_dir = os.path.join(upload_folder(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f'{uuid.uuid4()}.part')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(COPY_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                size += len(block)
+        checksum = digest.hexdigest()
+        file_path, reused = commit_blob(tmp_path, checksum, filename)
+        return file_path, checksum, size, reused
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def find_cached_result(checksum, key):
+    """A processing result stored on an earlier upload of the same bytes, if any"""
+    if not checksum:
+        return None
+    candidates = UploadedFile.query.filter(
+        UploadedFile.checksum == checksum,
+        UploadedFile.file_metadata.isnot(None)
+    ).order_by(UploadedFile.created_at.desc()).limit(RESULT_LOOKUP_LIMIT).all()
+    for candidate in candidates:
+        result = (candidate.file_metadata or {}).get('results', {}).get(key)
+        if result is not None:
+            return result
+    return None
+
+
+def save_result(uploaded_file, key, result):
+    """Remember a processing result on the upload so re-uploads can reuse it (caller commits)"""
+    metadata = dict(uploaded_file.file_metadata or {})
+    results = dict(metadata.get('results') or {})
+    results[key] = result
+    metadata['results'] = results
+    # Reassign so SQLAlchemy notices the JSON change
+    uploaded_file.file_metadata = metadata
+
+
+def find_processed_twin(uploaded_file, matches=None):
+    """An earlier, fully processed upload of the same bytes and content type.
+
+    ``matches(candidate)`` can narrow the choice further, e.g. to uploads
+    processed with the same settings.
+    """
+    if not uploaded_file.checksum:
+        return None
+    candidates = UploadedFile.query.filter(
+        UploadedFile.checksum == uploaded_file.checksum,
+        UploadedFile.content_type == uploaded_file.content_type,
+        UploadedFile.is_processed.is_(True),
+        UploadedFile.id != uploaded_file.id
+    ).order_by(UploadedFile.created_at.desc()).limit(RESULT_LOOKUP_LIMIT).all()
+    for candidate in candidates:
+        if matches is None or matches(candidate):
+            return candidate
+    return None
@@ -0,0 +1,81 @@
+import numpy as np
+
+METRICS = ('cosine', 'euclidean', 'dot_product')
+
+
+def as_matrix(vectors, dtype=np.float32):
+    """Stack one vector or a list of vectors into a contiguous 2-D array"""
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype=dtype))
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.ndim != 2:
+        raise ValueError('Embeddings must be a vector or a list of equal-length vectors')
+    return matrix
+
+
+def normalize_rows(matrix):
+    """L2-normalize each row; zero rows stay zero instead of becoming NaN"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def score_matrix(queries, candidates, metric='cosine'):
+    """Score every query against every candidate in one pass.
+
+    ``queries`` is (q, d) and ``candidates`` is (n, d); returns a (q, n)
+    float32 matrix where higher always means more similar (euclidean
+    distance is mapped to ``1 / (1 + distance)``).
+    """
+    if queries.shape[1] != candidates.shape[1]:
+        raise ValueError(f'Dimension mismatch: query has {queries.shape[1]}, embeddings have {candidates.shape[1]}')
+
+    if metric == 'cosine':
+        return normalize_rows(queries) @ normalize_rows(candidates).T
+    if metric == 'dot_product':
+        return queries @ candidates.T
+    if metric == 'euclidean':
+        # |q - c|^2 = |q|^2 + |c|^2 - 2 q.c
+        squared = (
+            np.einsum('ij,ij->i', queries, queries)[:, None]
+            + np.einsum('ij,ij->i', candidates, candidates)[None, :]
+            - 2.0 * (queries @ candidates.T)
+        )
+        np.maximum(squared, 0.0, out=squared)
+        return 1.0 / (1.0 + np.sqrt(squared))
+    raise ValueError(f'Unsupported metric: {metric}')
+
+
+def top_k(scores, k):
+    """Best ``k`` columns of each row of ``scores``, highest first.
+
+    Uses ``argpartition`` so only the selected k entries are sorted rather
+    than the whole row. Returns ``(indices, values)``, each shaped (q, k).
+    """
+    scores = np.atleast_2d(scores)
+    n = scores.shape[1]
+    k = max(0, min(int(k), n))
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(n), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+    indices = np.take_along_axis(candidates, order, axis=1)
+    return indices, np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def search(queries, candidates, k=5, metric='cosine'):
+    """Top-k search of one or more query vectors against a candidate matrix.
+
+    Returns one list of ``{'index', 'similarity'}`` dicts per query.
+    """
+    scores = score_matrix(as_matrix(queries), as_matrix(candidates), metric)
+    indices, values = top_k(scores, k)
+    return [
+        [{'index': int(i), 'similarity': float(v)} for i, v in zip(row_indices, row_values)]
+        for row_indices, row_values in zip(indices, values)
+    ]
@@ -1,6 +1,9 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, UploadedFile
+from api.helpers.foundry_client import foundry
+from api.helpers.admission import AdmissionRejected, admission, prioritized, rejection_response
+from api.helpers.upload_store import find_cached_result, save_result, store_upload
 from werkzeug.utils import secure_filename
 import os
 import uuid
@@ -17,83 +20,112 @@ if not os.path.exists(UPLOAD_FOLDER):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@bp.route('/transcribe', methods=['POST'])
-def transcribe_audio():
-    """Transcribe audio file to text"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({
+def _get_or_save_upload():
+    """The recording named by a ``file_id`` form field (e.g. from a resumable upload), or the posted ``file`` saved as a new upload"""
+    file_id = request.form.get('file_id')
+    if file_id:
+        uploaded_file = db.session.get(UploadedFile, file_id)
+        if not uploaded_file or uploaded_file.content_type != 'audio':
+            return None, (jsonify({
                 'success': False,
-                'error': 'No file provided'
-            }), 400
+                'error': 'Audio file not found'
+            }), 404)
+        return uploaded_file, None
 
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({
-                'success': False,
-                'error': 'No file selected'
-            }), 400
+    if 'file' not in request.files:
+        return None, (jsonify({
+            'success': False,
+            'error': 'No file provided'
+        }), 400)
 
-        if not allowed_file(file.filename):
-            return jsonify({
-                'success': False,
-                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
-            }), 400
-
-        user_id = request.form.get('user_id') or str(uuid.uuid4())
-        filename = secure_filename(file.filename)
-        file_id = str(uuid.uuid4())
-        file_path = os.path.join(UPLOAD_FOLDER, f"{file_id}_{filename}")
-
-        # Save file
-        file.save(file_path)
-        file_size = os.path.getsize(file_path)
-
-        # Create database record
-        uploaded_file = UploadedFile(
-            id=file_id,
-            user_id=user_id,
-            filename=filename,
-            original_filename=file.filename,
-            file_path=file_path,
-            file_size=file_size,
-            file_type=file.content_type or 'audio/wav',
-            content_type='audio',
-            is_processed=False,
-            processing_status='uploaded'
-        )
-
-        db.session.add(uploaded_file)
-        db.session.commit()
-
-        # Call Foundry Local for transcription
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        payload = {
-            'audio_path': file_path,
-            'model': request.form.get('model', 'whisper-base')
-        }
-
-        response = requests.post(f'{foundry_url}/audio/transcribe', json=payload, headers=headers, timeout=300)
-
-        if response.status_code == 200:
-            result = response.json()
+    file = request.files['file']
+    if file.filename == '':
+        return None, (jsonify({
+            'success': False,
+            'error': 'No file selected'
+        }), 400)
+
+    if not allowed_file(file.filename):
+        return None, (jsonify({
+            'success': False,
+            'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400)
+
+    user_id = request.form.get('user_id') or str(uuid.uuid4())
+    filename = secure_filename(file.filename)
+
+    # Save file content-addressed; identical bytes share one blob
+    file_path, checksum, file_size, _ = store_upload(file.stream, filename)
+
+    # Create database record
+    uploaded_file = UploadedFile(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        filename=filename,
+        original_filename=file.filename,
+        file_path=file_path,
+        file_size=file_size,
+        file_type=file.content_type or 'audio/wav',
+        content_type='audio',
+        checksum=checksum,
+        is_processed=False,
+        processing_status='uploaded'
+    )
+
+    db.session.add(uploaded_file)
+    db.session.commit()
+    return uploaded_file, None
 
+@bp.route('/transcribe', methods=['POST'])
+@prioritized('batch')
+def transcribe_audio():
+    """Transcribe audio file to text"""
+    try:
+        model = request.form.get('model', 'whisper-base')
+
+        uploaded_file, error = _get_or_save_upload()
+        if error:
+            return error
+        file_id, file_path, checksum = uploaded_file.id, uploaded_file.file_path, uploaded_file.checksum
+
+        # The same recording was already transcribed with this model
+        result_key = f'transcription:{model}'
+        result = find_cached_result(checksum, result_key)
+        cached = result is not None
+
+        if not cached:
+            # Call Foundry Local for transcription
+            payload = {
+                'audio_path': file_path,
+                'model': model
+            }
+
+            with admission.acquire(model):
+                response = foundry.post('/audio/transcribe', json=payload)
+
+            if response.status_code == 200:
+                body = response.json()
+                result = {
+                    'text': body.get('text', ''),
+                    'language': body.get('language'),
+                    'duration': body.get('duration')
+                }
+
+        if result is not None:
             # Update file status
+            save_result(uploaded_file, result_key, result)
             uploaded_file.is_processed = True
+            uploaded_file.processed_at = datetime.utcnow()
             uploaded_file.processing_status = 'completed'
             db.session.commit()
 
             return jsonify({
                 'success': True,
-                'transcription': result.get('text', ''),
-                'language': result.get('language'),
-                'duration': result.get('duration'),
-                'file_id': file_id
+                'transcription': result['text'],
+                'language': result['language'],
+                'duration': result['duration'],
+                'file_id': file_id,
+                'cached': cached
             })
         else:
             # Processing failed
@@ -106,6 +138,8 @@ def transcribe_audio():
                 'message': response.text
             }), response.status_code
 
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except requests.exceptions.RequestException as e:
         db.session.rollback()
         return jsonify({
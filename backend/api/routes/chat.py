@@ -1,6 +1,14 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 import requests
 from models import db, Conversation, Message, User
+from api.helpers.foundry_client import foundry
+from api.helpers.foundry_health import foundry_health
+from api.helpers.streaming import SSE_HEADERS, iter_sse_json, sse_event, streaming_payload
+from api.helpers.pagination import CursorError, message_page
+from api.helpers.chat_context import build_context
+from api.helpers.chat_summary import schedule_summary
+from api.helpers.response_cache import response_cache
+from api.helpers.admission import AdmissionRejected, admission, prioritized, rejection_response
 from datetime import datetime
 import uuid
 
@@ -50,6 +58,7 @@ def create_chat():
         }), 500
 
 @bp.route('/chat/<conversation_id>', methods=['POST'])
+@prioritized('interactive')
 def send_message(conversation_id):
     """Send a message in a conversation and get AI response"""
     try:
@@ -66,6 +75,7 @@ def send_message(conversation_id):
         model = data.get('model', 'default-model')
         temperature = data.get('temperature', 0.7)
         max_tokens = data.get('max_tokens', 500)
+        stream = bool(data.get('stream', False))
 
         if messages:
             # OpenAI format - extract the last user message
@@ -107,39 +117,43 @@ def send_message(conversation_id):
         db.session.add(user_msg)
         db.session.commit()  # persist the user message before calling Foundry
 
-        # Get conversation history for context
-        messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
-        conversation_history = [
-            {'role': msg.role, 'content': msg.content}
-            for msg in messages[-10:]  # Last 10 messages for context
-        ]
+        # Rolling summary plus the newest messages that fit the model's context window
+        # after reserving max_tokens for the reply
+        conversation_history, context = build_context(conversation, model, max_tokens)
+
+        payload = {
+            'model': model,
+            'messages': conversation_history,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+
+        # A temperature-0 turn whose exact context was answered before is served from the
+        # response cache; the reply is still saved to the conversation
+        cache_status, cache_key, result = (None, None, None) if stream else response_cache.lookup(
+            '/v1/chat/completions', payload, request.headers
+        )
+        if result is not None:
+            return _complete_turn(conversation, model, result, context, cache_status)
 
         # Call Foundry Local API using OpenAI-compatible endpoint
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://127.0.0.1:56831')
-        from api.helpers.foundry import is_foundry_available
-        ok, _ = is_foundry_available(foundry_url)
-        if not ok:
+        if not foundry_health.is_available():
             db.session.rollback()
             return jsonify({
                 'success': False,
                 'error': 'Foundry Local unreachable',
                 'message': 'Foundry Local is not accessible at the configured FOUNDRY_BASE_URL'
             }), 503
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
 
-        payload = {
-            'model': model,
-            'messages': conversation_history,
-            'max_tokens': max_tokens,
-            'temperature': temperature
-        }
+        if stream:
+            return _stream_chat_completion(conversation, model, payload, context)
 
-        print('Sending payload to Foundry chat:', payload)
         try:
-            response = requests.post(f'{foundry_url}/v1/chat/completions', json=payload, headers=headers, timeout=60)
+            # Waits for one of the model's upstream slots, or fails fast with 429 when it is saturated
+            with admission.acquire(model):
+                response = foundry.post('/v1/chat/completions', json=payload)
+        except AdmissionRejected as e:
+            return rejection_response(e)
         except requests.exceptions.RequestException as e:
             print(f'Error contacting Foundry chat endpoint: {e}')
             db.session.rollback()
@@ -151,7 +165,6 @@ def send_message(conversation_id):
 
         # Robustly parse JSON result - Foundry instances sometimes return non-JSON or error text
         result = None
-        print(f'Foundry chat response status: {response.status_code}, text: {response.text[:1200]}')
         if response.status_code == 200:
             try:
                 result = response.json()
@@ -166,25 +179,8 @@ def send_message(conversation_id):
                     'message': str(parse_err),
                     'foundry_text': response.text
                 }), 500
-            ai_response = result.get('choices', [{}])[0].get('message', {}).get('content', '')
-
-            # Save AI response
-            ai_msg = Message(
-                conversation_id=conversation_id,
-                role='assistant',
-                content=ai_response,
-                model=model,
-                tokens_used=result.get('usage', {}).get('total_tokens')
-            )
-            db.session.add(ai_msg)
-            db.session.commit()
-
-            return jsonify({
-                'success': True,
-                'response': ai_response,
-                'conversation_id': conversation_id,
-                'usage': result.get('usage', {})
-            })
+            response_cache.put(cache_key, result)
+            return _complete_turn(conversation, model, result, context, cache_status)
         else:
             # Preserve response text for debugging
             db.session.rollback()
@@ -205,11 +201,129 @@ def send_message(conversation_id):
             'message': str(e)
         }), 500
 
+def _complete_turn(conversation, model, result, context, cache_status):
+    """Save the assistant reply from a Foundry (or cached) chat completion and build the response"""
+    ai_response = result.get('choices', [{}])[0].get('message', {}).get('content', '')
+
+    # Save AI response
+    ai_msg = Message(
+        conversation_id=conversation.id,
+        role='assistant',
+        content=ai_response,
+        model=model,
+        tokens_used=result.get('usage', {}).get('total_tokens')
+    )
+    db.session.add(ai_msg)
+    db.session.commit()
+    # Compact the history in the background, after this turn has finished with Foundry
+    schedule_summary(conversation, model, context)
+
+    return jsonify({
+        'success': True,
+        'response': ai_response,
+        'conversation_id': conversation.id,
+        'usage': result.get('usage', {}),
+        'context': context
+    }), 200, {'X-Cache': cache_status}
+
+def _stream_chat_completion(conversation, model, payload, context):
+    """Relay Foundry chat deltas to the client as Server-Sent Events.
+
+    Emits ``delta`` frames as tokens arrive and a final ``done`` frame with
+    usage. The assistant message is saved when the upstream stream ends or
+    the client disconnects, whichever comes first.
+    """
+    conversation_id = conversation.id
+    try:
+        # The model's slot is held until the stream ends
+        ticket = admission.acquire(model)
+    except AdmissionRejected as e:
+        return rejection_response(e)
+    try:
+        response = foundry.post('/v1/chat/completions', json=streaming_payload(payload), stream=True)
+    except requests.exceptions.RequestException as e:
+        ticket.release()
+        print(f'Error contacting Foundry chat endpoint: {e}')
+        return jsonify({
+            'success': False,
+            'error': 'Foundry Local unreachable',
+            'message': str(e)
+        }), 503
+
+    if response.status_code != 200:
+        ticket.release()
+        print(f"Foundry returned error status {response.status_code}: {response.text[:1000]}")
+        return jsonify({
+            'success': False,
+            'error': f'AI response failed: {response.status_code}',
+            'message': response.text
+        }), response.status_code
+
+    def generate():
+        parts = []
+        usage = {}
+        try:
+            yield sse_event({'conversation_id': conversation_id, 'model': model, 'context': context}, event='start')
+            for chunk in iter_sse_json(response):
+                if chunk.get('usage'):
+                    usage = chunk['usage']
+                for choice in chunk.get('choices') or []:
+                    delta = (choice.get('delta') or {}).get('content')
+                    if delta:
+                        parts.append(delta)
+                        yield sse_event({'delta': delta})
+            yield sse_event({
+                'success': True,
+                'conversation_id': conversation_id,
+                'response': ''.join(parts),
+                'usage': usage
+            }, event='done')
+        except requests.exceptions.RequestException as e:
+            print(f'Foundry chat stream interrupted: {e}')
+            yield sse_event({'success': False, 'error': 'Stream interrupted', 'message': str(e)}, event='error')
+        finally:
+            # Runs on normal completion and on GeneratorExit when the client goes away
+            response.close()
+            ticket.release()
+            if parts:
+                try:
+                    db.session.add(Message(
+                        conversation_id=conversation_id,
+                        role='assistant',
+                        content=''.join(parts),
+                        model=model,
+                        tokens_used=usage.get('total_tokens')
+                    ))
+                    db.session.commit()
+                except Exception as e:
+                    print(f'Failed to save streamed assistant message: {e}')
+                    db.session.rollback()
+                else:
+                    schedule_summary(conversation, model, context)
+
+    streamed = Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+    # A generator that never starts (client gone before the first byte) skips its finally block
+    streamed.call_on_close(ticket.release)
+    return streamed
+
 @bp.route('/chat/<conversation_id>/messages', methods=['GET'])
 def get_messages(conversation_id):
-    """Get all messages in a conversation"""
+    """Get a conversation's messages; ``limit``/``before``/``after`` page through long histories"""
     try:
-        messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
+        try:
+            messages, page = message_page(
+                conversation_id,
+                before=request.args.get('before'),
+                after=request.args.get('after'),
+                limit=request.args.get('limit'),
+                default_limit=current_app.config['MESSAGES_PAGE_SIZE'],
+                max_limit=current_app.config['MESSAGES_MAX_PAGE_SIZE']
+            )
+        except CursorError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
         return jsonify({
             'success': True,
@@ -221,7 +335,8 @@ def get_messages(conversation_id):
                 'model': msg.model,
                 'tokens_used': msg.tokens_used,
                 'created_at': msg.created_at.isoformat()
-            } for msg in messages]
+            } for msg in messages],
+            'page': page
         })
 
     except Exception as e:
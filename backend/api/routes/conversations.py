@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request, current_app
 from models import db, Conversation, Message
+from api.helpers.pagination import CursorError, keyset_page, message_page, parse_limit
 from datetime import datetime
 import uuid
 
@@ -7,17 +8,47 @@ bp = Blueprint('conversations', __name__)
 
 @bp.route('/conversations', methods=['GET'])
 def get_conversations():
-    """Get all conversations for a user"""
+    """Get a user's conversations, most recently updated first.
+
+    Without ``limit``/``cursor`` every conversation is returned, as the
+    sidebar expects. Otherwise it is paginated by ``(updated_at, id)``: pass
+    the returned ``next_cursor`` as ``cursor`` to get the next page.
+    ``limit`` defaults to CONVERSATIONS_PAGE_SIZE.
+    """
     try:
         user_id = request.args.get('user_id', 'demo-user')  # For demo purposes
-
-        conversations = Conversation.query.filter_by(user_id=user_id).order_by(Conversation.created_at.desc()).all()
+        cursor = request.args.get('cursor')
+
+        try:
+            # Message counts are joined in, so the whole listing is a single query
+            query = db.session.query(Conversation, db.func.count(Message.id)).outerjoin(
+                Message, Message.conversation_id == Conversation.id
+            ).filter(Conversation.user_id == user_id).group_by(Conversation.id)
+            if not cursor and request.args.get('limit') in (None, ''):
+                rows = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).all()
+                next_cursor = None
+            else:
+                limit = parse_limit(
+                    request.args.get('limit'),
+                    current_app.config['CONVERSATIONS_PAGE_SIZE'],
+                    current_app.config['CONVERSATIONS_MAX_PAGE_SIZE']
+                )
+                rows, next_cursor = keyset_page(
+                    query,
+                    Conversation.updated_at,
+                    Conversation.id,
+                    limit,
+                    cursor=cursor,
+                    key=lambda row: (row[0].updated_at, row[0].id)
+                )
+        except CursorError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
         conversations_data = []
-        for conv in conversations:
-            # Get message count for this conversation
-            message_count = Message.query.filter_by(conversation_id=conv.id).count()
-
+        for conv, message_count in rows:
             conversations_data.append({
                 'id': conv.id,
                 'title': conv.title,
@@ -29,7 +60,8 @@ def get_conversations():
 
         return jsonify({
             'success': True,
-            'conversations': conversations_data
+            'conversations': conversations_data,
+            'next_cursor': next_cursor
         })
 
     except Exception as e:
@@ -85,7 +117,7 @@ def create_conversation():
 
 @bp.route('/conversations/<conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
-    """Get a specific conversation with all its messages"""
+    """Get a specific conversation with its messages (all of them unless ``limit``/``before``/``after`` is given)"""
     try:
         conversation = Conversation.query.get(conversation_id)
 
@@ -95,7 +127,20 @@ def get_conversation(conversation_id):
                 'error': 'Conversation not found'
             }), 404
 
-        messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
+        try:
+            messages, page = message_page(
+                conversation_id,
+                before=request.args.get('before'),
+                after=request.args.get('after'),
+                limit=request.args.get('limit'),
+                default_limit=current_app.config['MESSAGES_PAGE_SIZE'],
+                max_limit=current_app.config['MESSAGES_MAX_PAGE_SIZE']
+            )
+        except CursorError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
 
         messages_data = []
         for msg in messages:
@@ -115,9 +160,12 @@ def get_conversation(conversation_id):
                 'title': conversation.title,
                 'model_used': conversation.model_used,
                 'created_at': conversation.created_at.isoformat(),
-                'updated_at': conversation.updated_at.isoformat()
+                'updated_at': conversation.updated_at.isoformat(),
+                'summary': conversation.summary,
+                'summarized_until': conversation.summarized_until.isoformat() if conversation.summarized_until else None
             },
-            'messages': messages_data
+            'messages': messages_data,
+            'page': page
         })
 
     except Exception as e:
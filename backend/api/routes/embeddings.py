@@ -1,11 +1,15 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, AIModel
+from api.helpers.admission import AdmissionRejected, prioritized, rejection_response
+from api.helpers.embeddings import EmbeddingError, embed_texts
+from api.helpers import vector_search
 import numpy as np
 
 bp = Blueprint('embeddings', __name__)
 
 @bp.route('/embeddings', methods=['POST'])
+@prioritized('standard')
 def create_embeddings():
     """Create embeddings for input text"""
     try:
@@ -30,7 +34,7 @@ def create_embeddings():
         # Validate input types
         if isinstance(input_text, str):
             input_texts = [input_text]
-        elif isinstance(input_text, list):
+        elif isinstance(input_text, list) and all(isinstance(t, str) for t in input_text):
             input_texts = input_text
         else:
             return jsonify({
@@ -51,39 +55,32 @@ def create_embeddings():
             db.session.add(ai_model)
             db.session.commit()
 
-        # Call Foundry Local API
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        payload = {
-            'model': model,
-            'input': input_texts
-        }
-
-        response = requests.post(f'{foundry_url}/v1/embeddings', json=payload, headers=headers, timeout=30)
-
-        if response.status_code == 200:
-            result = response.json()
-
-            # Update model usage
-            ai_model.last_used_at = db.func.now()
-            db.session.commit()
-
-            return jsonify({
-                'success': True,
-                'data': result.get('data', []),
-                'model': model,
-                'usage': result.get('usage', {})
-            })
-        else:
+        # Repeated texts are served from the embedding cache; only misses reach Foundry
+        try:
+            vectors, usage, cached = embed_texts(model, input_texts)
+        except EmbeddingError as e:
             return jsonify({
                 'success': False,
-                'error': f'Embedding generation failed: {response.status_code}',
-                'message': response.text
-            }), response.status_code
+                'error': f'Embedding generation failed: {e.status_code}',
+                'message': e.message
+            }), e.status_code
+        except AdmissionRejected as e:
+            return rejection_response(e)
+
+        # Update model usage
+        ai_model.last_used_at = db.func.now()
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'data': [
+                {'object': 'embedding', 'index': i, 'embedding': vector.tolist()}
+                for i, vector in enumerate(vectors)
+            ],
+            'model': model,
+            'usage': usage,
+            'cached': cached
+        })
 
     except requests.exceptions.RequestException as e:
         return jsonify({
@@ -155,7 +152,11 @@ def calculate_similarity():
 
 @bp.route('/embeddings/search', methods=['POST'])
 def search_similar():
-    """Search for similar embeddings (simplified version)"""
+    """Search for similar embeddings.
+
+    Accepts a single ``query_embedding`` or a batch of ``query_embeddings``;
+    every query is scored against all candidates in one vectorized pass.
+    """
     try:
         data = request.get_json()
 
@@ -166,43 +167,41 @@ def search_similar():
             }), 400
 
         query_embedding = data.get('query_embedding')
+        query_embeddings = data.get('query_embeddings')
         embeddings = data.get('embeddings', [])
         top_k = data.get('top_k', 5)
         metric = data.get('metric', 'cosine')
 
-        if not query_embedding or not embeddings:
+        if (not query_embedding and not query_embeddings) or not embeddings:
             return jsonify({
                 'success': False,
                 'error': 'Query embedding and embeddings array are required'
             }), 400
 
-        query_vec = np.array(query_embedding)
-        similarities = []
-
-        for i, emb in enumerate(embeddings):
-            emb_vec = np.array(emb)
-
-            if metric == 'cosine':
-                similarity = np.dot(query_vec, emb_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(emb_vec))
-            elif metric == 'euclidean':
-                distance = np.linalg.norm(query_vec - emb_vec)
-                similarity = 1 / (1 + distance)
-            elif metric == 'dot_product':
-                similarity = np.dot(query_vec, emb_vec)
-            else:
-                continue
-
-            similarities.append({
-                'index': i,
-                'similarity': float(similarity)
-            })
+        if metric not in vector_search.METRICS:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported metric: {metric}'
+            }), 400
 
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
+        try:
+            results = vector_search.search(
+                query_embeddings if query_embeddings else query_embedding,
+                embeddings,
+                k=top_k,
+                metric=metric
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid embeddings',
+                'message': str(e)
+            }), 400
 
         return jsonify({
             'success': True,
-            'results': similarities[:top_k],
+            # Batched queries get one result list each; a single query keeps the flat list
+            'results': results if query_embeddings else results[0],
             'metric': metric
         })
 
@@ -211,4 +210,4 @@ def search_similar():
             'success': False,
             'error': 'Search failed',
             'message': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
@@ -1,9 +1,16 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 import requests
+import json
+from api.helpers.foundry_client import foundry
+from api.helpers.embeddings import EmbeddingError, embed_texts
+from api.helpers.response_cache import response_cache
+from api.helpers.admission import AdmissionRejected, admission, prioritized, rejection_response
+from api.helpers.streaming import SSE_HEADERS, iter_sse_lines, sse_event, streaming_payload
 
 bp = Blueprint('generate', __name__)
 
 @bp.route('/generate', methods=['POST'])
+@prioritized('standard')
 def generate_text():
     """Generate text using a Foundry Local model"""
     try:
@@ -33,12 +40,6 @@ def generate_text():
                 'error': 'Prompt is required'
             }), 400
 
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
         payload = {
             'model': model,
             'prompt': prompt,
@@ -47,16 +48,21 @@ def generate_text():
             'stream': stream
         }
 
-        response = requests.post(f'{foundry_url}/v1/completions', json=payload, headers=headers, timeout=60)
+        if stream:
+            return _stream_completion(model, payload)
+
+        # Byte-identical temperature-0 requests are answered from the response cache
+        cache_status, cache_key, result = response_cache.lookup('/v1/completions', payload, request.headers)
+        if result is not None:
+            return _completion_response(model, result), 200, {'X-Cache': cache_status}
+
+        with admission.acquire(model):
+            response = foundry.post('/v1/completions', json=payload)
 
         if response.status_code == 200:
             result = response.json()
-            return jsonify({
-                'success': True,
-                'generated_text': result.get('text', ''),
-                'model': model,
-                'usage': result.get('usage', {})
-            })
+            response_cache.put(cache_key, result)
+            return _completion_response(model, result), 200, {'X-Cache': cache_status}
         else:
             return jsonify({
                 'success': False,
@@ -64,6 +70,8 @@ def generate_text():
                 'message': response.text
             }), response.status_code
 
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except requests.exceptions.RequestException as e:
         return jsonify({
             'success': False,
@@ -77,7 +85,67 @@ def generate_text():
             'message': str(e)
         }), 500
 
+def _completion_response(model, result):
+    return jsonify({
+        'success': True,
+        'generated_text': result.get('text', ''),
+        'model': model,
+        'usage': result.get('usage', {})
+    })
+
+def _stream_completion(model, payload):
+    """Relay Foundry completion chunks to the client unchanged as they arrive.
+
+    Each upstream ``data:`` frame is forwarded as-is; nothing is accumulated
+    in Flask. Foundry is asked to append its token usage to the stream, and
+    a final ``usage`` event carries it (``null`` when Foundry doesn't report
+    it) along with the number of content chunks relayed, before ``[DONE]``.
+    """
+    # The model's slot is held until the stream ends
+    ticket = admission.acquire(model)
+    try:
+        response = foundry.post('/v1/completions', json=streaming_payload(payload), stream=True)
+    except Exception:
+        ticket.release()
+        raise
+    if response.status_code != 200:
+        ticket.release()
+        return jsonify({
+            'success': False,
+            'error': f'Generation failed: {response.status_code}',
+            'message': response.text
+        }), response.status_code
+
+    def generate():
+        usage = None
+        chunks = 0
+        try:
+            for data in iter_sse_lines(response):
+                try:
+                    frame = json.loads(data)
+                except ValueError:
+                    frame = None
+                if isinstance(frame, dict):
+                    usage = frame.get('usage') or usage
+                    # The usage chunk carries no choices and isn't content
+                    if frame.get('choices'):
+                        chunks += 1
+                yield f'data: {data}\n\n'
+            yield sse_event({'model': model, 'usage': usage, 'chunks': chunks}, event='usage')
+            yield 'data: [DONE]\n\n'
+        except requests.exceptions.RequestException as e:
+            yield sse_event({'success': False, 'error': 'Stream interrupted', 'message': str(e)}, event='error')
+        finally:
+            response.close()
+            ticket.release()
+
+    streamed = Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+    # A generator that never starts (client gone before the first byte) skips its finally block
+    streamed.call_on_close(ticket.release)
+    return streamed
+
 @bp.route('/embeddings', methods=['POST'])
+@prioritized('standard')
 def generate_embeddings():
     """Generate embeddings for text using a Foundry Local model"""
     try:
@@ -104,32 +172,32 @@ def generate_embeddings():
                 'error': 'Input text is required'
             }), 400
 
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        payload = {
-            'model': model,
-            'input': input_text
-        }
-
-        response = requests.post(f'{foundry_url}/v1/embeddings', json=payload, headers=headers, timeout=30)
-
-        if response.status_code == 200:
-            result = response.json()
+        input_texts = [input_text] if isinstance(input_text, str) else input_text
+        if not isinstance(input_texts, list) or not all(isinstance(t, str) for t in input_texts):
             return jsonify({
-                'success': True,
-                'embeddings': result.get('embeddings', []),
-                'model': model
-            })
-        else:
+                'success': False,
+                'error': 'Input must be a string or array of strings'
+            }), 400
+
+        # Served through the shared embedding cache; only misses reach Foundry
+        try:
+            vectors, usage, cached = embed_texts(model, input_texts)
+        except EmbeddingError as e:
             return jsonify({
                 'success': False,
-                'error': f'Embedding generation failed: {response.status_code}',
-                'message': response.text
-            }), response.status_code
+                'error': f'Embedding generation failed: {e.status_code}',
+                'message': e.message
+            }), e.status_code
+        except AdmissionRejected as e:
+            return rejection_response(e)
+
+        return jsonify({
+            'success': True,
+            'embeddings': [vector.tolist() for vector in vectors],
+            'model': model,
+            'usage': usage,
+            'cached': cached
+        })
 
     except requests.exceptions.RequestException as e:
         return jsonify({
@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, AIModel
+from api.helpers.foundry_client import foundry
 
 bp = Blueprint('list_models', __name__)
 
@@ -197,14 +198,8 @@ def get_model_details(model_id):
 
         if model:
             # Try to get additional details from Foundry Local
-            foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-            headers = {}
-            api_key = current_app.config.get('FOUNDRY_API_KEY')
-            if api_key:
-                headers['Authorization'] = f'Bearer {api_key}'
-
             try:
-                response = requests.get(f'{foundry_url}/models/{model_id}', headers=headers, timeout=10)
+                response = foundry.get(f'/models/{model_id}')
                 if response.status_code == 200:
                     foundry_details = response.json()
                     # Merge foundry details with our database info
@@ -1,6 +1,8 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, AIModel
+from api.helpers.foundry_client import foundry
+from api.helpers.foundry_health import foundry_health
 
 bp = Blueprint('stop_model', __name__)
 
@@ -8,10 +10,7 @@ bp = Blueprint('stop_model', __name__)
 def stop_model(model_id):
     """Stop/unload a model from Foundry Local"""
     try:
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        from api.helpers.foundry import is_foundry_available
-        ok, _ = is_foundry_available(foundry_url)
-        if not ok:
+        if not foundry_health.is_available():
             # Fallback: mark inactive in DB and return warning
             model = AIModel.query.filter_by(model_id=model_id).first()
             if model:
@@ -23,16 +22,11 @@ def stop_model(model_id):
                 'status': 'stopped-db-only',
                 'warning': 'Foundry Local unreachable: model marked inactive in DB only'
             }), 200
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
         payload = {'model': model_id}
 
-        print(f"Stopping model via Foundry: url={foundry_url}/models/stop, payload={payload}")
+        print(f"Stopping model via Foundry: url={foundry.url('/models/stop')}, payload={payload}")
         try:
-            response = requests.post(f'{foundry_url}/models/stop', json=payload, headers=headers, timeout=30)
+            response = foundry.post('/models/stop', json=payload)
         except requests.exceptions.RequestException as e:
             print(f"Error sending stop request to Foundry: {e}")
             # Fallback to DB: mark inactive and return helpful message (200 OK with warning)
@@ -89,13 +83,7 @@ def stop_model(model_id):
 def list_running_models():
     """List currently running/loaded models in Foundry Local"""
     try:
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        response = requests.get(f'{foundry_url}/models/running', headers=headers, timeout=10)
+        response = foundry.get('/models/running')
 
         if response.status_code == 200:
             result = response.json()
@@ -1,11 +1,19 @@
 from flask import Blueprint, jsonify, request, current_app
 import requests
 from models import db, RAGDocument, UploadedFile
-import numpy as np
+from api.helpers.foundry_client import foundry
+from api.helpers.admission import AdmissionRejected, admission, prioritized, rejection_response
+from api.helpers.rag_index import corpus_version, rag_files, rag_index
+from api.helpers.rag_ann import ann_index
+from api.helpers.embeddings import EmbeddingError, embed_texts
+from api.helpers.answer_cache import answer_cache
+from api.helpers.response_cache import bypass_requested
+from datetime import datetime, timezone
 
 bp = Blueprint('query_rag', __name__)
 
 @bp.route('/query', methods=['POST'])
+@prioritized('interactive')
 def query_rag():
     """Query the RAG system with a question"""
     try:
@@ -31,53 +39,51 @@ def query_rag():
         # Get relevant documents
         query_embedding = None
 
-        # First, get embedding for the question
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
+        # First, get embedding for the question (repeat questions come from the embedding cache)
+        try:
+            vectors, _, _ = embed_texts(current_app.config['RAG_EMBEDDING_MODEL'], [question], path='/embeddings')
+            query_embedding = vectors[0]
+        except EmbeddingError as e:
+            print(f'Question embedding failed: {e.status_code} {e.message[:200]}')
 
-        embed_payload = {
-            'model': 'embedding-model',  # Assuming default embedding model
-            'input': [question]
-        }
-
-        embed_response = requests.post(f'{foundry_url}/embeddings', json=embed_payload, headers=headers, timeout=30)
-
-        if embed_response.status_code == 200:
-            embed_result = embed_response.json()
-            query_embedding = embed_result.get('data', [{}])[0].get('embedding')
-
-        if not query_embedding:
+        if query_embedding is None:
             return jsonify({
                 'success': False,
                 'error': 'Failed to generate question embedding'
             }), 500
 
-        # Find similar documents using vector similarity
-        query_vec = np.array(query_embedding)
-
-        # Get all RAG documents (or filter by file_ids)
-        query = RAGDocument.query
-        if file_ids:
-            query = query.filter(RAGDocument.file_id.in_(file_ids))
-
-        documents = query.all()
-
-        similarities = []
-        for doc in documents:
-            if doc.embedding:
-                doc_vec = np.array(doc.embedding)
-                similarity = np.dot(query_vec, doc_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(doc_vec))
-                similarities.append({
-                    'document': doc,
-                    'similarity': float(similarity)
-                })
+        # A paraphrase of an earlier question over the same files and model reuses its answer, as long
+        # as none of the files has been processed since; answers over files still processing aren't cached
+        files = rag_files(file_ids)
+        if not file_ids:
+            # The complete set of processed documents: rows of files deleted since can be dropped
+            rag_index.prune(files)
+        version = corpus_version(files)
+        scope = answer_cache.scope_key(model, current_app.config['RAG_EMBEDDING_MODEL'], top_k, file_ids, version)
+        cache_status = 'BYPASS' if bypass_requested(request.headers) or version is None else 'MISS'
+        cached = answer_cache.lookup(scope, query_embedding) if cache_status == 'MISS' else None
+        if cached is not None:
+            response, similarity, cached_question = cached
+            return jsonify(dict(
+                response,
+                usage={},
+                cached=True,
+                cached_question=cached_question,
+                cache_similarity=round(similarity, 4)
+            )), 200, {'X-Cache': 'HIT'}
 
-        # Sort by similarity and get top_k
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        top_documents = similarities[:top_k]
+        # Find similar documents using the in-memory vector index (or the ANN index for big corpora)
+        matches, index_used = _retrieve(query_embedding, top_k, files, data.get('index', 'auto'), data.get('nprobe'))
+        documents = _load_documents(matches)
+        if index_used == 'ivf' and len(documents) < len(matches):
+            # The IVF index still lists chunks that have since been deleted; answer from the exact index
+            matches, index_used = rag_index.search(query_embedding, k=top_k, files=files), 'exact'
+            documents = _load_documents(matches)
+        top_documents = [
+            {'document': documents[doc_id], 'similarity': similarity}
+            for doc_id, similarity in matches
+            if doc_id in documents
+        ]
 
         # Prepare context from top documents
         context_parts = []
@@ -104,7 +110,8 @@ def query_rag():
             'temperature': 0.3
         }
 
-        chat_response = requests.post(f'{foundry_url}/chat/completions', json=chat_payload, headers=headers, timeout=60)
+        with admission.acquire(model):
+            chat_response = foundry.post('/chat/completions', json=chat_payload)
 
         if chat_response.status_code == 200:
             chat_result = chat_response.json()
@@ -112,9 +119,13 @@ def query_rag():
 
             # Prepare sources information
             sources = []
+            source_file_ids = {item['document'].file_id for item in top_documents}
+            uploaded_files = {
+                f.id: f for f in UploadedFile.query.filter(UploadedFile.id.in_(source_file_ids)).all()
+            } if source_file_ids else {}
             for item in top_documents:
                 doc = item['document']
-                uploaded_file = UploadedFile.query.get(doc.file_id)
+                uploaded_file = uploaded_files.get(doc.file_id)
                 sources.append({
                     'file_id': doc.file_id,
                     'filename': uploaded_file.filename if uploaded_file else 'Unknown',
@@ -123,13 +134,17 @@ def query_rag():
                     'content_preview': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content
                 })
 
-            return jsonify({
+            response = {
                 'success': True,
                 'answer': answer,
                 'sources': sources,
                 'context_used': len(top_documents),
+                'index': index_used,
                 'usage': chat_result.get('usage', {})
-            })
+            }
+            if version is not None:
+                answer_cache.put(scope, query_embedding, question, response)
+            return jsonify(dict(response, cached=False)), 200, {'X-Cache': cache_status}
         else:
             return jsonify({
                 'success': False,
@@ -137,6 +152,8 @@ def query_rag():
                 'message': chat_response.text
             }), chat_response.status_code
 
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except requests.exceptions.RequestException as e:
         return jsonify({
             'success': False,
@@ -150,6 +167,49 @@ def query_rag():
             'message': str(e)
         }), 500
 
+def _retrieve(query_embedding, top_k, files, index_type='auto', nprobe=None):
+    """Top-k chunk ids for a question embedding over ``files`` (a ``rag_files()`` mapping).
+
+    ``index_type`` is ``exact``, ``ivf`` or ``auto``; auto uses the persisted
+    IVF index only once it holds RAG_ANN_MIN_VECTORS vectors, since exact
+    search is both fast enough and perfectly accurate below that.
+    """
+    ann = ann_index.get() if index_type in ('auto', 'ivf') else None
+    use_ann = ann is not None and (
+        index_type == 'ivf' or len(ann) >= current_app.config.get('RAG_ANN_MIN_VECTORS', 200000)
+    )
+    if not use_ann:
+        return rag_index.search(query_embedding, k=top_k, files=files), 'exact'
+
+    # Files processed after the build (or still processing) are missing or partial in the index:
+    # search those exactly and merge
+    built = datetime.fromtimestamp(ann.built_at, timezone.utc).replace(tzinfo=None)
+    missing = {
+        file_id: processed_at for file_id, processed_at in files.items()
+        if processed_at is None or processed_at > built or file_id not in ann.indexed_files
+    }
+    covered = [file_id for file_id in files if file_id not in missing]
+    nprobe = nprobe or current_app.config.get('RAG_ANN_NPROBE', 8)
+    matches = []
+    if covered:
+        # Files the index holds but the query doesn't cover (discarded, reprocessed, filtered out) are masked
+        mask = None if ann.indexed_files.issubset(covered) else covered
+        matches = ann.search(query_embedding, k=top_k, nprobe=nprobe, file_ids=mask)
+    if missing:
+        matches = matches + rag_index.search(query_embedding, k=top_k, files=missing)
+        matches.sort(key=lambda item: item[1], reverse=True)
+        matches = matches[:top_k]
+    return matches, 'ivf'
+
+def _load_documents(matches):
+    """The matched chunks by id; only the selected chunks are read from the database"""
+    if not matches:
+        return {}
+    return {
+        doc.id: doc
+        for doc in RAGDocument.query.filter(RAGDocument.id.in_([doc_id for doc_id, _ in matches])).all()
+    }
+
 @bp.route('/stats/<user_id>', methods=['GET'])
 def get_rag_stats(user_id):
     """Get RAG statistics for a user"""
@@ -168,9 +228,7 @@ def get_rag_stats(user_id):
         ).count()
 
         # Count total chunks
-        total_chunks = db.session.query(db.func.sum(
-            db.func.array_length(RAGDocument.__table__.c.embedding, 1)
-        )).filter(
+        total_chunks = db.session.query(db.func.count(RAGDocument.id)).filter(
             RAGDocument.file_id.in_(
                 db.session.query(UploadedFile.id).filter_by(
                     user_id=user_id,
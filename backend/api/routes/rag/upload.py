@@ -1,6 +1,14 @@
 from flask import Blueprint, jsonify, request, current_app
-import requests
-from models import db, UploadedFile, RAGDocument
+from models import db, UploadedFile, ProcessingJob
+from api.helpers.foundry_client import foundry
+from api.helpers.answer_cache import answer_cache
+from api.helpers.rag_index import rag_index
+from api.helpers.embeddings import EmbeddingError
+from api.helpers.rag_ingest import (
+    ChunkWriter, IngestError, committed_chunks, copy_chunks, ingest_file, ingest_settings, record_settings
+)
+from api.helpers.upload_store import find_processed_twin, store_upload
+from api.helpers.job_queue import PermanentJobError, job_queue
 from werkzeug.utils import secure_filename
 import os
 import uuid
@@ -43,13 +51,9 @@ def upload_rag_document():
         user_id = request.form.get('user_id') or str(uuid.uuid4())  # Temporary for demo
         filename = secure_filename(file.filename)
         file_id = str(uuid.uuid4())
-        file_path = os.path.join(UPLOAD_FOLDER, f"{file_id}_{filename}")
 
-        # Save file
-        file.save(file_path)
-
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # Save file content-addressed; identical bytes share one blob
+        file_path, checksum, file_size, reused = store_upload(file.stream, filename)
 
         # Create database record
         uploaded_file = UploadedFile(
@@ -61,6 +65,7 @@ def upload_rag_document():
             file_size=file_size,
             file_type=file.content_type or 'application/octet-stream',
             content_type='document',
+            checksum=checksum,
             is_processed=False,
             processing_status='uploaded'
         )
@@ -73,6 +78,8 @@ def upload_rag_document():
             'file_id': file_id,
             'filename': filename,
             'file_size': file_size,
+            'checksum': checksum,
+            'deduplicated': reused,
             'message': 'File uploaded successfully'
         })
 
@@ -86,9 +93,9 @@ def upload_rag_document():
 
 @bp.route('/process/<file_id>', methods=['POST'])
 def process_rag_document(file_id):
-    """Process an uploaded document for RAG"""
+    """Queue an uploaded document for RAG processing; poll /jobs/<job_id> for progress"""
     try:
-        uploaded_file = UploadedFile.query.get(file_id)
+        uploaded_file = db.session.get(UploadedFile, file_id)
 
         if not uploaded_file:
             return jsonify({
@@ -102,68 +109,31 @@ def process_rag_document(file_id):
                 'error': 'File already processed'
             }), 400
 
-        # Update processing status
-        uploaded_file.processing_status = 'processing'
-        db.session.commit()
-
-        # Call Foundry Local to process the document
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        payload = {
-            'file_path': uploaded_file.file_path,
-            'file_type': uploaded_file.file_type
-        }
-
-        response = requests.post(f'{foundry_url}/rag/process', json=payload, headers=headers, timeout=120)
-
-        if response.status_code == 200:
-            result = response.json()
-            chunks = result.get('chunks', [])
-
-            # Save chunks to database
-            for i, chunk in enumerate(chunks):
-                rag_doc = RAGDocument(
-                    file_id=file_id,
-                    chunk_index=i,
-                    content=chunk.get('content', ''),
-                    metadata=chunk.get('metadata', {}),
-                    embedding=chunk.get('embedding')
-                )
-                db.session.add(rag_doc)
-
-            # Update file status
-            uploaded_file.is_processed = True
-            uploaded_file.processing_status = 'completed'
-            db.session.commit()
-
-            return jsonify({
-                'success': True,
-                'file_id': file_id,
-                'chunks_processed': len(chunks),
-                'message': 'Document processed successfully for RAG'
-            })
-        else:
-            # Processing failed
-            uploaded_file.processing_status = 'failed'
-            db.session.commit()
-
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode') or current_app.config.get('RAG_INGEST_MODE', 'local')
+        if mode not in ('local', 'foundry'):
             return jsonify({
                 'success': False,
-                'error': f'Processing failed: {response.status_code}',
-                'message': response.text
-            }), response.status_code
+                'error': "Mode must be 'local' or 'foundry'"
+            }), 400
+
+        # A file already waiting or being processed keeps its job instead of getting a second one
+        job = job_queue.active_job_for_file(file_id)
+        if job is None:
+            options = {key: data[key] for key in ('embedding_model', 'chunk_size', 'chunk_overlap') if key in data}
+            options['mode'] = mode
+            uploaded_file.processing_status = 'queued'
+            job = job_queue.enqueue('rag_process', uploaded_file.user_id, file_id=file_id, payload=options)
 
-    except requests.exceptions.RequestException as e:
-        db.session.rollback()
         return jsonify({
-            'success': False,
-            'error': 'Connection error',
-            'message': str(e)
-        }), 500
+            'success': True,
+            'job_id': job.id,
+            'file_id': file_id,
+            'status': job.status,
+            'status_url': f'/api/rag/jobs/{job.id}',
+            'message': 'Document queued for RAG processing'
+        }), 202
+
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -172,6 +142,117 @@ def process_rag_document(file_id):
             'message': str(e)
         }), 500
 
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_processing_job(job_id):
+    """Status of a RAG processing job"""
+    job = db.session.get(ProcessingJob, job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+
+    uploaded_file = db.session.get(UploadedFile, job.file_id) if job.file_id else None
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'job_type': job.job_type,
+        'file_id': job.file_id,
+        'status': job.status,
+        'processing_status': uploaded_file.processing_status if uploaded_file else None,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'result': job.result,
+        'error': job.error_message,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+        'retry_at': job.run_after.isoformat() if job.status == 'queued' and job.attempts else None
+    })
+
+def _run_processing_job(job):
+    """Job handler: ingest the file locally or through Foundry's /rag/process"""
+    uploaded_file = db.session.get(UploadedFile, job.file_id)
+    if not uploaded_file:
+        raise PermanentJobError('File not found')
+    if uploaded_file.is_processed:
+        return {'chunks_processed': committed_chunks(uploaded_file.id), 'skipped': True}
+
+    options = job.payload or {}
+    mode = options.get('mode', 'local')
+    try:
+        settings = ingest_settings(mode, options.get('embedding_model'), options.get('chunk_size'), options.get('chunk_overlap'))
+    except (TypeError, ValueError) as e:
+        raise PermanentJobError(f'Invalid chunking options: {e}')
+    uploaded_file.processing_status = 'processing'
+    db.session.commit()
+
+    result = {'mode': mode}
+    # Identical bytes already processed with the same settings: copy their chunks instead of re-embedding
+    twin = find_processed_twin(uploaded_file, lambda candidate: (candidate.file_metadata or {}).get('ingest') == settings)
+    if twin is not None:
+        record_settings(uploaded_file, settings)
+        chunks_processed = copy_chunks(twin.id, uploaded_file)
+        result['reused_from'] = twin.id
+    elif mode == 'local':
+        try:
+            chunks_processed = ingest_file(uploaded_file, settings)
+        except (IngestError, ValueError) as e:
+            raise PermanentJobError(str(e))
+        except EmbeddingError as e:
+            if e.status_code < 500:
+                raise PermanentJobError(f'Embedding generation failed: {e.status_code} {e.message}')
+            raise
+    else:
+        record_settings(uploaded_file, settings)
+        chunks_processed = _process_with_foundry(uploaded_file)
+
+    uploaded_file.is_processed = True
+    uploaded_file.processed_at = datetime.utcnow()
+    uploaded_file.processing_status = 'completed'
+    job_queue.heartbeat()
+    db.session.commit()
+
+    # Other workers see the new processed_at in the corpus version and reload the file on their next
+    # query; this one can free the stale answers and append the file's rows now
+    answer_cache.invalidate_file(uploaded_file.id)
+    rag_index.add(uploaded_file.id, uploaded_file.processed_at)
+
+    result['chunks_processed'] = chunks_processed
+    return result
+
+def _process_with_foundry(uploaded_file):
+    # Call Foundry Local to process the document
+    payload = {
+        'file_path': uploaded_file.file_path,
+        'file_type': uploaded_file.file_type
+    }
+
+    response = foundry.post('/rag/process', json=payload)
+
+    if response.status_code != 200:
+        message = f'Processing failed: {response.status_code} {response.text[:500]}'
+        if response.status_code < 500:
+            raise PermanentJobError(message)
+        raise RuntimeError(message)
+
+    chunks = response.json().get('chunks', [])
+
+    # Save chunks in committed batches, skipping any a previous interrupted run already stored
+    writer = ChunkWriter(uploaded_file, start_index=committed_chunks(uploaded_file.id), total=len(chunks))
+    for chunk in chunks[writer.next_index:]:
+        writer.add(chunk.get('content', ''), chunk.get('embedding'), chunk.get('metadata', {}))
+    writer.flush()
+    return len(chunks)
+
+def _mark_processing_failed(job):
+    uploaded_file = db.session.get(UploadedFile, job.file_id)
+    if uploaded_file and not uploaded_file.is_processed:
+        uploaded_file.processing_status = 'failed'
+        db.session.commit()
+
+job_queue.register('rag_process', _run_processing_job, on_failure=_mark_processing_failed)
+
 @bp.route('/files/<user_id>', methods=['GET'])
 def get_user_rag_files(user_id):
     """Get all RAG files for a user"""
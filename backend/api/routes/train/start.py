@@ -1,12 +1,15 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, TrainingJob, TrainingDataset, UploadedFile, AIModel
+from api.helpers.foundry_client import foundry
+from api.helpers.admission import AdmissionRejected, admission, prioritized, rejection_response
 from datetime import datetime
 import uuid
 
 bp = Blueprint('start_training', __name__)
 
 @bp.route('', methods=['POST'])
+@prioritized('batch')
 def start_training():
     """Start a new training/fine-tuning job"""
     try:
@@ -77,12 +80,6 @@ def start_training():
             db.session.add(dataset_record)
 
         # Call Foundry Local training API
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
         foundry_payload = {
             'model': base_model_id,
             'training_files': dataset_files,
@@ -90,7 +87,9 @@ def start_training():
             'parameters': parameters
         }
 
-        response = requests.post(f'{foundry_url}/train', json=foundry_payload, headers=headers, timeout=60)
+        # Submissions queue behind interactive traffic for the base model
+        with admission.acquire(base_model_id):
+            response = foundry.post('/train', json=foundry_payload)
 
         if response.status_code in [200, 201]:
             result = response.json()
@@ -121,6 +120,9 @@ def start_training():
                 'message': response.text
             }), response.status_code
 
+    except AdmissionRejected as e:
+        db.session.rollback()
+        return rejection_response(e)
     except requests.exceptions.RequestException as e:
         db.session.rollback()
         return jsonify({
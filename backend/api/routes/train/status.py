@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, TrainingJob
+from api.helpers.foundry_client import foundry
 from datetime import datetime
 
 bp = Blueprint('training_status', __name__)
@@ -19,14 +20,8 @@ def get_training_status(job_id):
 
         # If we have a Foundry job ID, try to get updated status from Foundry
         if training_job.foundry_job_id:
-            foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-            headers = {}
-            api_key = current_app.config.get('FOUNDRY_API_KEY')
-            if api_key:
-                headers['Authorization'] = f'Bearer {api_key}'
-
             try:
-                response = requests.get(f'{foundry_url}/train/{training_job.foundry_job_id}', headers=headers, timeout=10)
+                response = foundry.get(f'/train/{training_job.foundry_job_id}', timeout=10)
 
                 if response.status_code == 200:
                     foundry_status = response.json()
@@ -136,15 +131,8 @@ def cancel_training_job(job_id):
 
         # Try to cancel on Foundry Local
         if training_job.foundry_job_id:
-            foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-            headers = {'Content-Type': 'application/json'}
-            api_key = current_app.config.get('FOUNDRY_API_KEY')
-            if api_key:
-                headers['Authorization'] = f'Bearer {api_key}'
-
             try:
-                response = requests.post(f'{foundry_url}/train/{training_job.foundry_job_id}/cancel',
-                                       headers=headers, timeout=10)
+                response = foundry.post(f'/train/{training_job.foundry_job_id}/cancel', timeout=10)
                 if response.status_code == 200:
                     training_job.status = 'cancelled'
                     training_job.completed_at = datetime.utcnow()
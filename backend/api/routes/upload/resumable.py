@@ -0,0 +1,303 @@
+from flask import Blueprint, jsonify, request, current_app
+from models import db, UploadedFile, UploadSession
+from api.helpers.upload_store import commit_blob, upload_folder
+from api.helpers.upload_sessions import (
+    UploadRangeError, create_part_file, file_hash, merge_ranges, missing_ranges,
+    parse_content_range, write_chunk
+)
+from api.routes.rag.upload import ALLOWED_EXTENSIONS as DOCUMENT_EXTENSIONS
+from api.routes.audio.transcribe import ALLOWED_EXTENSIONS as AUDIO_EXTENSIONS
+from api.routes.vision.analyze import ALLOWED_EXTENSIONS as IMAGE_EXTENSIONS
+from werkzeug.utils import secure_filename
+import os
+import uuid
+from datetime import datetime, timedelta
+
+bp = Blueprint('resumable_upload', __name__)
+
+ALLOWED_EXTENSIONS = {
+    'document': DOCUMENT_EXTENSIONS,
+    'audio': AUDIO_EXTENSIONS,
+    'image': IMAGE_EXTENSIONS
+}
+
+DEFAULT_FILE_TYPES = {
+    'document': 'application/octet-stream',
+    'audio': 'audio/wav',
+    'image': 'image/jpeg'
+}
+
+def _session_status(session):
+    ranges = session.received_ranges or []
+    return {
+        'upload_id': session.id,
+        'filename': session.filename,
+        'content_type': session.content_type,
+        'size': session.total_size,
+        'received_bytes': session.received_bytes,
+        'received_ranges': ranges,
+        'missing_ranges': missing_ranges(ranges, session.total_size),
+        'status': session.status,
+        'file_id': session.file_id,
+        'expires_at': session.expires_at.isoformat() if session.expires_at else None
+    }
+
+def _lock_session(upload_id):
+    return UploadSession.query.filter_by(id=upload_id).with_for_update().populate_existing().one_or_none()
+
+def _get_active_session(upload_id, lock=False):
+    session = _lock_session(upload_id) if lock else db.session.get(UploadSession, upload_id)
+    if not session:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Upload not found'
+        }), 404)
+    if session.status != 'active':
+        return None, (jsonify({
+            'success': False,
+            'error': f'Upload is {session.status}',
+            'file_id': session.file_id
+        }), 409)
+    if session.expires_at and session.expires_at < datetime.utcnow():
+        return None, (jsonify({
+            'success': False,
+            'error': 'Upload expired'
+        }), 410)
+    return session, None
+
+def _expire_stale_sessions():
+    stale = UploadSession.query.filter(
+        UploadSession.status == 'active',
+        UploadSession.expires_at < datetime.utcnow()
+    ).limit(100).all()
+    for session in stale:
+        if os.path.exists(session.tmp_path):
+            os.remove(session.tmp_path)
+        session.status = 'aborted'
+    if stale:
+        db.session.commit()
+
+@bp.route('', methods=['POST'])
+def initiate_upload():
+    """Start a resumable upload; the file is then sent with ranged PUTs and finalized"""
+    try:
+        data = request.get_json(silent=True)
+
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'No data provided'
+            }), 400
+
+        original_filename = data.get('filename') or ''
+        kind = data.get('kind', 'document')
+        size = data.get('size')
+
+        if kind not in ALLOWED_EXTENSIONS:
+            return jsonify({
+                'success': False,
+                'error': f'Kind must be one of: {", ".join(ALLOWED_EXTENSIONS)}'
+            }), 400
+
+        extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
+        if extension not in ALLOWED_EXTENSIONS[kind]:
+            return jsonify({
+                'success': False,
+                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS[kind])}'
+            }), 400
+
+        if not isinstance(size, int) or size <= 0:
+            return jsonify({
+                'success': False,
+                'error': 'Size must be a positive number of bytes'
+            }), 400
+
+        max_size = current_app.config['UPLOAD_MAX_SIZE']
+        if size > max_size:
+            return jsonify({
+                'success': False,
+                'error': f'File too large (limit {max_size} bytes)'
+            }), 413
+
+        _expire_stale_sessions()
+
+        upload_id = str(uuid.uuid4())
+        tmp_path = os.path.join(upload_folder(), 'tmp', f'{upload_id}.part')
+        create_part_file(tmp_path, size)
+
+        session = UploadSession(
+            id=upload_id,
+            user_id=data.get('user_id') or str(uuid.uuid4()),  # Temporary for demo
+            filename=secure_filename(original_filename),
+            original_filename=original_filename,
+            file_type=data.get('file_type') or DEFAULT_FILE_TYPES[kind],
+            content_type=kind,
+            total_size=size,
+            received_ranges=[],
+            received_bytes=0,
+            tmp_path=tmp_path,
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+        )
+        db.session.add(session)
+        db.session.commit()
+
+        status = _session_status(session)
+        status.update({
+            'success': True,
+            'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+            'upload_url': f'/api/uploads/{upload_id}'
+        })
+        return jsonify(status), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Failed to start upload',
+            'message': str(e)
+        }), 500
+
+@bp.route('/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Write one chunk (raw body + Content-Range) at its offset in the file"""
+    try:
+        session, error = _get_active_session(upload_id)
+        if error:
+            return error
+
+        try:
+            start, end = parse_content_range(request.headers.get('Content-Range'), session.total_size)
+        except UploadRangeError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 416
+
+        written = write_chunk(session.tmp_path, start, end, request.stream)
+        if written:
+            # Chunks of one upload can be handled by different workers at once; the row lock
+            # serializes the read-modify-write of received_ranges between them
+            session = _lock_session(upload_id)
+            ranges = merge_ranges(session.received_ranges, start, start + written)
+            session.received_ranges = ranges
+            session.received_bytes = sum(range_end - range_start for range_start, range_end in ranges)
+            db.session.commit()
+
+        if written < end - start:
+            status = _session_status(session)
+            status.update({
+                'success': False,
+                'error': f'Incomplete chunk: received {written} of {end - start} bytes'
+            })
+            return jsonify(status), 400
+
+        status = _session_status(session)
+        status['success'] = True
+        return jsonify(status)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Chunk upload failed',
+            'message': str(e)
+        }), 500
+
+@bp.route('/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Received and missing byte ranges, so a client can resume after a dropped connection"""
+    session = db.session.get(UploadSession, upload_id)
+    if not session:
+        return jsonify({
+            'success': False,
+            'error': 'Upload not found'
+        }), 404
+
+    status = _session_status(session)
+    status['success'] = True
+    return jsonify(status)
+
+@bp.route('/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Verify every byte arrived, store the file content-addressed and create its UploadedFile"""
+    try:
+        # Locked so a repeated complete waits and then sees the upload as completed
+        session, error = _get_active_session(upload_id, lock=True)
+        if error:
+            return error
+
+        missing = missing_ranges(session.received_ranges, session.total_size)
+        if missing:
+            status = _session_status(session)
+            status.update({
+                'success': False,
+                'error': 'Upload incomplete'
+            })
+            return jsonify(status), 409
+
+        checksum = file_hash(session.tmp_path, session.total_size)
+        data = request.get_json(silent=True) or {}
+        expected = data.get('checksum')
+        if expected and expected.lower() != checksum:
+            return jsonify({
+                'success': False,
+                'error': 'Checksum mismatch',
+                'checksum': checksum
+            }), 422
+
+        file_path, reused = commit_blob(session.tmp_path, checksum, session.filename)
+
+        uploaded_file = UploadedFile(
+            user_id=session.user_id,
+            filename=session.filename,
+            original_filename=session.original_filename,
+            file_path=file_path,
+            file_size=session.total_size,
+            file_type=session.file_type,
+            content_type=session.content_type,
+            checksum=checksum,
+            is_processed=False,
+            processing_status='uploaded'
+        )
+        db.session.add(uploaded_file)
+        db.session.flush()
+
+        session.status = 'completed'
+        session.file_id = uploaded_file.id
+        db.session.commit()
+
+        return jsonify({
+            'success': True,
+            'file_id': uploaded_file.id,
+            'filename': uploaded_file.filename,
+            'file_size': uploaded_file.file_size,
+            'checksum': checksum,
+            'deduplicated': reused,
+            'message': 'File uploaded successfully'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': 'Failed to complete upload',
+            'message': str(e)
+        }), 500
+
+@bp.route('/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """Abandon an upload and delete what was received"""
+    session, error = _get_active_session(upload_id)
+    if error:
+        return error
+
+    if os.path.exists(session.tmp_path):
+        os.remove(session.tmp_path)
+    session.status = 'aborted'
+    db.session.commit()
+
+    return jsonify({
+        'success': True,
+        'upload_id': upload_id,
+        'status': 'aborted'
+    })
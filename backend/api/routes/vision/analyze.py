@@ -1,7 +1,11 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 import requests
 from models import db, UploadedFile
+from api.helpers.foundry_client import foundry
+from api.helpers.admission import AdmissionRejected, admission, prioritized, rejection_response
+from api.helpers.upload_store import find_cached_result, save_result, store_upload
 from werkzeug.utils import secure_filename
+import hashlib
 import os
 import uuid
 from datetime import datetime
@@ -17,88 +21,116 @@ if not os.path.exists(UPLOAD_FOLDER):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@bp.route('/analyze', methods=['POST'])
-def analyze_image():
-    """Analyze image content using vision models"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({
+def _get_or_save_upload():
+    """The image named by a ``file_id`` form field (e.g. from a resumable upload), or the posted ``file`` saved as a new upload"""
+    file_id = request.form.get('file_id')
+    if file_id:
+        uploaded_file = db.session.get(UploadedFile, file_id)
+        if not uploaded_file or uploaded_file.content_type != 'image':
+            return None, (jsonify({
                 'success': False,
-                'error': 'No file provided'
-            }), 400
+                'error': 'Image file not found'
+            }), 404)
+        return uploaded_file, None
 
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({
-                'success': False,
-                'error': 'No file selected'
-            }), 400
+    if 'file' not in request.files:
+        return None, (jsonify({
+            'success': False,
+            'error': 'No file provided'
+        }), 400)
 
-        if not allowed_file(file.filename):
-            return jsonify({
-                'success': False,
-                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
-            }), 400
+    file = request.files['file']
+    if file.filename == '':
+        return None, (jsonify({
+            'success': False,
+            'error': 'No file selected'
+        }), 400)
+
+    if not allowed_file(file.filename):
+        return None, (jsonify({
+            'success': False,
+            'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
+        }), 400)
+
+    user_id = request.form.get('user_id') or str(uuid.uuid4())
+    filename = secure_filename(file.filename)
+
+    # Save file content-addressed; identical bytes share one blob
+    file_path, checksum, file_size, _ = store_upload(file.stream, filename)
+
+    # Create database record
+    uploaded_file = UploadedFile(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        filename=filename,
+        original_filename=file.filename,
+        file_path=file_path,
+        file_size=file_size,
+        file_type=file.content_type or 'image/jpeg',
+        content_type='image',
+        checksum=checksum,
+        is_processed=False,
+        processing_status='uploaded'
+    )
+
+    db.session.add(uploaded_file)
+    db.session.commit()
+    return uploaded_file, None
 
-        user_id = request.form.get('user_id') or str(uuid.uuid4())
+@bp.route('/analyze', methods=['POST'])
+@prioritized('standard')
+def analyze_image():
+    """Analyze image content using vision models"""
+    try:
         prompt = request.form.get('prompt', 'Describe this image in detail')
         model = request.form.get('model', 'clip-vit-base-patch32')
 
-        filename = secure_filename(file.filename)
-        file_id = str(uuid.uuid4())
-        file_path = os.path.join(UPLOAD_FOLDER, f"{file_id}_{filename}")
-
-        # Save file
-        file.save(file_path)
-        file_size = os.path.getsize(file_path)
-
-        # Create database record
-        uploaded_file = UploadedFile(
-            id=file_id,
-            user_id=user_id,
-            filename=filename,
-            original_filename=file.filename,
-            file_path=file_path,
-            file_size=file_size,
-            file_type=file.content_type or 'image/jpeg',
-            content_type='image',
-            is_processed=False,
-            processing_status='uploaded'
-        )
-
-        db.session.add(uploaded_file)
-        db.session.commit()
-
-        # Call Foundry Local for image analysis
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        payload = {
-            'image_path': file_path,
-            'prompt': prompt,
-            'model': model
-        }
-
-        response = requests.post(f'{foundry_url}/vision/analyze', json=payload, headers=headers, timeout=120)
-
-        if response.status_code == 200:
-            result = response.json()
-
+        uploaded_file, error = _get_or_save_upload()
+        if error:
+            return error
+        file_id, file_path, checksum = uploaded_file.id, uploaded_file.file_path, uploaded_file.checksum
+
+        # The same image was already analyzed with this model and prompt
+        result_key = f"analysis:{model}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}"
+        result = find_cached_result(checksum, result_key)
+        cached = result is not None
+
+        if not cached:
+            # Call Foundry Local for image analysis
+            payload = {
+                'image_path': file_path,
+                'prompt': prompt,
+                'model': model
+            }
+
+            with admission.acquire(model):
+                response = foundry.post('/vision/analyze', json=payload)
+
+            if response.status_code == 200:
+                body = response.json()
+                result = {
+                    'description': body.get('description', ''),
+                    'objects': body.get('objects', []),
+                    'text': body.get('text', []),
+                    'colors': body.get('colors', [])
+                }
+
+        if result is not None:
             # Update file status
+            save_result(uploaded_file, result_key, result)
             uploaded_file.is_processed = True
+            uploaded_file.processed_at = datetime.utcnow()
             uploaded_file.processing_status = 'completed'
             db.session.commit()
 
             return jsonify({
                 'success': True,
-                'analysis': result.get('description', ''),
-                'objects': result.get('objects', []),
-                'text': result.get('text', []),
-                'colors': result.get('colors', []),
-                'file_id': file_id
+                'analysis': result['description'],
+                'objects': result['objects'],
+                'text': result['text'],
+                'colors': result['colors'],
+                'file_id': file_id,
+                'cached': cached
             })
         else:
             # Processing failed
@@ -111,6 +143,8 @@ def analyze_image():
                 'message': response.text
             }), response.status_code
 
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except requests.exceptions.RequestException as e:
         db.session.rollback()
         return jsonify({
@@ -127,77 +161,53 @@ def analyze_image():
         }), 500
 
 @bp.route('/caption', methods=['POST'])
+@prioritized('standard')
 def generate_caption():
     """Generate a caption for an image"""
     try:
-        if 'file' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No file provided'
-            }), 400
-
-        file = request.files['file']
         model = request.form.get('model', 'blip-image-captioning-base')
 
-        if not allowed_file(file.filename):
-            return jsonify({
-                'success': False,
-                'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
-            }), 400
-
-        user_id = request.form.get('user_id') or str(uuid.uuid4())
-        filename = secure_filename(file.filename)
-        file_id = str(uuid.uuid4())
-        file_path = os.path.join(UPLOAD_FOLDER, f"{file_id}_{filename}")
-
-        # Save file
-        file.save(file_path)
-        file_size = os.path.getsize(file_path)
-
-        # Create database record
-        uploaded_file = UploadedFile(
-            id=file_id,
-            user_id=user_id,
-            filename=filename,
-            original_filename=file.filename,
-            file_path=file_path,
-            file_size=file_size,
-            file_type=file.content_type or 'image/jpeg',
-            content_type='image',
-            is_processed=False,
-            processing_status='uploaded'
-        )
-
-        db.session.add(uploaded_file)
-        db.session.commit()
-
-        # Call Foundry Local for caption generation
-        foundry_url = current_app.config.get('FOUNDRY_BASE_URL', 'http://localhost:8080')
-        headers = {'Content-Type': 'application/json'}
-        api_key = current_app.config.get('FOUNDRY_API_KEY')
-        if api_key:
-            headers['Authorization'] = f'Bearer {api_key}'
-
-        payload = {
-            'image_path': file_path,
-            'model': model
-        }
-
-        response = requests.post(f'{foundry_url}/vision/caption', json=payload, headers=headers, timeout=60)
-
-        if response.status_code == 200:
-            result = response.json()
-
+        uploaded_file, error = _get_or_save_upload()
+        if error:
+            return error
+        file_id, file_path, checksum = uploaded_file.id, uploaded_file.file_path, uploaded_file.checksum
+
+        # The same image was already captioned with this model
+        result_key = f'caption:{model}'
+        result = find_cached_result(checksum, result_key)
+        cached = result is not None
+
+        if not cached:
+            # Call Foundry Local for caption generation
+            payload = {
+                'image_path': file_path,
+                'model': model
+            }
+
+            with admission.acquire(model):
+                response = foundry.post('/vision/caption', json=payload)
+
+            if response.status_code == 200:
+                body = response.json()
+                result = {
+                    'caption': body.get('caption', ''),
+                    'confidence': body.get('confidence')
+                }
+
+        if result is not None:
             # Update file status
+            save_result(uploaded_file, result_key, result)
             uploaded_file.is_processed = True
+            uploaded_file.processed_at = datetime.utcnow()
             uploaded_file.processing_status = 'completed'
             db.session.commit()
 
             return jsonify({
                 'success': True,
-                'caption': result.get('caption', ''),
-                'confidence': result.get('confidence'),
-                'file_id': file_id
+                'caption': result['caption'],
+                'confidence': result['confidence'],
+                'file_id': file_id,
+                'cached': cached
             })
         else:
             # Processing failed
@@ -210,6 +220,8 @@ def generate_caption():
                 'message': response.text
             }), response.status_code
 
+    except AdmissionRejected as e:
+        return rejection_response(e)
     except requests.exceptions.RequestException as e:
         db.session.rollback()
         return jsonify({
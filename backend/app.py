@@ -1,10 +1,20 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_migrate import Migrate
-import requests
 import os
 from dotenv import load_dotenv
 from models import db
+from api.helpers.foundry_client import foundry
+from api.helpers.foundry_health import foundry_health
+from api.helpers.rag_index import rag_index
+from api.helpers.rag_ann import ann_index
+from api.helpers.embedding_cache import embedding_cache
+from api.helpers.embedding_batcher import embedding_batcher
+from api.helpers.job_queue import job_queue
+from api.helpers.response_cache import response_cache
+from api.helpers.answer_cache import answer_cache
+from api.helpers.admission import admission
+from api.helpers.model_settings import parse_model_settings
 from api.routes import models, generate, chat, embeddings, conversations
 from api.routes.model.list import bp as list_models
 from api.routes.model.pull_clean import bp as pull_model
@@ -15,12 +25,13 @@ from api.routes.rag.upload import bp as upload_rag
 from api.routes.rag.query import bp as query_rag
 from api.routes.audio.transcribe import bp as transcribe_audio
 from api.routes.vision.analyze import bp as analyze_image
+from api.routes.upload.resumable import bp as resumable_upload
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Cache', 'Retry-After'])
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///foundry_playground.db')
@@ -30,11 +41,110 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-pro
 # Foundry Local configuration
 app.config['FOUNDRY_BASE_URL'] = os.getenv('FOUNDRY_BASE_URL', 'http://127.0.0.1:56831')
 app.config['FOUNDRY_API_KEY'] = os.getenv('FOUNDRY_API_KEY', '')
+# Keep-alive pool per worker process; size FOUNDRY_POOL_MAXSIZE to the worker's thread count
+app.config['FOUNDRY_POOL_CONNECTIONS'] = int(os.getenv('FOUNDRY_POOL_CONNECTIONS', '4'))
+app.config['FOUNDRY_POOL_MAXSIZE'] = int(os.getenv('FOUNDRY_POOL_MAXSIZE', '16'))
+# Background health probe interval (seconds); request handlers read the cached result
+app.config['FOUNDRY_HEALTH_INTERVAL'] = float(os.getenv('FOUNDRY_HEALTH_INTERVAL', '10'))
+
+# RAG retrieval: the IVF index (built with rag_ann.py) is used once it holds this many vectors
+app.config['RAG_ANN_MIN_VECTORS'] = int(os.getenv('RAG_ANN_MIN_VECTORS', '200000'))
+app.config['RAG_ANN_NPROBE'] = int(os.getenv('RAG_ANN_NPROBE', '8'))
+app.config['RAG_ANN_INDEX_PATH'] = os.getenv('RAG_ANN_INDEX_PATH')
+# Storage precision for RAG chunk embeddings: 'float32' or 'float16' (half the size)
+app.config['RAG_EMBEDDING_DTYPE'] = os.getenv('RAG_EMBEDDING_DTYPE', 'float32')
+
+# RAG ingest: 'local' parses, chunks and embeds in-process; 'foundry' delegates to Foundry's /rag/process
+app.config['RAG_INGEST_MODE'] = os.getenv('RAG_INGEST_MODE', 'local')
+app.config['RAG_EMBEDDING_MODEL'] = os.getenv('RAG_EMBEDDING_MODEL', 'embedding-model')
+app.config['RAG_CHUNK_SIZE'] = int(os.getenv('RAG_CHUNK_SIZE', '1000'))
+app.config['RAG_CHUNK_OVERLAP'] = int(os.getenv('RAG_CHUNK_OVERLAP', '200'))
+app.config['RAG_EMBED_BATCH_SIZE'] = int(os.getenv('RAG_EMBED_BATCH_SIZE', '64'))
+# Chunks are inserted and committed this many at a time; progress is saved with each commit
+app.config['RAG_WRITE_BATCH_SIZE'] = int(os.getenv('RAG_WRITE_BATCH_SIZE', '500'))
+
+# Background jobs (document processing, chat summaries): worker threads per process, retries and
+# a cap on running jobs per user and job type
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', '2'))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+app.config['JOB_RETRY_BACKOFF'] = float(os.getenv('JOB_RETRY_BACKOFF', '10'))
+app.config['JOB_USER_CONCURRENCY'] = int(os.getenv('JOB_USER_CONCURRENCY', '1'))
+
+# Resumable uploads: size limit, suggested chunk size and how long an unfinished upload is kept
+app.config['UPLOAD_MAX_SIZE'] = int(os.getenv('UPLOAD_MAX_SIZE', str(5 * 1024 ** 3)))
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.getenv('UPLOAD_CHUNK_SIZE', str(8 * 1024 ** 2)))
+app.config['UPLOAD_SESSION_TTL'] = int(os.getenv('UPLOAD_SESSION_TTL', str(24 * 3600)))
+
+# Keyset pagination page sizes for conversation lists and message history
+app.config['CONVERSATIONS_PAGE_SIZE'] = int(os.getenv('CONVERSATIONS_PAGE_SIZE', '50'))
+app.config['CONVERSATIONS_MAX_PAGE_SIZE'] = int(os.getenv('CONVERSATIONS_MAX_PAGE_SIZE', '200'))
+app.config['MESSAGES_PAGE_SIZE'] = int(os.getenv('MESSAGES_PAGE_SIZE', '50'))
+app.config['MESSAGES_MAX_PAGE_SIZE'] = int(os.getenv('MESSAGES_MAX_PAGE_SIZE', '500'))
+
+# Chat context: newest messages that fit the model's window minus max_tokens, at most
+# CHAT_HISTORY_MESSAGES of them. MODEL_CONTEXT_WINDOWS is "model=tokens,..."; ids match by prefix
+app.config['CHAT_HISTORY_MESSAGES'] = int(os.getenv('CHAT_HISTORY_MESSAGES', '100'))
+app.config['CHAT_CONTEXT_WINDOW'] = int(os.getenv('CHAT_CONTEXT_WINDOW', '4096'))
+app.config['MODEL_CONTEXT_WINDOWS'] = parse_model_settings(os.getenv('MODEL_CONTEXT_WINDOWS', ''))
+
+# Rolling conversation summary: refreshed by a background job once a turn's history passes
+# CHAT_SUMMARY_TRIGGER of the budget, keeping the newest CHAT_SUMMARY_KEEP of it verbatim
+app.config['CHAT_SUMMARY_ENABLED'] = os.getenv('CHAT_SUMMARY_ENABLED', 'true').lower() == 'true'
+app.config['CHAT_SUMMARY_TRIGGER'] = float(os.getenv('CHAT_SUMMARY_TRIGGER', '0.75'))
+app.config['CHAT_SUMMARY_KEEP'] = float(os.getenv('CHAT_SUMMARY_KEEP', '0.4'))
+app.config['CHAT_SUMMARY_MAX_TOKENS'] = int(os.getenv('CHAT_SUMMARY_MAX_TOKENS', '256'))
+app.config['CHAT_SUMMARY_MODEL'] = os.getenv('CHAT_SUMMARY_MODEL', '')
+
+# Embedding cache keyed by (model, normalized text); set EMBEDDING_CACHE_DIR to persist it on disk
+app.config['EMBEDDING_CACHE_ENABLED'] = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['EMBEDDING_CACHE_MAX_BYTES'] = int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+app.config['EMBEDDING_CACHE_DIR'] = os.getenv('EMBEDDING_CACHE_DIR')
+
+# Concurrent embedding requests are coalesced per model for up to this long (0 disables batching)
+app.config['EMBEDDING_BATCH_DELAY_MS'] = float(os.getenv('EMBEDDING_BATCH_DELAY_MS', '5'))
+app.config['EMBEDDING_BATCH_MAX_SIZE'] = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '64'))
+
+# Exact-match cache of temperature-0 /generate and chat responses (per process)
+app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['RESPONSE_CACHE_TTL'] = float(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Semantic /rag/query answer cache: paraphrased questions over the same files and model reuse answers
+app.config['RAG_ANSWER_CACHE_ENABLED'] = os.getenv('RAG_ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['RAG_ANSWER_CACHE_THRESHOLD'] = float(os.getenv('RAG_ANSWER_CACHE_THRESHOLD', '0.95'))
+app.config['RAG_ANSWER_CACHE_TTL'] = float(os.getenv('RAG_ANSWER_CACHE_TTL', '86400'))
+app.config['RAG_ANSWER_CACHE_MAX_ENTRIES'] = int(os.getenv('RAG_ANSWER_CACHE_MAX_ENTRIES', '2000'))
+
+# Admission control: concurrent upstream calls per model (per process), how many more may wait
+# and for how long before getting a 429. ADMISSION_MODEL_LIMITS is "model=N,..."; ids match by prefix
+app.config['ADMISSION_ENABLED'] = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+app.config['ADMISSION_MAX_CONCURRENCY'] = int(os.getenv('ADMISSION_MAX_CONCURRENCY', '2'))
+app.config['ADMISSION_MODEL_LIMITS'] = parse_model_settings(os.getenv('ADMISSION_MODEL_LIMITS', ''))
+app.config['ADMISSION_MAX_QUEUE'] = int(os.getenv('ADMISSION_MAX_QUEUE', '16'))
+app.config['ADMISSION_QUEUE_TIMEOUT'] = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '30'))
+# Priority classes (interactive, standard, batch): ADMISSION_PRIORITY_WEIGHTS is "class=N,..." and
+# sets how freed slots are shared between queued classes; batch work never holds the last
+# ADMISSION_RESERVED_SLOTS slots of a model. ADMISSION_MODEL_POOLS is "model=pool,..." for models
+# that share one device and so one limit (looked up by pool name)
+app.config['ADMISSION_PRIORITY_WEIGHTS'] = parse_model_settings(os.getenv('ADMISSION_PRIORITY_WEIGHTS', ''))
+app.config['ADMISSION_RESERVED_SLOTS'] = int(os.getenv('ADMISSION_RESERVED_SLOTS', '1'))
+app.config['ADMISSION_MODEL_POOLS'] = parse_model_settings(os.getenv('ADMISSION_MODEL_POOLS', ''), cast=str)
 
 # Initialize database
 db.init_app(app)
 migrate = Migrate(app, db)
 
+# Shared Foundry Local HTTP client and cached health status
+foundry.init_app(app)
+foundry_health.init_app(app)
+embedding_cache.init_app(app)
+embedding_batcher.init_app(app)
+job_queue.init_app(app)
+response_cache.init_app(app)
+answer_cache.init_app(app)
+admission.init_app(app)
+
 # Register blueprints
 app.register_blueprint(models.bp, url_prefix='/api')
 app.register_blueprint(generate.bp, url_prefix='/api')
@@ -50,6 +160,7 @@ app.register_blueprint(upload_rag, url_prefix='/api/rag')
 app.register_blueprint(query_rag, url_prefix='/api/rag')
 app.register_blueprint(transcribe_audio, url_prefix='/api/audio')
 app.register_blueprint(analyze_image, url_prefix='/api/vision')
+app.register_blueprint(resumable_upload, url_prefix='/api/uploads')
 
 @app.route('/')
 def index():
@@ -66,18 +177,35 @@ def index():
 
 @app.route('/health')
 def health():
-    try:
-        # Check if Foundry Local is running
-        response = requests.get(f"{app.config.get('FOUNDRY_BASE_URL')}/health", timeout=5)
-        return jsonify({
-            'status': 'healthy',
-            'foundry_status': response.json() if response.status_code == 200 else 'unknown'
-        })
-    except:
-        return jsonify({
-            'status': 'healthy',
-            'foundry_status': 'unreachable'
-        }), 200
+    # Served from the background prober's cache so this never blocks on Foundry
+    status = foundry_health.status()
+    if status['state'] == 'up':
+        foundry_status = status['payload'] if status['payload'] is not None else 'unknown'
+    elif status['state'] == 'down':
+        foundry_status = 'unreachable'
+    else:
+        foundry_status = 'unknown'
+    return jsonify({
+        'status': 'healthy',
+        'foundry_status': foundry_status,
+        'foundry_checked_at': status['checked_at'],
+        'foundry_status_age': status['age_seconds']
+    })
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        'foundry_client': foundry.stats(),
+        'foundry_health': foundry_health.status(),
+        'rag_index': rag_index.stats(),
+        'rag_ann_index': ann_index.stats(),
+        'embedding_cache': embedding_cache.stats(),
+        'embedding_batcher': embedding_batcher.stats(),
+        'job_queue': job_queue.stats(),
+        'response_cache': response_cache.stats(),
+        'rag_answer_cache': answer_cache.stats(),
+        'admission': admission.stats()
+    })
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Measure the database side of a chat turn as conversations grow.
+
+    python bench_chat_history.py [--sizes 100,1000,10000,50000] [--turns 50]
+                                 [--context-window 4096] [--max-tokens 500] [--history 100]
+
+For each size a conversation with that many messages is created in a scratch
+SQLite database. The script then times what ``send_message`` does against
+the database on every turn: insert the user message and build the context.
+It compares the old full-history load (``.all()`` then the last 10) with
+``chat_context.build_context``, which the route now calls: newest-first
+pages of FETCH_BATCH messages until the token budget (context window minus
+``max_tokens``) or CHAT_HISTORY_MESSAGES is reached. With the
+``messages(conversation_id, created_at)`` index in place, building the
+context should stay flat while the full load grows linearly.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, Conversation, Message
+from api.helpers.chat_context import build_context
+
+MODEL = 'bench-model'
+
+
+def create_app(path, context_window, history):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['CHAT_CONTEXT_WINDOW'] = context_window
+    app.config['MODEL_CONTEXT_WINDOWS'] = {}
+    app.config['CHAT_HISTORY_MESSAGES'] = history
+    db.init_app(app)
+    return app
+
+
+def seed(conversation_id, size):
+    db.session.add(Conversation(id=conversation_id, user_id='bench-user', title='bench', model_used=MODEL))
+    started = datetime.utcnow() - timedelta(seconds=size)
+    rows = [{
+        'id': f'{conversation_id}-{i:08d}',
+        'conversation_id': conversation_id,
+        'role': 'user' if i % 2 == 0 else 'assistant',
+        'content': f'message {i} ' * 20,
+        'created_at': started + timedelta(seconds=i)
+    } for i in range(size)]
+    db.session.execute(Message.__table__.insert(), rows)
+    db.session.commit()
+
+
+def full_history(conversation_id, max_tokens):
+    messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
+    return [{'role': m.role, 'content': m.content} for m in messages[-10:]]
+
+
+def budget_context(conversation_id, max_tokens):
+    history, _ = build_context(db.session.get(Conversation, conversation_id), MODEL, max_tokens)
+    return history
+
+
+def time_turns(conversation_id, load, turns, max_tokens):
+    timings = []
+    sizes = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        db.session.add(Message(conversation_id=conversation_id, role='user', content='bench turn'))
+        db.session.commit()
+        context = load(conversation_id, max_tokens)
+        timings.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(context))
+        # Keep each session lean between turns, like a fresh request would be
+        db.session.expunge_all()
+    return statistics.median(timings), statistics.median(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=lambda v: [int(x) for x in v.split(',')], default=[100, 1000, 10000, 50000])
+    parser.add_argument('--turns', type=int, default=50)
+    parser.add_argument('--context-window', type=int, default=4096)
+    parser.add_argument('--max-tokens', type=int, default=500)
+    parser.add_argument('--history', type=int, default=100, help='CHAT_HISTORY_MESSAGES')
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db', prefix='bench_chat_')
+    os.close(handle)
+    try:
+        app = create_app(path, args.context_window, args.history)
+        with app.app_context():
+            db.create_all()
+            print(f"{'messages':>10} {'full .all() ms/turn':>20} {'build_context ms/turn':>22} {'context msgs':>13}")
+            for size in args.sizes:
+                conversation_id = f'bench-{size}'
+                seed(conversation_id, size)
+                full_ms, _ = time_turns(conversation_id, full_history, args.turns, args.max_tokens)
+                context_ms, selected = time_turns(conversation_id, budget_context, args.turns, args.max_tokens)
+                print(f'{size:>10} {full_ms:>20.2f} {context_ms:>22.2f} {selected:>13.0f}')
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
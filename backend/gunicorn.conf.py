@@ -0,0 +1,58 @@
+"""Gunicorn settings for serving the Foundry Playground API.
+
+Run from the backend directory with::
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The default worker class is ``gthread``: each worker serves GUNICORN_THREADS
+requests on OS threads, and the in-process job queue (RAG ingest, chat
+summaries) runs on threads of its own, so CPU-bound parsing, chunking and
+numpy work in a job can't hold up a streaming chat response.
+
+GUNICORN_WORKER_CLASS=gevent runs every request in a greenlet instead, so
+thousands of in-flight upstream calls share one OS thread per worker. The
+job threads would share that event loop too, and a long CPU-bound job
+would stall every request in the worker, so gevent and in-process jobs are
+mutually exclusive: with gevent, JOB_WORKERS defaults to 0 here and the
+jobs run in a separate process on the same database::
+
+    flask --app app jobs --workers 2
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', max(2, multiprocessing.cpu_count())))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Concurrent greenlets per gevent worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+# Thread count per gthread worker
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Transcription can legitimately wait up to 300 s on Foundry
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '330'))
+graceful_timeout = 30
+keepalive = 5
+
+# The app must be imported after gevent has monkey-patched the worker
+preload_app = False
+
+# Keep one pooled keep-alive connection per concurrent request to Foundry
+if worker_class == 'gevent':
+    os.environ.setdefault('FOUNDRY_POOL_MAXSIZE', str(worker_connections))
+    # Jobs run in ``flask jobs``, not on the event loop
+    os.environ.setdefault('JOB_WORKERS', '0')
+else:
+    os.environ.setdefault('FOUNDRY_POOL_MAXSIZE', str(threads))
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    try:
+        # Make psycopg2 cooperative so PostgreSQL queries yield too
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    except ImportError:
+        pass
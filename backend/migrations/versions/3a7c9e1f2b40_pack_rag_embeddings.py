@@ -0,0 +1,114 @@
+"""Store RAG chunk embeddings as packed binary blobs
+
+Adds embedding_blob / embedding_dim / embedding_dtype to rag_documents and
+converts existing JSON embeddings into little-endian float32 blobs in
+batches. The JSON column is cleared for converted rows but kept so older
+code can still be rolled back to.
+
+Revision ID: 3a7c9e1f2b40
+Revises:
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7c9e1f2b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _columns(table):
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have the new columns; a fresh
+    # database has no rag_documents yet, and create_all() will give it the current schema
+    existing = _columns('rag_documents')
+    if existing is None:
+        return
+    with op.batch_alter_table('rag_documents', schema=None) as batch_op:
+        if 'embedding_blob' not in existing:
+            batch_op.add_column(sa.Column('embedding_blob', sa.LargeBinary(), nullable=True))
+        if 'embedding_dim' not in existing:
+            batch_op.add_column(sa.Column('embedding_dim', sa.Integer(), nullable=True))
+        if 'embedding_dtype' not in existing:
+            batch_op.add_column(sa.Column('embedding_dtype', sa.String(length=10), nullable=True))
+
+    bind = op.get_bind()
+    rag_documents = sa.table(
+        'rag_documents',
+        sa.column('id', sa.String),
+        sa.column('embedding', sa.Text),
+        sa.column('embedding_blob', sa.LargeBinary),
+        sa.column('embedding_dim', sa.Integer),
+        sa.column('embedding_dtype', sa.String)
+    )
+    select = sa.select(rag_documents.c.id, rag_documents.c.embedding).where(
+        rag_documents.c.embedding.isnot(None),
+        rag_documents.c.embedding_blob.is_(None)
+    ).limit(BATCH_SIZE)
+    update = rag_documents.update().where(rag_documents.c.id == sa.bindparam('row_id')).values(
+        embedding=None,
+        embedding_blob=sa.bindparam('blob'),
+        embedding_dim=sa.bindparam('dim'),
+        embedding_dtype='float32'
+    )
+
+    while True:
+        rows = bind.execute(select).fetchall()
+        if not rows:
+            break
+        params = []
+        for row_id, raw in rows:
+            vector = json.loads(raw) if isinstance(raw, str) else raw
+            if not vector:
+                # JSON null / empty list: nothing to pack, just clear it so the loop terminates
+                params.append({'row_id': row_id, 'blob': None, 'dim': None})
+                continue
+            array = np.asarray(vector, dtype='<f4')
+            params.append({'row_id': row_id, 'blob': array.tobytes(), 'dim': int(array.shape[0])})
+        bind.execute(update, params)
+
+
+def downgrade():
+    if not _columns('rag_documents'):
+        return
+    bind = op.get_bind()
+    rag_documents = sa.table(
+        'rag_documents',
+        sa.column('id', sa.String),
+        sa.column('embedding', sa.Text),
+        sa.column('embedding_blob', sa.LargeBinary),
+        sa.column('embedding_dim', sa.Integer),
+        sa.column('embedding_dtype', sa.String)
+    )
+    rows = bind.execute(sa.select(
+        rag_documents.c.id,
+        rag_documents.c.embedding_blob,
+        rag_documents.c.embedding_dtype
+    ).where(rag_documents.c.embedding_blob.isnot(None))).fetchall()
+    for row_id, blob, dtype in rows:
+        vector = np.frombuffer(blob, dtype='<f2' if dtype == 'float16' else '<f4')
+        bind.execute(
+            rag_documents.update().where(rag_documents.c.id == row_id).values(
+                embedding=json.dumps([float(v) for v in vector])
+            )
+        )
+
+    with op.batch_alter_table('rag_documents', schema=None) as batch_op:
+        batch_op.drop_column('embedding_dtype')
+        batch_op.drop_column('embedding_dim')
+        batch_op.drop_column('embedding_blob')
@@ -0,0 +1,52 @@
+"""Add the processing_jobs table for the background job queue
+
+Revision ID: 8d41b6c2e7a9
+Revises: 3a7c9e1f2b40
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6c2e7a9'
+down_revision = '3a7c9e1f2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have the table
+    if 'processing_jobs' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'processing_jobs',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.String(length=36), nullable=False),
+        sa.Column('file_id', sa.String(length=36), nullable=True),
+        sa.Column('job_type', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['uploaded_files.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_processing_jobs_status_run_after', 'processing_jobs', ['status', 'run_after'])
+    op.create_index('ix_processing_jobs_file_id', 'processing_jobs', ['file_id'])
+
+
+def downgrade():
+    op.drop_index('ix_processing_jobs_file_id', table_name='processing_jobs')
+    op.drop_index('ix_processing_jobs_status_run_after', table_name='processing_jobs')
+    op.drop_table('processing_jobs')
@@ -0,0 +1,74 @@
+"""Cache an estimated token count on each message
+
+Adds messages.token_count and fills it for existing rows in batches with the
+same estimate the model sets on insert (UTF-8 bytes / 4, at least one per
+word), so chat context building never has to re-count old history.
+
+Revision ID: a4c7e2d9b6f1
+Revises: f1a8d6e3b2c5
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2d9b6f1'
+down_revision = 'f1a8d6e3b2c5'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _estimate_tokens(text):
+    # Frozen copy of models.message.message.estimate_tokens as of this revision
+    if not text:
+        return 0
+    return max(math.ceil(len(text.encode('utf-8')) / 4), len(text.split()))
+
+
+def _columns(table):
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return None
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    existing = _columns('messages')
+    if existing is None:
+        return
+    if 'token_count' not in existing:
+        with op.batch_alter_table('messages', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('token_count', sa.Integer(), nullable=True))
+
+    bind = op.get_bind()
+    messages = sa.table(
+        'messages',
+        sa.column('id', sa.String),
+        sa.column('content', sa.Text),
+        sa.column('token_count', sa.Integer)
+    )
+    select = sa.select(messages.c.id, messages.c.content).where(
+        messages.c.token_count.is_(None)
+    ).limit(BATCH_SIZE)
+    update = messages.update().where(messages.c.id == sa.bindparam('row_id')).values(
+        token_count=sa.bindparam('count')
+    )
+
+    while True:
+        rows = bind.execute(select).fetchall()
+        if not rows:
+            break
+        bind.execute(update, [{'row_id': row_id, 'count': _estimate_tokens(content)} for row_id, content in rows])
+
+
+def downgrade():
+    existing = _columns('messages')
+    if existing and 'token_count' in existing:
+        with op.batch_alter_table('messages', schema=None) as batch_op:
+            batch_op.drop_column('token_count')
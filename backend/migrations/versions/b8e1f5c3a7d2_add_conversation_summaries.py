@@ -0,0 +1,51 @@
+"""Add rolling summary columns to conversations
+
+Revision ID: b8e1f5c3a7d2
+Revises: a4c7e2d9b6f1
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1f5c3a7d2'
+down_revision = 'a4c7e2d9b6f1'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ('summary', sa.Text),
+    ('summary_token_count', sa.Integer),
+    ('summarized_until', sa.DateTime),
+    ('summarized_until_id', lambda: sa.String(length=36)),
+    ('summary_job_id', lambda: sa.String(length=36)),
+]
+
+
+def _columns(table):
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return None
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    existing = _columns('conversations')
+    if existing is None:
+        return
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        for name, column_type in COLUMNS:
+            if name not in existing:
+                batch_op.add_column(sa.Column(name, column_type(), nullable=True))
+
+
+def downgrade():
+    existing = _columns('conversations')
+    if not existing:
+        return
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        for name, _ in reversed(COLUMNS):
+            if name in existing:
+                batch_op.drop_column(name)
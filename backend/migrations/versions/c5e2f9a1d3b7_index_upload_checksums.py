@@ -0,0 +1,33 @@
+"""Index uploaded_files.checksum for content-addressed upload dedupe
+
+Revision ID: c5e2f9a1d3b7
+Revises: 8d41b6c2e7a9
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2f9a1d3b7'
+down_revision = '8d41b6c2e7a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'uploaded_files' not in inspector.get_table_names():
+        return
+    indexes = {index['name'] for index in inspector.get_indexes('uploaded_files')}
+    if 'ix_uploaded_files_checksum' not in indexes:
+        op.create_index('ix_uploaded_files_checksum', 'uploaded_files', ['checksum'])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'uploaded_files' not in inspector.get_table_names():
+        return
+    if 'ix_uploaded_files_checksum' in {index['name'] for index in inspector.get_indexes('uploaded_files')}:
+        op.drop_index('ix_uploaded_files_checksum', table_name='uploaded_files')
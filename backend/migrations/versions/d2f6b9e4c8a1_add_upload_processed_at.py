@@ -0,0 +1,57 @@
+"""Record when an upload finished processing
+
+A processed file's RAG chunks never change again, so processed_at tells
+every worker whether what it cached for the file is still current.
+Existing processed rows get their created_at.
+
+Revision ID: d2f6b9e4c8a1
+Revises: b8e1f5c3a7d2
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f6b9e4c8a1'
+down_revision = 'b8e1f5c3a7d2'
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def upgrade():
+    existing = _columns('uploaded_files')
+    if existing is None:
+        return
+    if 'processed_at' not in existing:
+        with op.batch_alter_table('uploaded_files', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('processed_at', sa.DateTime(), nullable=True))
+
+    uploaded_files = sa.table(
+        'uploaded_files',
+        sa.column('is_processed', sa.Boolean),
+        sa.column('created_at', sa.DateTime),
+        sa.column('processed_at', sa.DateTime)
+    )
+    op.get_bind().execute(
+        uploaded_files.update().where(
+            uploaded_files.c.is_processed.is_(True),
+            uploaded_files.c.processed_at.is_(None)
+        ).values(processed_at=uploaded_files.c.created_at)
+    )
+
+
+def downgrade():
+    existing = _columns('uploaded_files')
+    if not existing or 'processed_at' not in existing:
+        return
+    with op.batch_alter_table('uploaded_files', schema=None) as batch_op:
+        batch_op.drop_column('processed_at')
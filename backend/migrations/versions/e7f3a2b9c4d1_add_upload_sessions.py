@@ -0,0 +1,47 @@
+"""Add the upload_sessions table for resumable chunked uploads
+
+Revision ID: e7f3a2b9c4d1
+Revises: c5e2f9a1d3b7
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7f3a2b9c4d1'
+down_revision = 'c5e2f9a1d3b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created with db.create_all() may already have the table
+    if 'upload_sessions' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.String(length=36), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('original_filename', sa.String(length=255), nullable=False),
+        sa.Column('file_type', sa.String(length=100), nullable=False),
+        sa.Column('content_type', sa.String(length=50), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=False),
+        sa.Column('received_ranges', sa.JSON(), nullable=True),
+        sa.Column('received_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('tmp_path', sa.String(length=500), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('file_id', sa.String(length=36), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['uploaded_files.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('upload_sessions')
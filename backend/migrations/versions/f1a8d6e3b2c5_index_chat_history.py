@@ -0,0 +1,43 @@
+"""Index messages(conversation_id, created_at) and conversations(user_id, updated_at)
+
+Revision ID: f1a8d6e3b2c5
+Revises: e7f3a2b9c4d1
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a8d6e3b2c5'
+down_revision = 'e7f3a2b9c4d1'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_messages_conversation_id_created_at', 'messages', ['conversation_id', 'created_at']),
+    ('ix_conversations_user_id_updated_at', 'conversations', ['user_id', 'updated_at']),
+]
+
+
+def _existing_indexes(inspector, table):
+    if table not in inspector.get_table_names():
+        return None
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = _existing_indexes(inspector, table)
+        if existing is not None and name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in INDEXES:
+        existing = _existing_indexes(inspector, table)
+        if existing and name in existing:
+            op.drop_index(name, table_name=table)
@@ -12,7 +12,9 @@ from .aimodel.aimodel import AIModel
 from .training.trainingjob import TrainingJob
 from .training.trainingdataset import TrainingDataset
 from .upload.upload import UploadedFile
+from .upload.uploadsession import UploadSession
 from .rag.ragdoc import RAGDocument
+from .job.processingjob import ProcessingJob
 from .config.configandlog import SystemConfig, AuditLog
 
 __all__ = [
@@ -25,7 +27,9 @@ __all__ = [
     'TrainingJob',
     'TrainingDataset',
     'UploadedFile',
+    'UploadSession',
     'RAGDocument',
+    'ProcessingJob',
     'SystemConfig',
     'AuditLog'
 ]
\ No newline at end of file
@@ -13,5 +13,18 @@ class Conversation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Rolling summary of the messages up to and including (summarized_until, summarized_until_id);
+    # chat turns send it in place of those messages
+    summary = db.Column(db.Text, nullable=True)
+    summary_token_count = db.Column(db.Integer, nullable=True)
+    summarized_until = db.Column(db.DateTime, nullable=True)
+    summarized_until_id = db.Column(db.String(36), nullable=True)
+    summary_job_id = db.Column(db.String(36), nullable=True)  # Latest background refresh
+
     # Relationships
-    messages = db.relationship('Message', backref='conversation', lazy=True, order_by='Message.created_at')
\ No newline at end of file
+    messages = db.relationship('Message', backref='conversation', lazy=True, order_by='Message.created_at')
+
+    __table_args__ = (
+        # Serves the per-user conversation list ordered by updated_at
+        db.Index('ix_conversations_user_id_updated_at', 'user_id', 'updated_at'),
+    )
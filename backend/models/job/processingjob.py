@@ -0,0 +1,29 @@
+from models import db
+from datetime import datetime
+import uuid
+
+class ProcessingJob(db.Model):
+    """Background processing job (e.g. RAG ingest) claimed by the in-process worker pool"""
+    __tablename__ = 'processing_jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    file_id = db.Column(db.String(36), db.ForeignKey('uploaded_files.id'), nullable=True)
+    job_type = db.Column(db.String(50), nullable=False)  # 'rag_process'
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed', 'failed'
+    payload = db.Column(db.JSON, nullable=True)  # Handler options
+    result = db.Column(db.JSON, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Retry backoff
+    locked_by = db.Column(db.String(100), nullable=True)  # Worker holding the job
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_processing_jobs_status_run_after', 'status', 'run_after'),
+        db.Index('ix_processing_jobs_file_id', 'file_id'),
+    )
@@ -1,7 +1,19 @@
 from models import db
+from sqlalchemy import event
 from datetime import datetime
+import math
 import uuid
 
+# Rough UTF-8 bytes per token for BPE tokenizers on English text and code.
+# Counting bytes rather than characters errs high for non-Latin scripts.
+BYTES_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Approximate token count of ``text`` without loading a tokenizer"""
+    if not text:
+        return 0
+    return max(math.ceil(len(text.encode('utf-8')) / BYTES_PER_TOKEN), len(text.split()))
+
 class Message(db.Model):
     """Individual message in a conversation"""
     __tablename__ = 'messages'
@@ -12,4 +24,16 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     model = db.Column(db.String(100), nullable=True)
     tokens_used = db.Column(db.Integer, nullable=True)
+    token_count = db.Column(db.Integer, nullable=True)  # Estimated size of content, set on insert
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Serves history tails and cursor pages: WHERE conversation_id = ? ORDER BY created_at
+        db.Index('ix_messages_conversation_id_created_at', 'conversation_id', 'created_at'),
+    )
+
+@event.listens_for(Message, 'before_insert')
+def _set_token_count(mapper, connection, message):
+    # Counted once when the message is written so building a chat context never re-tokenizes history
+    if message.token_count is None:
+        message.token_count = estimate_tokens(message.content)
@@ -10,6 +10,9 @@ class RAGDocument(db.Model):
     file_id = db.Column(db.String(36), db.ForeignKey('uploaded_files.id'), nullable=False)
     chunk_index = db.Column(db.Integer, nullable=False)
     content = db.Column(db.Text, nullable=False)
-    embedding = db.Column(db.JSON, nullable=True)  # Vector embedding
+    embedding = db.Column(db.JSON, nullable=True)  # Legacy JSON vector, superseded by embedding_blob
+    embedding_blob = db.Column(db.LargeBinary, nullable=True)  # Packed little-endian vector
+    embedding_dim = db.Column(db.Integer, nullable=True)
+    embedding_dtype = db.Column(db.String(10), nullable=True)  # 'float32' or 'float16'
     chunk_metadata = db.Column(db.JSON, nullable=True)  # Chunk metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -14,9 +14,10 @@ class UploadedFile(db.Model):
     file_size = db.Column(db.BigInteger, nullable=False)
     file_type = db.Column(db.String(100), nullable=False)  # MIME type
     content_type = db.Column(db.String(50), nullable=False)  # 'document', 'image', 'audio', etc.
-    checksum = db.Column(db.String(128), nullable=True)  # File hash for integrity
+    checksum = db.Column(db.String(128), nullable=True, index=True)  # SHA-256 of the content; uploads are stored by it
     is_processed = db.Column(db.Boolean, default=False)
     processing_status = db.Column(db.String(50), default='pending')
+    processed_at = db.Column(db.DateTime, nullable=True)  # When is_processed was set; a processed file's chunks never change
     file_metadata = db.Column(db.JSON, nullable=True)  # Additional file metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime, nullable=True)  # For temporary files
@@ -0,0 +1,23 @@
+from models import db
+from datetime import datetime
+import uuid
+
+class UploadSession(db.Model):
+    """Resumable upload in progress: received byte ranges of a file being sent in chunks"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_type = db.Column(db.String(100), nullable=False)  # MIME type
+    content_type = db.Column(db.String(50), nullable=False)  # 'document', 'image', 'audio'
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_ranges = db.Column(db.JSON, nullable=True)  # Merged [start, end) byte ranges written so far
+    received_bytes = db.Column(db.BigInteger, default=0)
+    tmp_path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), default='active')  # 'active', 'completed', 'aborted'
+    file_id = db.Column(db.String(36), db.ForeignKey('uploaded_files.id'), nullable=True)  # Set on completion
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
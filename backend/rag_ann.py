@@ -0,0 +1,81 @@
+"""Build and evaluate the approximate nearest-neighbour index used by /api/rag/query.
+
+    python rag_ann.py build [--nlist 1024] [--iterations 20] [--batch-size 10000]
+    python rag_ann.py report [--nprobe 1,4,8,16,32] [--queries 200] [--k 10]
+
+``build`` clusters every stored chunk embedding into an IVF index and saves it
+next to the database (see RAG_ANN_INDEX_PATH). ``report`` samples stored
+chunks as queries and prints recall@k and latency of the IVF index against
+exact search for each nprobe value.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app import app
+from api.helpers.rag_ann import IVFIndex, build_from_database, default_index_path
+from api.helpers.vector_search import top_k
+
+
+def build(args):
+    with app.app_context():
+        started = time.perf_counter()
+        index = build_from_database(nlist=args.nlist, iterations=args.iterations, batch_size=args.batch_size)
+        path = default_index_path()
+        index.save(path)
+        print(f"Built IVF index: {len(index)} vectors, {index.nlist} lists, dim {index.dim} "
+              f"in {time.perf_counter() - started:.1f}s")
+        print(f"Saved to {path}")
+
+
+def report(args):
+    with app.app_context():
+        path = default_index_path()
+        index = IVFIndex.load(path)
+
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+    queries = index.vectors[query_rows]
+
+    started = time.perf_counter()
+    exact = [set(index.doc_ids[top_k(index.vectors @ q, args.k)[0][0]]) for q in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    print(f"Index: {path} ({len(index)} vectors, {index.nlist} lists)")
+    print(f"Exact search: {exact_ms:.2f} ms/query")
+    print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+    for nprobe in args.nprobe:
+        started = time.perf_counter()
+        found = [index.search(q, k=args.k, nprobe=nprobe) for q in queries]
+        ann_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        recall = np.mean([
+            len(truth & {doc_id for doc_id, _ in hits}) / len(truth)
+            for truth, hits in zip(exact, found)
+        ])
+        print(f"{nprobe:>8} {recall:>10.3f} {ann_ms:>10.2f} {exact_ms / ann_ms:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = sub.add_parser('build', help='build the IVF index from stored embeddings')
+    build_parser.add_argument('--nlist', type=int, default=None, help='number of lists (default: sqrt(N))')
+    build_parser.add_argument('--iterations', type=int, default=20, help='k-means iterations')
+    build_parser.add_argument('--batch-size', type=int, default=10000, help='chunks read from the database per page')
+    build_parser.set_defaults(func=build)
+
+    report_parser = sub.add_parser('report', help='recall and latency vs exact search')
+    report_parser.add_argument('--nprobe', type=lambda v: [int(x) for x in v.split(',')], default=[1, 4, 8, 16, 32])
+    report_parser.add_argument('--queries', type=int, default=200)
+    report_parser.add_argument('--k', type=int, default=10)
+    report_parser.add_argument('--seed', type=int, default=0)
+    report_parser.set_defaults(func=report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A bare app on a throwaway SQLite file; tests register the blueprints and extensions they need"""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "test.db"}',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        CONVERSATIONS_PAGE_SIZE=50,
+        CONVERSATIONS_MAX_PAGE_SIZE=200,
+        MESSAGES_PAGE_SIZE=50,
+        MESSAGES_MAX_PAGE_SIZE=500,
+        CHAT_HISTORY_MESSAGES=100,
+        CHAT_CONTEXT_WINDOW=4096,
+        MODEL_CONTEXT_WINDOWS={}
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
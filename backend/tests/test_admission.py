@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from api.helpers.admission import (
+    PRIORITIES, AdmissionController, AdmissionRejected, _Waiter, current_priority, prioritized
+)
+
+
+def _controller(app, **config):
+    app.config.update(config)
+    return AdmissionController(app)
+
+
+def _queue(state, priority, count):
+    waiters = [_Waiter() for _ in range(count)]
+    state.classes[priority].waiters.extend(waiters)
+    return waiters
+
+
+def _drain(controller, state, holder, turns):
+    """Finish the running call ``turns`` times and report which class each freed slot went to"""
+    order = []
+    for _ in range(turns):
+        depths = {name: len(state.classes[name].waiters) for name in PRIORITIES}
+        controller._release(state, holder, 0.01)
+        holder = next(name for name in PRIORITIES if len(state.classes[name].waiters) < depths[name])
+        order.append(holder)
+    return order
+
+
+def test_weighted_round_robin_shares_slots_by_weight(app):
+    controller = _controller(app, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_RESERVED_SLOTS=0)
+    controller.acquire('phi', 'standard')
+    state = controller._models['phi']
+    for name in PRIORITIES:
+        _queue(state, name, 30)
+
+    order = _drain(controller, state, 'standard', 26)
+    assert order[0] == 'interactive'
+    assert Counter(order) == {'interactive': 16, 'standard': 8, 'batch': 2}
+    # Smooth: batch isn't left waiting until every interactive call has gone
+    assert order.index('batch') < 13
+
+
+def test_custom_weights(app):
+    controller = _controller(
+        app, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_RESERVED_SLOTS=0,
+        ADMISSION_PRIORITY_WEIGHTS={'interactive': 1, 'standard': 1, 'batch': 1}
+    )
+    controller.acquire('phi', 'standard')
+    state = controller._models['phi']
+    for name in PRIORITIES:
+        _queue(state, name, 5)
+    assert Counter(_drain(controller, state, 'standard', 9)) == {'interactive': 3, 'standard': 3, 'batch': 3}
+
+
+def test_batch_never_takes_reserved_slots(app):
+    controller = _controller(app, ADMISSION_MAX_CONCURRENCY=2, ADMISSION_RESERVED_SLOTS=1)
+    controller.acquire('phi', 'batch')
+    state = controller._models['phi']
+    assert state.batch_limit == 1
+
+    # The second batch call has to queue although a slot is free...
+    waiters = _queue(state, 'batch', 1)
+    assert state.active == 1
+    # ...which an interactive call then gets at once
+    controller.acquire('phi', 'interactive')
+    assert state.active == 2
+    controller._release(state, 'interactive', 0.01)
+    assert not waiters[0].granted
+
+    controller._release(state, 'batch', 0.01)
+    assert waiters[0].granted
+    assert state.classes['batch'].active == 1
+
+
+def test_small_limit_still_admits_batch(app):
+    controller = _controller(app, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_RESERVED_SLOTS=3)
+    ticket = controller.acquire('phi', 'batch')
+    assert controller._models['phi'].batch_limit == 1
+    ticket.release()
+
+
+def test_queue_full_is_rejected_with_retry_after(app):
+    controller = _controller(app, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_MAX_QUEUE=0)
+    controller.acquire('phi', 'interactive')
+    with pytest.raises(AdmissionRejected) as error:
+        controller.acquire('phi', 'interactive')
+    assert error.value.reason == 'queue full'
+    assert error.value.retry_after >= 1
+    assert controller.stats()['models']['phi']['classes']['interactive']['rejected'] == 1
+
+
+def test_wait_times_out(app):
+    controller = _controller(app, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_QUEUE_TIMEOUT=0.05)
+    controller.acquire('phi', 'standard')
+    with pytest.raises(AdmissionRejected) as error:
+        controller.acquire('phi', 'standard')
+    assert error.value.reason == 'queue timeout'
+    assert not controller._models['phi'].classes['standard'].waiters
+
+
+def test_waiting_call_gets_released_slot(app):
+    controller = _controller(app, ADMISSION_MAX_CONCURRENCY=1, ADMISSION_QUEUE_TIMEOUT=5)
+    ticket = controller.acquire('phi', 'standard')
+    state = controller._models['phi']
+    tickets = []
+    thread = threading.Thread(target=lambda: tickets.append(controller.acquire('phi', 'interactive')))
+    thread.start()
+    while not state.classes['interactive'].waiters:
+        time.sleep(0.001)
+    ticket.release()
+    thread.join(5)
+    assert tickets and tickets[0].priority == 'interactive'
+    assert state.active == 1
+
+
+def test_pooled_models_share_one_limit(app):
+    controller = _controller(
+        app, ADMISSION_MAX_CONCURRENCY=4, ADMISSION_QUEUE_TIMEOUT=0.01,
+        ADMISSION_MODEL_POOLS={'phi': 'gpu', 'qwen': 'gpu'}, ADMISSION_MODEL_LIMITS={'gpu': 1}
+    )
+    controller.acquire('phi-3.5-mini', 'interactive')
+    with pytest.raises(AdmissionRejected):
+        controller.acquire('qwen2.5', 'interactive')
+    assert list(controller.stats()['models']) == ['gpu']
+
+
+def test_current_priority(app):
+    assert current_priority() == 'batch'
+    with app.test_request_context():
+        assert current_priority() == 'standard'
+
+    view = prioritized('interactive')(current_priority)
+    with app.test_request_context():
+        assert view() == 'interactive'
+    with app.test_request_context(headers={'X-Priority': 'Batch'}):
+        assert view() == 'batch'
+    with app.test_request_context(headers={'X-Priority': 'urgent'}):
+        assert view() == 'interactive'
+
+
+def test_priority_header_cannot_raise_the_class(app):
+    with app.test_request_context(headers={'X-Priority': 'interactive'}):
+        assert current_priority() == 'standard'
+
+    view = prioritized('standard')(current_priority)
+    with app.test_request_context(headers={'X-Priority': 'interactive'}):
+        assert view() == 'standard'
+    with app.test_request_context(headers={'X-Priority': 'batch'}):
+        assert view() == 'batch'
+
+    batch_view = prioritized('batch')(current_priority)
+    with app.test_request_context(headers={'X-Priority': 'interactive'}):
+        assert batch_view() == 'batch'
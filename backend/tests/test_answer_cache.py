@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from models import db, UploadedFile
+from api.helpers.answer_cache import SemanticAnswerCache
+from api.helpers.rag_index import corpus_version, rag_files
+
+T1 = datetime(2026, 1, 1, 12, 0, 0)
+T2 = datetime(2026, 1, 2, 12, 0, 0)
+
+QUESTION = [1.0, 0.0, 0.0]
+PARAPHRASE = [0.99, 0.05, 0.0]
+UNRELATED = [0.0, 1.0, 0.0]
+
+
+def _cache(app, **config):
+    app.config.update(config)
+    return SemanticAnswerCache(app)
+
+
+def _file(file_id, processed_at=None, content_type='document'):
+    db.session.add(UploadedFile(
+        id=file_id, user_id='u1', filename=f'{file_id}.txt', original_filename=f'{file_id}.txt',
+        file_path=f'/tmp/{file_id}.txt', file_size=1, file_type='text/plain', content_type=content_type,
+        is_processed=processed_at is not None, processed_at=processed_at
+    ))
+
+
+def test_scope_key_normalizes_file_set():
+    key = SemanticAnswerCache.scope_key('phi', 'embed', '5', ['b', 'a', 'b'], 'v1')
+    assert key == ('phi', 'embed', 5, ('a', 'b'), 'v1')
+    assert SemanticAnswerCache.scope_key('phi', 'embed', 5, [], 'v1')[3] is None
+
+
+def test_paraphrase_hits_and_unrelated_misses(app):
+    cache = _cache(app)
+    scope = cache.scope_key('phi', 'embed', 5, None, 'v1')
+    cache.put(scope, QUESTION, 'what is x?', {'answer': 'x'})
+
+    response, similarity, question = cache.lookup(scope, PARAPHRASE)
+    assert response == {'answer': 'x'}
+    assert similarity >= 0.95
+    assert question == 'what is x?'
+    assert cache.lookup(scope, UNRELATED) is None
+    # Another embedding model's vectors can't be compared
+    assert cache.lookup(scope, [1.0, 0.0]) is None
+    assert cache.lookup(cache.scope_key('qwen', 'embed', 5, None, 'v1'), QUESTION) is None
+
+
+def test_same_question_replaces_answer(app):
+    cache = _cache(app)
+    scope = cache.scope_key('phi', 'embed', 5, None, 'v1')
+    cache.put(scope, QUESTION, 'what is x?', {'answer': 'old'})
+    cache.put(scope, QUESTION, 'what is x?', {'answer': 'new'})
+    assert cache.lookup(scope, QUESTION)[0] == {'answer': 'new'}
+    assert cache.stats()['entries'] == 1
+
+
+def test_new_version_drops_older_versions(app):
+    cache = _cache(app)
+    old = cache.scope_key('phi', 'embed', 5, ['f1'], 'v1')
+    other_files = cache.scope_key('phi', 'embed', 5, ['f2'], 'v1')
+    cache.put(old, QUESTION, 'q', {'answer': 'old'})
+    cache.put(other_files, QUESTION, 'q', {'answer': 'f2'})
+
+    new = cache.scope_key('phi', 'embed', 5, ['f1'], 'v2')
+    assert cache.lookup(new, QUESTION) is None
+    cache.put(new, QUESTION, 'q', {'answer': 'new'})
+    assert cache.lookup(old, QUESTION) is None
+    assert cache.lookup(new, QUESTION)[0] == {'answer': 'new'}
+    assert cache.lookup(other_files, QUESTION)[0] == {'answer': 'f2'}
+    assert cache.stats()['entries'] == 2
+
+
+def test_invalidate_file(app):
+    cache = _cache(app)
+    everything = cache.scope_key('phi', 'embed', 5, None, 'v1')
+    with_file = cache.scope_key('phi', 'embed', 5, ['f1', 'f2'], 'v1')
+    without_file = cache.scope_key('phi', 'embed', 5, ['f2'], 'v1')
+    for scope in (everything, with_file, without_file):
+        cache.put(scope, QUESTION, 'q', {'answer': 'a'})
+
+    cache.invalidate_file('f1')
+    assert cache.lookup(everything, QUESTION) is None
+    assert cache.lookup(with_file, QUESTION) is None
+    assert cache.lookup(without_file, QUESTION) is not None
+    assert cache.stats()['entries'] == 1
+
+
+def test_expired_answers_miss(app):
+    cache = _cache(app, RAG_ANSWER_CACHE_TTL=0)
+    scope = cache.scope_key('phi', 'embed', 5, None, 'v1')
+    cache.put(scope, QUESTION, 'q', {'answer': 'a'})
+    assert cache.lookup(scope, QUESTION) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_answer_is_evicted(app):
+    cache = _cache(app, RAG_ANSWER_CACHE_MAX_ENTRIES=2)
+    first = cache.scope_key('phi', 'embed', 5, ['f1'], 'v1')
+    second = cache.scope_key('phi', 'embed', 5, ['f2'], 'v1')
+    cache.put(first, QUESTION, 'q1', {'answer': 1})
+    cache.put(second, QUESTION, 'q2', {'answer': 2})
+    cache.lookup(first, QUESTION)
+    cache.put(first, UNRELATED, 'q3', {'answer': 3})
+    assert cache.lookup(second, QUESTION) is None
+    assert cache.lookup(first, QUESTION)[0] == {'answer': 1}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_corpus_version():
+    version = corpus_version({'a': T1, 'b': T1})
+    assert version == corpus_version({'b': T1, 'a': T1})
+    assert version != corpus_version({'a': T1, 'b': T2})
+    assert version != corpus_version({'a': T1})
+    # A file still being processed has no stable version to cache under
+    assert corpus_version({'a': T1, 'b': None}) is None
+
+
+def test_rag_files_reads_processed_at_from_database(app):
+    _file('done', T1)
+    _file('pending')
+    _file('image', T1, content_type='image')
+    db.session.commit()
+
+    assert rag_files() == {'done': T1}
+    assert rag_files(['done', 'pending']) == {'done': T1, 'pending': None}
+
+    # Reprocessing in any worker moves the version, so every worker's cached answers go stale
+    before = corpus_version(rag_files(['done']))
+    db.session.get(UploadedFile, 'done').processed_at = T2
+    db.session.commit()
+    assert corpus_version(rag_files(['done'])) != before
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+from models import db, Conversation, Message
+from api.helpers.chat_context import (
+    MESSAGE_OVERHEAD_TOKENS, SUMMARY_HEADER, build_context, context_window, message_tokens
+)
+from api.helpers.model_settings import parse_model_settings
+from models.message.message import estimate_tokens
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+# 40 ASCII bytes estimate to 10 tokens, 14 with the per-message overhead
+CONTENT = 'x' * 40
+COST = 10 + MESSAGE_OVERHEAD_TOKENS
+
+
+def _conversation(count, content=CONTENT):
+    conversation = Conversation(id='conv', user_id='u1', model_used='tiny')
+    db.session.add(conversation)
+    for i in range(count):
+        db.session.add(Message(
+            id=f'm{i:02d}', conversation_id='conv', role='user' if i % 2 == 0 else 'assistant',
+            content=content, created_at=BASE + timedelta(seconds=i)
+        ))
+    db.session.commit()
+    return conversation
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens(CONTENT) == 10
+    # Many short words count at least one token each
+    assert estimate_tokens('a b c d e f') == 6
+
+
+def test_token_count_is_cached_on_insert(app):
+    _conversation(1)
+    message = db.session.get(Message, 'm00')
+    assert message.token_count == 10
+    assert message_tokens(message) == COST
+
+
+def test_context_window_matches_model_prefix(app):
+    app.config['MODEL_CONTEXT_WINDOWS'] = parse_model_settings('phi-3.5=8192,phi-3.5-mini=4096')
+    assert context_window('phi-3.5-mini-instruct-generic-cpu') == 4096
+    assert context_window('phi-3.5-vision') == 8192
+    assert context_window('qwen') == app.config['CHAT_CONTEXT_WINDOW']
+
+
+def test_newest_messages_that_fit_the_budget(app):
+    app.config['MODEL_CONTEXT_WINDOWS'] = {'tiny': 100}
+    conversation = _conversation(10)
+    # 100 - 30 leaves room for exactly five messages
+    history, context = build_context(conversation, 'tiny', 30)
+    assert len(history) == 5
+    assert [m['role'] for m in history] == ['assistant', 'user', 'assistant', 'user', 'assistant']
+    assert context == {'messages': 5, 'tokens': 5 * COST, 'budget': 70, 'summary': False, 'overflowed': True}
+
+
+def test_everything_fits(app):
+    conversation = _conversation(3)
+    history, context = build_context(conversation, 'tiny', 256)
+    assert len(history) == 3
+    assert not context['overflowed']
+
+
+def test_latest_message_kept_even_when_too_large(app):
+    app.config['MODEL_CONTEXT_WINDOWS'] = {'tiny': 100}
+    conversation = _conversation(3, content='y' * 1000)
+    history, context = build_context(conversation, 'tiny', 30)
+    assert len(history) == 1
+    assert context['tokens'] > context['budget']
+    assert context['overflowed']
+
+
+def test_history_message_cap(app):
+    app.config['CHAT_HISTORY_MESSAGES'] = 20
+    conversation = _conversation(40)
+    history, context = build_context(conversation, 'tiny', 0)
+    assert context['messages'] == 20
+    assert context['overflowed']
+
+
+def test_summary_replaces_older_messages(app):
+    conversation = _conversation(6)
+    conversation.summary = 'They said hello.'
+    conversation.summary_token_count = 5
+    conversation.summarized_until = BASE + timedelta(seconds=3)
+    conversation.summarized_until_id = 'm03'
+    db.session.commit()
+
+    history, context = build_context(conversation, 'tiny', 0)
+    assert history[0] == {'role': 'system', 'content': SUMMARY_HEADER + 'They said hello.'}
+    assert len(history) == 3
+    assert context['summary']
+    assert context['tokens'] == 5 + estimate_tokens(SUMMARY_HEADER) + MESSAGE_OVERHEAD_TOKENS + 2 * COST
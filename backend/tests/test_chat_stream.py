@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from models import db, Conversation, Message
+from api.helpers.admission import AdmissionController
+from api.helpers.streaming import iter_sse_json, iter_sse_lines, sse_event
+from api.routes import chat
+
+DELTAS = ['Hel', 'lo', ' there']
+USAGE = {'prompt_tokens': 12, 'completion_tokens': 3, 'total_tokens': 15}
+
+
+class _Upstream:
+    """A streaming Foundry response: one ``data:`` line per chunk, then the usage chunk and ``[DONE]``"""
+
+    status_code = 200
+
+    def __init__(self, deltas=DELTAS, usage=USAGE):
+        self.lines = [b': keep-alive', b'']
+        for delta in deltas:
+            self.lines.append(b'data: ' + json.dumps({'choices': [{'delta': {'content': delta}}]}).encode())
+        self.lines.append(b'data: ' + json.dumps({'choices': [], 'usage': usage}).encode())
+        self.lines.append(b'data: [DONE]')
+        self.closed = False
+
+    def iter_lines(self, chunk_size=None):
+        assert chunk_size is None
+        yield from self.lines
+
+    def close(self):
+        self.closed = True
+
+
+class _Foundry:
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.payloads = []
+
+    def post(self, path, json=None, stream=False):
+        assert stream
+        self.payloads.append(json)
+        return self.upstream
+
+
+class _Healthy:
+    def is_available(self):
+        return True
+
+
+@pytest.fixture
+def stream_chat(app, monkeypatch):
+    app.config['CHAT_SUMMARY_ENABLED'] = False
+    app.register_blueprint(chat.bp, url_prefix='/api')
+    upstream = _Upstream()
+    foundry = _Foundry(upstream)
+    admission = AdmissionController(app)
+    monkeypatch.setattr(chat, 'foundry', foundry)
+    monkeypatch.setattr(chat, 'foundry_health', _Healthy())
+    monkeypatch.setattr(chat, 'admission', admission)
+    db.session.add(Conversation(id='conv', user_id='u1', model_used='phi'))
+    db.session.commit()
+    return upstream, foundry, admission
+
+
+def _frames(body):
+    """Parse an SSE body into ``(event, data)`` pairs"""
+    frames = []
+    for block in body.strip().split('\n\n'):
+        event, data = 'message', []
+        for line in block.split('\n'):
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data.append(line[len('data: '):])
+        frames.append((event, json.loads('\n'.join(data))))
+    return frames
+
+
+def _post(client, **kwargs):
+    return client.post('/api/chat/conv', json={'message': 'hi', 'model': 'phi', 'stream': True}, **kwargs)
+
+
+def test_sse_event_framing():
+    assert sse_event({'delta': 'a'}) == 'data: {"delta": "a"}\n\n'
+    assert sse_event('one\ntwo', event='note') == 'event: note\ndata: one\ndata: two\n\n'
+
+
+def test_iter_sse_skips_comments_blank_lines_and_stops_at_done():
+    upstream = _Upstream(deltas=['a'])
+    upstream.lines.insert(2, b'data: {not json')
+    upstream.lines.append(b'data: {"after": "done"}')
+    assert list(iter_sse_lines(upstream))[0] == '{not json'
+    chunks = list(iter_sse_json(upstream))
+    assert [c.get('usage') for c in chunks] == [None, USAGE]
+
+
+def test_stream_relays_deltas_and_saves_the_reply(stream_chat, client):
+    upstream, foundry, admission = stream_chat
+    response = _post(client)
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+
+    frames = _frames(response.get_data(as_text=True))
+    assert frames[0][0] == 'start'
+    assert frames[0][1]['conversation_id'] == 'conv'
+    assert [data['delta'] for event, data in frames[1:-1]] == DELTAS
+    assert frames[-1] == ('done', {'success': True, 'conversation_id': 'conv', 'response': 'Hello there', 'usage': USAGE})
+    assert foundry.payloads[0]['stream_options'] == {'include_usage': True}
+
+    reply = Message.query.filter_by(role='assistant').one()
+    assert (reply.content, reply.tokens_used) == ('Hello there', 15)
+    assert upstream.closed
+    assert admission.stats()['models']['phi']['active'] == 0
+
+
+def test_client_disconnect_saves_the_partial_reply(stream_chat, client):
+    upstream, _, admission = stream_chat
+    response = _post(client, buffered=False)
+    body = iter(response.response)
+    assert b'event: start' in next(body)
+    assert b'Hel' in next(body)
+    response.close()
+
+    reply = Message.query.filter_by(role='assistant').one()
+    assert reply.content == 'Hel'
+    assert reply.tokens_used is None
+    assert upstream.closed
+    assert admission.stats()['models']['phi']['active'] == 0
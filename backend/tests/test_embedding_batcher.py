@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from api.helpers.embedding_batcher import EmbeddingBatcher
+
+
+class _Upstream:
+    """Stands in for the Foundry call: one vector per text and one prompt token per text"""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text))] for text in texts], {'prompt_tokens': len(texts), 'model': 'm'}
+
+
+def _batcher(app, delay_ms=1000, max_size=4):
+    app.config.update(EMBEDDING_BATCH_DELAY_MS=delay_ms, EMBEDDING_BATCH_MAX_SIZE=max_size)
+    return EmbeddingBatcher(app)
+
+
+def _submit_in_thread(batcher, texts, send, results):
+    def run():
+        try:
+            results.append(batcher.submit('key', texts, send))
+        except Exception as e:
+            results.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for_open_batch(batcher):
+    while 'key' not in batcher._open:
+        time.sleep(0.001)
+
+
+def test_concurrent_callers_share_one_request(app):
+    batcher = _batcher(app, delay_ms=200, max_size=64)
+    upstream = _Upstream()
+    results = {}
+
+    def run(name, texts):
+        results[name] = batcher.submit('key', texts, upstream)
+
+    threads = [threading.Thread(target=run, args=(i, ['x' * i] * 2)) for i in range(1, 4)]
+    threads[0].start()
+    _wait_for_open_batch(batcher)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    # Identical texts from one caller are sent once
+    assert len(upstream.calls) == 1
+    assert sorted(upstream.calls[0]) == ['x', 'xx', 'xxx']
+    for i in range(1, 4):
+        vectors, usage = results[i]
+        assert vectors == [[float(i)], [float(i)]]
+        assert usage == {'prompt_tokens': 1}
+    assert batcher.stats()['batches'] == 1
+
+
+def test_lone_caller_filling_a_batch_does_not_wait(app):
+    batcher = _batcher(app, delay_ms=5000, max_size=4)
+    upstream = _Upstream()
+    texts = [f't{i}' for i in range(10)]
+
+    started = time.monotonic()
+    vectors, usage = batcher.submit('key', texts, upstream)
+    assert time.monotonic() - started < 1
+    assert [len(call) for call in upstream.calls] == [4, 4, 2]
+    assert vectors == [[float(len(text))] for text in texts]
+    assert usage == {'prompt_tokens': 10}
+
+
+def test_joiner_with_many_texts_is_split(app):
+    batcher = _batcher(app, delay_ms=5000, max_size=4)
+    upstream = _Upstream()
+    results = []
+    leader = _submit_in_thread(batcher, ['a', 'b', 'c'], upstream, results)
+    _wait_for_open_batch(batcher)
+
+    vectors, _ = batcher.submit('key', ['dd', 'ee', 'ff', 'gg', 'hh'], upstream)
+    leader.join(5)
+    assert [len(call) for call in upstream.calls] == [4, 4]
+    assert vectors == [[2.0]] * 5
+    assert results[0][0] == [[1.0]] * 3
+
+
+def test_upstream_error_reaches_every_caller(app):
+    batcher = _batcher(app, delay_ms=5000, max_size=4)
+    upstream = _Upstream(error=RuntimeError('Foundry down'))
+    results = []
+    leader = _submit_in_thread(batcher, ['a'], upstream, results)
+    _wait_for_open_batch(batcher)
+    with pytest.raises(RuntimeError, match='Foundry down'):
+        batcher.submit('key', ['b', 'c', 'd'], upstream)
+    leader.join(5)
+    assert isinstance(results[0], RuntimeError)
+
+
+def test_zero_delay_sends_directly_but_still_splits(app):
+    batcher = _batcher(app, delay_ms=0, max_size=3)
+    upstream = _Upstream()
+    vectors, usage = batcher.submit('key', ['a', 'b', 'c', 'd'], upstream)
+    assert [len(call) for call in upstream.calls] == [3, 1]
+    assert len(vectors) == 4
+    assert usage == {'prompt_tokens': 4}
+    assert batcher.submit('key', [], upstream) == ([], {})
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from api.helpers import embeddings
+from api.helpers.admission import AdmissionController
+from api.helpers.embedding_batcher import EmbeddingBatcher
+from api.helpers.embedding_cache import ENTRY_OVERHEAD, EmbeddingCache, cache_key
+
+DIM = 4
+ENTRY_BYTES = DIM * 4 + ENTRY_OVERHEAD
+
+
+def _cache(app, **config):
+    app.config.update(config)
+    return EmbeddingCache(app)
+
+
+def _vector(value):
+    return np.full(DIM, value, dtype=np.float32)
+
+
+def test_key_normalizes_whitespace_and_unicode():
+    assert cache_key('m', '  café\n latte ') == cache_key('m', 'café latte')
+    assert cache_key('m', 'text') != cache_key('other', 'text')
+
+
+def test_byte_budget_evicts_least_recently_used(app):
+    cache = _cache(app, EMBEDDING_CACHE_MAX_BYTES=3 * ENTRY_BYTES)
+    cache.put_many('m', ['a', 'b', 'c'], [_vector(1), _vector(2), _vector(3)])
+    assert cache.stats()['bytes'] == 3 * ENTRY_BYTES
+
+    # Touch 'a' so 'b' is the oldest when 'd' pushes the cache over budget
+    assert cache.get_many('m', ['a'])[0][0] == 1
+    cache.put_many('m', ['d'], [_vector(4)])
+    hits = cache.get_many('m', ['a', 'b', 'c', 'd'])
+    assert [None if v is None else int(v[0]) for v in hits] == [1, None, 3, 4]
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (3, 3 * ENTRY_BYTES, 1)
+
+
+def test_entry_larger_than_budget_is_not_kept(app):
+    cache = _cache(app, EMBEDDING_CACHE_MAX_BYTES=ENTRY_BYTES - 1)
+    cache.put_many('m', ['a'], [_vector(1)])
+    assert cache.stats()['entries'] == 0 and cache.stats()['bytes'] == 0
+
+
+def test_disk_entries_survive_a_restart(app, tmp_path):
+    _cache(app, EMBEDDING_CACHE_DIR=str(tmp_path / 'cache')).put_many('m', ['a'], [_vector(7)])
+    restarted = _cache(app, EMBEDDING_CACHE_DIR=str(tmp_path / 'cache'))
+    assert restarted.get_many('m', ['a', 'b'])[0].tolist() == [7.0] * DIM
+    assert restarted.stats()['disk_hits'] == 1 and restarted.stats()['misses'] == 1
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    def json(self):
+        return {
+            'data': [{'index': i, 'embedding': [float(len(t))] * DIM} for i, t in enumerate(self.texts)],
+            'usage': {'prompt_tokens': len(self.texts)}
+        }
+
+
+class _Foundry:
+    def __init__(self):
+        self.inputs = []
+
+    def post(self, path, json=None):
+        self.inputs.append(json['input'])
+        return _Response(json['input'])
+
+
+@pytest.fixture
+def foundry(app, monkeypatch):
+    app.config.update(EMBEDDING_BATCH_DELAY_MS=0)
+    fake = _Foundry()
+    monkeypatch.setattr(embeddings, 'foundry', fake)
+    monkeypatch.setattr(embeddings, 'admission', AdmissionController(app))
+    monkeypatch.setattr(embeddings, 'embedding_cache', _cache(app))
+    monkeypatch.setattr(embeddings, 'embedding_batcher', EmbeddingBatcher(app))
+    return fake
+
+
+def test_only_misses_are_sent_upstream(app, foundry):
+    vectors, _, cached = embeddings.embed_texts('m', ['a', 'bb'])
+    assert (foundry.inputs, cached) == ([['a', 'bb']], 0)
+
+    vectors, usage, cached = embeddings.embed_texts('m', ['bb', 'ccc', ' a ', 'ccc'])
+    # 'bb' and ' a ' are cached; the repeated 'ccc' is sent once
+    assert foundry.inputs[1] == ['ccc']
+    assert cached == 2
+    assert usage == {'prompt_tokens': 1}
+    assert [v[0] for v in vectors] == [2.0, 3.0, 1.0, 3.0]
+
+
+def test_fully_cached_call_skips_foundry(app, foundry):
+    embeddings.embed_texts('m', ['a'])
+    vectors, usage, cached = embeddings.embed_texts('m', ['a', 'a'])
+    assert len(foundry.inputs) == 1
+    assert (usage, cached) == ({}, 2)
+    assert all(v.dtype == np.float32 for v in vectors)
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from api.helpers.admission import AdmissionController
+from api.helpers.streaming import streaming_payload
+from api.routes import generate
+
+USAGE = {'prompt_tokens': 4, 'completion_tokens': 2, 'total_tokens': 6}
+
+
+class _Upstream:
+    status_code = 200
+
+    def __init__(self, frames):
+        self.lines = [b'data: ' + json.dumps(frame).encode() for frame in frames] + [b'data: [DONE]']
+        self.closed = False
+
+    def iter_lines(self, chunk_size=None):
+        yield from self.lines
+
+    def close(self):
+        self.closed = True
+
+
+class _Foundry:
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.payloads = []
+
+    def post(self, path, json=None, stream=False):
+        self.payloads.append(json)
+        return self.upstream
+
+
+@pytest.fixture
+def relay(app, monkeypatch):
+    app.register_blueprint(generate.bp, url_prefix='/api')
+    admission = AdmissionController(app)
+    monkeypatch.setattr(generate, 'admission', admission)
+
+    def stream(frames):
+        foundry = _Foundry(_Upstream(frames))
+        monkeypatch.setattr(generate, 'foundry', foundry)
+        response = app.test_client().post('/api/generate', json={'model': 'phi', 'prompt': 'hi', 'stream': True})
+        return response.get_data(as_text=True).strip().split('\n\n'), foundry
+    stream.admission = admission
+    return stream
+
+
+def test_streaming_payload_keeps_caller_stream_options():
+    payload = {'model': 'phi', 'stream': False, 'stream_options': {'foo': 1}}
+    assert streaming_payload(payload) == {
+        'model': 'phi', 'stream': True, 'stream_options': {'foo': 1, 'include_usage': True}
+    }
+    # The caller's payload is left alone
+    assert payload['stream_options'] == {'foo': 1}
+
+
+def test_usage_frame_comes_last_before_done(relay):
+    frames = [{'choices': [{'text': 'a'}]}, {'choices': [{'text': 'b'}]}, {'choices': [], 'usage': USAGE}]
+    body, foundry = relay(frames)
+
+    assert foundry.payloads[0]['stream_options'] == {'include_usage': True}
+    # Upstream frames are relayed unchanged, the usage chunk included
+    assert body[:3] == [f'data: {json.dumps(frame)}' for frame in frames]
+    assert body[3] == 'event: usage\ndata: ' + json.dumps({'model': 'phi', 'usage': USAGE, 'chunks': 2})
+    assert body[4] == 'data: [DONE]'
+    assert len(body) == 5
+    assert foundry.upstream.closed
+    assert relay.admission.stats()['models']['phi']['active'] == 0
+
+
+def test_usage_is_null_when_foundry_does_not_report_it(relay):
+    body, _ = relay([{'choices': [{'text': 'a'}]}])
+    assert json.loads(body[-2].split('data: ', 1)[1]) == {'model': 'phi', 'usage': None, 'chunks': 1}
+    assert body[-1] == 'data: [DONE]'
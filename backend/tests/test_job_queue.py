@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, ProcessingJob
+from api.helpers.job_queue import JobQueue, LeaseLost, PermanentJobError
+
+
+@pytest.fixture
+def queue(app):
+    # No worker threads: tests claim and run jobs themselves
+    app.config.update(JOB_WORKERS=0, JOB_MAX_ATTEMPTS=3, JOB_RETRY_BACKOFF=0, JOB_LEASE_SECONDS=60)
+    queue = JobQueue(app)
+    yield queue
+    queue.stop()
+
+
+def _run_next(queue, worker='w1'):
+    job = queue._claim(worker)
+    assert job is not None
+    queue._execute(job)
+    db.session.expire_all()
+    return db.session.get(ProcessingJob, job.id)
+
+
+def _take_over(job_id):
+    """What another worker does once this run's lease has expired: re-queue and claim the job again"""
+    db.session.query(ProcessingJob).filter_by(id=job_id).update(
+        {'attempts': ProcessingJob.attempts + 1, 'locked_by': 'w2', 'locked_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+def test_completed_job(queue):
+    queue.register('echo', lambda job: {'echo': job.payload['value']})
+    queue.enqueue('echo', 'u1', payload={'value': 7})
+
+    job = _run_next(queue)
+    assert job.status == 'completed'
+    assert job.result == {'echo': 7}
+    assert job.attempts == 1
+    assert job.locked_by is None and job.locked_at is None
+    assert queue.stats()['processed_here'] == 1
+
+
+def test_transient_failure_is_retried_with_backoff(app, queue):
+    calls = []
+
+    def flaky(job):
+        calls.append(job.attempts)
+        if len(calls) == 1:
+            raise RuntimeError('Foundry timed out')
+        return {'ok': True}
+
+    queue.register('flaky', flaky)
+    app.config['JOB_RETRY_BACKOFF'] = 3600
+    queue.enqueue('flaky', 'u1')
+
+    job = _run_next(queue)
+    assert job.status == 'queued'
+    assert job.error_message == 'Foundry timed out'
+    assert job.run_after > datetime.utcnow() + timedelta(minutes=59)
+    assert queue._claim('w1') is None
+
+    job.run_after = datetime.utcnow()
+    db.session.commit()
+    job = _run_next(queue)
+    assert job.status == 'completed'
+    assert calls == [1, 2]
+    assert queue.stats()['retried_here'] == 1
+
+
+def test_permanent_failure_is_not_retried(queue):
+    failed = []
+
+    def bad_input(job):
+        raise PermanentJobError('Unsupported file')
+
+    queue.register('bad', bad_input, on_failure=lambda job: failed.append((job.id, job.status)))
+    enqueued = queue.enqueue('bad', 'u1')
+
+    job = _run_next(queue)
+    assert job.status == 'failed'
+    assert job.attempts == 1
+    assert failed == [(enqueued.id, 'failed')]
+
+
+def test_failure_after_last_attempt(app, queue):
+    def broken(job):
+        raise RuntimeError('still down')
+
+    queue.register('broken', broken)
+    app.config['JOB_MAX_ATTEMPTS'] = 2
+    queue.enqueue('broken', 'u1')
+
+    assert _run_next(queue).status == 'queued'
+    job = _run_next(queue)
+    assert job.status == 'failed'
+    assert job.attempts == 2
+    assert queue.stats()['failed_here'] == 1
+
+
+def test_per_user_concurrency(queue):
+    queue.register('echo', lambda job: None)
+    first = queue.enqueue('echo', 'u1')
+    queue.enqueue('echo', 'u1')
+    other = queue.enqueue('echo', 'u2')
+
+    assert queue._claim('w1').id == first.id
+    assert queue._claim('w2').id == other.id
+    assert queue._claim('w3') is None
+
+
+def test_claim_rechecks_cap_under_lock(queue):
+    queue.register('echo', lambda job: None)
+    first = queue.enqueue('echo', 'u1')
+    second = queue.enqueue('echo', 'u1')
+    now = datetime.utcnow()
+
+    assert queue._claim_job(first.id, 'u1', 'echo', 1, 'w1', now)
+    # A worker whose running-jobs snapshot predates that claim still can't start a second job
+    assert not queue._claim_job(second.id, 'u1', 'echo', 1, 'w2', now)
+    assert queue._claim_job(second.id, 'u1', 'echo', 2, 'w2', now)
+
+
+def test_job_types_have_separate_caps(queue):
+    queue.register('ingest', lambda job: None)
+    queue.register('summary', lambda job: None)
+    ingest = queue.enqueue('ingest', 'u1')
+    queue.enqueue('ingest', 'u1')
+    summary = queue.enqueue('summary', 'u1')
+
+    assert queue._claim('w1').id == ingest.id
+    # The user's second ingest waits, but a summary doesn't queue behind the running ingest
+    assert queue._claim('w2').id == summary.id
+    assert queue._claim('w3') is None
+
+
+def test_stale_lease_is_requeued(queue):
+    queue.register('echo', lambda job: None)
+    enqueued = queue.enqueue('echo', 'u1')
+    assert queue._claim('w1').id == enqueued.id
+    db.session.query(ProcessingJob).filter_by(id=enqueued.id).update(
+        {'locked_at': datetime.utcnow() - timedelta(hours=1)}, synchronize_session=False
+    )
+    db.session.commit()
+
+    job = queue._claim('w2')
+    assert job.id == enqueued.id
+    assert job.locked_by == 'w2'
+    assert job.attempts == 2
+
+
+def test_heartbeat_renews_lease(queue):
+    seen = []
+
+    def long_job(job):
+        db.session.query(ProcessingJob).filter_by(id=job.id).update(
+            {'locked_at': datetime.utcnow() - timedelta(seconds=50)}, synchronize_session=False
+        )
+        queue.heartbeat()
+        db.session.commit()
+        seen.append(db.session.query(ProcessingJob.locked_at).filter_by(id=job.id).scalar())
+
+    queue.register('long', long_job)
+    queue.enqueue('long', 'u1')
+    assert _run_next(queue).status == 'completed'
+    assert seen[0] > datetime.utcnow() - timedelta(seconds=5)
+
+
+def test_heartbeat_after_takeover_raises_lease_lost(queue):
+    def stalled(job):
+        _take_over(job.id)
+        with pytest.raises(LeaseLost):
+            queue.heartbeat()
+        raise LeaseLost('stop')
+
+    queue.register('stalled', stalled)
+    queue.enqueue('stalled', 'u1')
+
+    job = _run_next(queue)
+    # The new owner's run is untouched
+    assert job.status == 'running'
+    assert job.locked_by == 'w2'
+    assert job.attempts == 2
+    assert queue.stats()['abandoned_here'] == 1
+
+
+def test_outcome_of_superseded_run_is_discarded(queue):
+    def stalled(job):
+        _take_over(job.id)
+        return {'late': True}
+
+    queue.register('stalled', stalled)
+    queue.enqueue('stalled', 'u1')
+
+    job = _run_next(queue)
+    assert job.status == 'running'
+    assert job.result is None
+    assert queue.stats()['processed_here'] == 0
+
+
+def test_heartbeat_outside_a_job_is_a_no_op(queue):
+    queue.heartbeat()
+
+
+def test_jobs_command_runs_the_queue(app, queue):
+    def handler(job):
+        queue.stop()
+        return {'ok': True}
+
+    queue.register('echo', handler)
+    db.session.add(ProcessingJob(job_type='echo', user_id='u1', payload={}, max_attempts=1))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['jobs', '--workers', '1'])
+    assert result.exit_code == 0, result.output
+    db.session.expire_all()
+    assert ProcessingJob.query.one().status == 'completed'
+
+
+def test_jobs_command_needs_workers(app, queue):
+    result = app.test_cli_runner().invoke(args=['jobs'])
+    assert result.exit_code != 0
+    assert 'pass --workers' in result.output
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Conversation, Message
+from api.helpers.pagination import (
+    CursorError, decode_cursor, encode_cursor, keyset_page, message_page, parse_limit
+)
+from api.routes import conversations
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _conversations(count, user_id='u1'):
+    # Pairs share an updated_at so pages have to break ties on id
+    for i in range(count):
+        db.session.add(Conversation(
+            id=f'c{i:02d}', user_id=user_id, title=f't{i}', model_used='m',
+            updated_at=BASE + timedelta(minutes=i // 2)
+        ))
+    db.session.commit()
+
+
+def _messages(conversation_id, count):
+    db.session.add(Conversation(id=conversation_id, user_id='u1', model_used='m'))
+    for i in range(count):
+        db.session.add(Message(
+            id=f'm{i:02d}', conversation_id=conversation_id, role='user', content=f'message {i}',
+            created_at=BASE + timedelta(seconds=i // 3)
+        ))
+    db.session.commit()
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(BASE.replace(microsecond=123456), 'abc')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (BASE.replace(microsecond=123456), 'abc')
+
+
+@pytest.mark.parametrize('cursor', ['zz', 'not a cursor', encode_cursor(BASE, 'x')[:-2], ''])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor)
+
+
+def test_parse_limit():
+    assert parse_limit(None, 50, 200) == 50
+    assert parse_limit('', 50, 200) == 50
+    assert parse_limit('10', 50, 200) == 10
+    assert parse_limit('0', 50, 200) == 1
+    assert parse_limit('-5', 50, 200) == 1
+    assert parse_limit('1000', 50, 200) == 200
+    with pytest.raises(CursorError):
+        parse_limit('ten', 50, 200)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 20])
+def test_keyset_pages_cover_every_row_once(app, limit):
+    _conversations(7)
+    query = Conversation.query.filter_by(user_id='u1')
+    seen, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(query, Conversation.updated_at, Conversation.id, limit, cursor=cursor)
+        assert len(rows) <= limit
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            break
+    assert seen == [f'c{i:02d}' for i in reversed(range(7))]
+
+
+def test_keyset_last_full_page_has_no_cursor(app):
+    _conversations(4)
+    rows, cursor = keyset_page(Conversation.query, Conversation.updated_at, Conversation.id, 4)
+    assert len(rows) == 4
+    assert cursor is None
+
+
+def test_message_page_without_arguments_returns_everything(app):
+    _messages('conv', 8)
+    messages, page = message_page('conv')
+    assert [m.id for m in messages] == [f'm{i:02d}' for i in range(8)]
+    assert page == {'prev_cursor': None, 'next_cursor': None, 'limit': None}
+
+
+def test_message_page_walks_back_and_forward(app):
+    _messages('conv', 8)
+    tail, page = message_page('conv', limit=3)
+    assert [m.id for m in tail] == ['m05', 'm06', 'm07']
+    assert page['next_cursor'] is None
+
+    older, older_page = message_page('conv', before=page['prev_cursor'], limit=3)
+    assert [m.id for m in older] == ['m02', 'm03', 'm04']
+
+    newer, newer_page = message_page('conv', after=older_page['next_cursor'], limit=3)
+    assert [m.id for m in newer] == ['m05', 'm06', 'm07']
+    assert newer_page['next_cursor'] is None
+
+
+def test_message_page_rejects_both_directions(app):
+    _messages('conv', 2)
+    cursor = encode_cursor(BASE, 'm00')
+    with pytest.raises(CursorError):
+        message_page('conv', before=cursor, after=cursor)
+
+
+def test_conversation_list_is_unpaged_by_default(app, client):
+    app.register_blueprint(conversations.bp, url_prefix='/api')
+    app.config['CONVERSATIONS_PAGE_SIZE'] = 2
+    _conversations(5)
+    db.session.add(Message(conversation_id='c03', role='user', content='hi'))
+    db.session.commit()
+
+    body = client.get('/api/conversations?user_id=u1').get_json()
+    assert [c['id'] for c in body['conversations']] == ['c04', 'c03', 'c02', 'c01', 'c00']
+    assert body['conversations'][1]['message_count'] == 1
+    assert body['next_cursor'] is None
+
+    body = client.get('/api/conversations?user_id=u1&limit=3').get_json()
+    assert [c['id'] for c in body['conversations']] == ['c04', 'c03', 'c02']
+    body = client.get(f'/api/conversations?user_id=u1&cursor={body["next_cursor"]}').get_json()
+    assert [c['id'] for c in body['conversations']] == ['c01', 'c00']
+    assert body['next_cursor'] is None
+
+    assert client.get('/api/conversations?user_id=u1&cursor=zz').status_code == 400
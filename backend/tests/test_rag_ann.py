@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from models import db, RAGDocument, UploadedFile
+from api.helpers.embedding_store import pack_embedding
+from api.helpers.rag_ann import IVFIndex, build_from_database
+
+
+def _file(file_id, processed=True):
+    db.session.add(UploadedFile(
+        id=file_id, user_id='u1', filename=f'{file_id}.txt', original_filename=f'{file_id}.txt',
+        file_path=f'/tmp/{file_id}.txt', file_size=1, file_type='text/plain', content_type='document',
+        is_processed=processed
+    ))
+
+
+def _chunks(file_id, vectors):
+    for index, vector in enumerate(vectors):
+        blob, dim, dtype = pack_embedding(vector)
+        db.session.add(RAGDocument(
+            id=f'{file_id}-{index:03d}', file_id=file_id, chunk_index=index, content='text',
+            embedding_blob=blob, embedding_dim=dim, embedding_dtype=dtype
+        ))
+
+
+@pytest.fixture
+def corpus(app):
+    rng = np.random.default_rng(3)
+    vectors = {}
+    for file_id in ('a', 'b', 'c'):
+        vectors[file_id] = rng.normal(size=(40, 8)).astype(np.float32)
+        _file(file_id)
+        _chunks(file_id, vectors[file_id].tolist())
+    _file('pending', processed=False)
+    _chunks('pending', rng.normal(size=(5, 8)).tolist())
+    db.session.commit()
+    return vectors
+
+
+def _check_layout(index, corpus):
+    assert sorted(index.doc_ids) == sorted(f'{f}-{i:03d}' for f in corpus for i in range(40))
+    assert index.offsets[0] == 0 and index.offsets[-1] == len(index)
+    assert np.allclose(np.linalg.norm(index.vectors, axis=1), 1, atol=1e-5)
+    # Every vector sits in the list of its nearest centroid
+    lists = np.repeat(np.arange(index.nlist), np.diff(index.offsets))
+    assert (np.argmax(index.vectors @ index.centroids.T, axis=1) == lists).all()
+    for doc_id, file_id, vector in zip(index.doc_ids, index.file_ids, index.vectors):
+        source = corpus[file_id][int(doc_id.split('-')[1])]
+        assert np.allclose(vector, source / np.linalg.norm(source), atol=1e-6)
+
+
+def test_streamed_build_pages_through_the_table(corpus):
+    index = build_from_database(nlist=4, iterations=5, batch_size=7)
+    assert type(index.vectors) is np.ndarray
+    assert index.nlist == 4
+    assert 'pending' not in index.indexed_files
+    _check_layout(index, corpus)
+
+
+def test_streamed_build_matches_exact_search_with_every_list_probed(corpus):
+    index = build_from_database(nlist=4, iterations=5, batch_size=16)
+    vectors = np.vstack([corpus[f] for f in ('a', 'b', 'c')])
+    doc_ids = [f'{f}-{i:03d}' for f in ('a', 'b', 'c') for i in range(40)]
+    reference = IVFIndex.build(doc_ids, [d[0] for d in doc_ids], vectors, nlist=1)
+    query = corpus['b'][7]
+    assert [d for d, _ in index.search(query, k=5, nprobe=4)] == [d for d, _ in reference.search(query, k=5)]
+
+
+def test_empty_table(app):
+    with pytest.raises(ValueError, match='No RAG embeddings'):
+        build_from_database()
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models import db, RAGDocument, UploadedFile
+from api.helpers.embedding_store import pack_embedding
+from api.helpers.rag_index import RAGIndex, rag_files
+
+PROCESSED = datetime(2026, 1, 1, 12, 0, 0)
+LATER = PROCESSED + timedelta(hours=1)
+
+
+def _file(file_id, processed_at=PROCESSED):
+    db.session.add(UploadedFile(
+        id=file_id, user_id='u1', filename=f'{file_id}.txt', original_filename=f'{file_id}.txt',
+        file_path=f'/tmp/{file_id}.txt', file_size=1, file_type='text/plain', content_type='document',
+        is_processed=processed_at is not None, processed_at=processed_at
+    ))
+
+
+def _chunks(file_id, vectors, first=0):
+    for index, vector in enumerate(vectors, first):
+        blob, dim, dtype = pack_embedding(vector)
+        db.session.add(RAGDocument(
+            id=f'{file_id}-{index}', file_id=file_id, chunk_index=index, content='text',
+            embedding_blob=blob, embedding_dim=dim, embedding_dtype=dtype
+        ))
+
+
+@pytest.fixture
+def corpus(app):
+    rng = np.random.default_rng(7)
+    vectors = {file_id: rng.normal(size=(20, 8)).astype(np.float32) for file_id in ('a', 'b', 'c')}
+    for file_id, matrix in vectors.items():
+        _file(file_id)
+        _chunks(file_id, matrix.tolist())
+    db.session.commit()
+    return vectors
+
+
+def _brute_force(vectors, query, k, file_ids):
+    rows = [(f'{file_id}-{i}', v) for file_id in file_ids for i, v in enumerate(vectors[file_id])]
+    query = query / np.linalg.norm(query)
+    scored = [(doc_id, float(v @ query / np.linalg.norm(v))) for doc_id, v in rows]
+    return sorted(scored, key=lambda item: item[1], reverse=True)[:k]
+
+
+def test_one_matrix_for_every_file(corpus):
+    index = RAGIndex()
+    query = np.ones(8, dtype=np.float32)
+    matches = index.search(query, k=5)
+    expected = _brute_force(corpus, query, 5, ['a', 'b', 'c'])
+    assert [doc_id for doc_id, _ in matches] == [doc_id for doc_id, _ in expected]
+    assert np.allclose([s for _, s in matches], [s for _, s in expected], atol=1e-5)
+    assert len(index._corpora) == 1
+    assert index._corpora[8].size == 60
+    assert index.stats()['files'] == 3
+
+
+def test_file_filter_masks_rows(corpus):
+    index = RAGIndex()
+    query = corpus['b'][3]
+    matches = index.search(query, k=4, files=rag_files(['b', 'c']))
+    assert matches[0][0] == 'b-3'
+    assert all(doc_id.split('-')[0] in ('b', 'c') for doc_id, _ in matches)
+    assert [doc_id for doc_id, _ in matches] == [doc_id for doc_id, _ in _brute_force(corpus, query, 4, ['b', 'c'])]
+
+    # Fewer matching rows than k
+    assert len(index.search(query, k=100, files=rag_files(['a']))) == 20
+
+
+def test_reprocessed_file_is_reloaded(corpus):
+    index = RAGIndex()
+    index.search(corpus['a'][0], k=1)
+
+    db.session.query(RAGDocument).filter_by(file_id='a').delete()
+    _chunks('a', [corpus['a'][0].tolist()], first=100)
+    db.session.get(UploadedFile, 'a').processed_at = LATER
+    db.session.commit()
+
+    matches = index.search(corpus['a'][0], k=3, files=rag_files(['a']))
+    assert [doc_id for doc_id, _ in matches] == ['a-100']
+    assert index._corpora[8].size == 41
+
+
+def test_add_appends_a_finished_file(corpus):
+    index = RAGIndex()
+    index.search(corpus['a'][0], k=1)
+    _file('d', LATER)
+    _chunks('d', [[1.0] * 8])
+    db.session.commit()
+
+    index.add('d', LATER)
+    assert index._corpora[8].size == 61
+    assert index.search([1.0] * 8, k=1)[0][0] == 'd-0'
+
+
+def test_prune_and_remove_drop_rows(corpus):
+    index = RAGIndex()
+    index.search(corpus['a'][0], k=1)
+
+    db.session.query(RAGDocument).filter_by(file_id='c').delete()
+    db.session.delete(db.session.get(UploadedFile, 'c'))
+    db.session.commit()
+    index.prune(rag_files())
+    assert index._corpora[8].size == 40
+
+    index.remove('b')
+    assert index.stats() == {'files': 1, 'vectors': 20, 'bytes': index._corpora[8].matrix.nbytes}
+    assert all(doc_id.startswith('a-') for doc_id, _ in index.search(corpus['b'][0], k=5, files=rag_files(['a'])))
+
+
+def test_file_still_processing_is_not_kept(corpus):
+    _file('p', None)
+    _chunks('p', [[1.0] * 8])
+    db.session.commit()
+
+    index = RAGIndex()
+    assert index.search([1.0] * 8, k=1, files=rag_files(['p'])) == [('p-0', pytest.approx(1.0))]
+    assert 'p' not in index._files
+
+
+def test_other_dimensions_are_skipped(corpus):
+    _file('wide')
+    _chunks('wide', [[1.0] * 16])
+    db.session.commit()
+
+    index = RAGIndex()
+    assert all(not doc_id.startswith('wide') for doc_id, _ in index.search([1.0] * 8, k=100))
+    assert index.search([1.0] * 16, k=5) == [('wide-0', pytest.approx(1.0))]
@@ -0,0 +1,161 @@
+import random
+
+import pytest
+
+from models import db, RAGDocument, UploadedFile
+from api.helpers import rag_ingest
+from api.helpers.embedding_store import unpack_embedding
+from api.helpers.rag_ingest import ChunkWriter, committed_chunks, ingest_file, iter_chunks
+
+WORDS = ' '.join(f'word{i:04d}' for i in range(600))
+
+
+def _pieces(text, seed):
+    """Split ``text`` at random points, the way blocks arrive from a document reader"""
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), 40))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+
+def test_unbroken_text_steps_by_size_minus_overlap():
+    text = ''.join(chr(ord('a') + i % 26) for i in range(2500))
+    chunks = list(iter_chunks([text], chunk_size=1000, overlap=200))
+    # The tail shorter than a full window becomes the last chunk
+    assert [start for _, start in chunks] == [0, 800, 1600]
+    assert [len(chunk) for chunk, _ in chunks] == [1000, 1000, 900]
+    for chunk, start in chunks:
+        assert text[start:start + len(chunk)] == chunk
+
+
+def test_cuts_fall_on_whitespace_and_overlap():
+    chunks = list(iter_chunks([WORDS], chunk_size=100, overlap=30))
+    words = set(WORDS.split())
+    for (chunk, start), (_, next_start) in zip(chunks, chunks[1:]):
+        assert len(chunk) <= 100
+        assert WORDS[start:start + len(chunk)] == chunk
+        # Cuts keep the last word whole; the overlap may start mid-word
+        assert chunk.split()[-1] in words
+        # The next chunk starts inside this one, repeating some of its tail
+        assert start < next_start < start + len(chunk)
+    assert chunks[-1][0].endswith('word0599')
+
+
+def test_every_character_is_covered():
+    chunks = list(iter_chunks([WORDS], chunk_size=120, overlap=20))
+    covered = set()
+    for chunk, start in chunks:
+        covered.update(range(start, start + len(chunk)))
+    assert all(i in covered for i, char in enumerate(WORDS) if not char.isspace())
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_piece_boundaries_do_not_change_the_chunks(seed):
+    whole = list(iter_chunks([WORDS], chunk_size=150, overlap=40))
+    assert list(iter_chunks(_pieces(WORDS, seed), chunk_size=150, overlap=40)) == whole
+    assert list(iter_chunks(iter(WORDS), chunk_size=150, overlap=40)) == whole
+
+
+def test_large_overlap_still_advances_by_min_step():
+    # A whitespace cut with overlap close to the chunk size would otherwise step back
+    # by a handful of characters at a time
+    chunks = list(iter_chunks([WORDS], chunk_size=100, overlap=90))
+    starts = [start for _, start in chunks]
+    assert all(b - a >= (100 - 90) // 2 for a, b in zip(starts, starts[1:]))
+    assert len(chunks) <= len(WORDS) // 5 + 1
+
+
+def test_short_and_blank_text():
+    assert list(iter_chunks(['  short text  '], chunk_size=100, overlap=10)) == [('short text', 0)]
+    assert list(iter_chunks(['   ', '\n'], chunk_size=100, overlap=10)) == []
+    assert list(iter_chunks([], chunk_size=100, overlap=10)) == []
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        list(iter_chunks(['text'], chunk_size=100, overlap=100))
+
+
+class _Crash(Exception):
+    pass
+
+
+class _Embedder:
+    """Stands in for ``embed_texts``; raises on call number ``crash_on`` like a worker dying mid-ingest"""
+
+    def __init__(self, crash_on=None):
+        self.calls = []
+        self.crash_on = crash_on
+
+    def __call__(self, model, texts):
+        self.calls.append(list(texts))
+        if len(self.calls) == self.crash_on:
+            raise _Crash()
+        return [[float(len(text)), 1.0] for text in texts], {}, 0
+
+
+@pytest.fixture
+def document(app, tmp_path):
+    app.config.update(RAG_WRITE_BATCH_SIZE=3, RAG_EMBED_BATCH_SIZE=2)
+    path = tmp_path / 'doc.txt'
+    path.write_text(WORDS[:900])
+    uploaded = UploadedFile(
+        id='f1', user_id='u1', filename='doc.txt', original_filename='doc.txt', file_path=str(path),
+        file_size=900, file_type='text/plain', content_type='document'
+    )
+    db.session.add(uploaded)
+    db.session.commit()
+    return uploaded
+
+
+SETTINGS = {'mode': 'local', 'embedding_model': 'm', 'chunk_size': 100, 'chunk_overlap': 20}
+
+
+def _stored(file_id='f1'):
+    return RAGDocument.query.filter_by(file_id=file_id).order_by(RAGDocument.chunk_index).all()
+
+
+def test_chunk_writer_commits_every_batch(document):
+    writer = ChunkWriter(document, total=5)
+    for i in range(4):
+        writer.add(f'chunk {i}', [1.0, 0.0])
+    db.session.rollback()
+    # Three rows reached the database with the first executemany; the fourth was still buffered
+    assert committed_chunks('f1') == 3
+    assert db.session.get(UploadedFile, 'f1').processing_status == 'processing:3/5'
+
+
+def test_interrupted_ingest_resumes_after_last_commit(document, monkeypatch):
+    expected = [chunk for chunk, _ in iter_chunks([WORDS[:900]], 100, 20)]
+    crashing = _Embedder(crash_on=3)
+    monkeypatch.setattr(rag_ingest, 'embed_texts', crashing)
+    with pytest.raises(_Crash):
+        ingest_file(document, SETTINGS)
+    db.session.rollback()
+    # Two embedding batches (four chunks) ran, but only the first write batch of three was committed
+    assert committed_chunks('f1') == 3
+
+    resumed = _Embedder()
+    monkeypatch.setattr(rag_ingest, 'embed_texts', resumed)
+    assert ingest_file(document, SETTINGS) == len(expected)
+    # Committed chunks are not embedded again
+    assert [text for call in resumed.calls for text in call] == expected[3:]
+
+    rows = _stored()
+    assert [row.chunk_index for row in rows] == list(range(len(expected)))
+    assert [row.content for row in rows] == expected
+    for row in rows:
+        vector = unpack_embedding(row.embedding_blob, row.embedding_dim, row.embedding_dtype)
+        assert vector.tolist() == [float(len(row.content)), 1.0]
+
+
+def test_changed_settings_start_over(document, monkeypatch):
+    monkeypatch.setattr(rag_ingest, 'embed_texts', _Embedder(crash_on=3))
+    with pytest.raises(_Crash):
+        ingest_file(document, SETTINGS)
+    db.session.rollback()
+
+    rechunked = _Embedder()
+    monkeypatch.setattr(rag_ingest, 'embed_texts', rechunked)
+    total = ingest_file(document, dict(SETTINGS, chunk_size=200))
+    assert [row.content for row in _stored()] == [chunk for chunk, _ in iter_chunks([WORDS[:900]], 200, 20)]
+    assert sum(len(call) for call in rechunked.calls) == total
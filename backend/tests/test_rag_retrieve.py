@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import db, RAGDocument, UploadedFile
+from api.helpers.embedding_store import pack_embedding
+from api.helpers.rag_ann import IVFIndex
+from api.helpers.rag_index import RAGIndex, rag_files
+from api.routes.rag import query
+
+PROCESSED = datetime(2026, 1, 1, 12, 0, 0)
+BUILT = PROCESSED + timedelta(hours=1)
+LATER = BUILT + timedelta(hours=1)
+
+QUERY = [1.0, 0.0, 0.0, 0.0]
+
+
+class _Store:
+    def __init__(self, index):
+        self.index = index
+
+    def get(self):
+        return self.index
+
+
+@pytest.fixture
+def retrieval(app, monkeypatch):
+    """Isolated exact index plus a settable stand-in for the persisted IVF index"""
+    store = _Store(None)
+    monkeypatch.setattr(query, 'rag_index', RAGIndex())
+    monkeypatch.setattr(query, 'ann_index', store)
+    app.config['RAG_ANN_MIN_VECTORS'] = 0
+    return store
+
+
+def _file(file_id, processed_at):
+    db.session.add(UploadedFile(
+        id=file_id, user_id='u1', filename=f'{file_id}.txt', original_filename=f'{file_id}.txt',
+        file_path=f'/tmp/{file_id}.txt', file_size=1, file_type='text/plain', content_type='document',
+        is_processed=processed_at is not None, processed_at=processed_at
+    ))
+
+
+def _chunk(file_id, index, vector):
+    blob, dim, dtype = pack_embedding(vector)
+    doc = RAGDocument(
+        id=f'{file_id}-{index}', file_id=file_id, chunk_index=index, content=f'{file_id} chunk {index}',
+        embedding_blob=blob, embedding_dim=dim, embedding_dtype=dtype
+    )
+    db.session.add(doc)
+    return doc.id, file_id, vector
+
+
+def _ivf(chunks):
+    doc_ids, file_ids, vectors = zip(*chunks)
+    built_at = BUILT.replace(tzinfo=timezone.utc).timestamp()
+    return IVFIndex.build(list(doc_ids), list(file_ids), list(vectors), nlist=1, built_at=built_at)
+
+
+def _corpus(retrieval):
+    """Two files processed before the IVF build, both in the index"""
+    _file('f1', PROCESSED)
+    _file('f2', PROCESSED)
+    indexed = [
+        _chunk('f1', 0, [0.9, 0.1, 0.0, 0.0]),
+        _chunk('f1', 1, [0.0, 1.0, 0.0, 0.0]),
+        _chunk('f2', 0, [0.7, 0.3, 0.0, 0.0]),
+    ]
+    db.session.commit()
+    retrieval.index = _ivf(indexed)
+    return indexed
+
+
+def _ids(matches):
+    return [doc_id for doc_id, _ in matches]
+
+
+def test_indexed_files_come_from_ivf(retrieval):
+    _corpus(retrieval)
+    matches, index = query._retrieve(QUERY, 2, rag_files(), index_type='ivf', nprobe=1)
+    assert index == 'ivf'
+    assert _ids(matches) == ['f1-0', 'f2-0']
+    exact, index = query._retrieve(QUERY, 2, rag_files(), index_type='exact')
+    assert index == 'exact'
+    assert _ids(exact) == _ids(matches)
+
+
+def test_auto_uses_exact_below_minimum(app, retrieval):
+    _corpus(retrieval)
+    app.config['RAG_ANN_MIN_VECTORS'] = 1000
+    assert query._retrieve(QUERY, 2, rag_files())[1] == 'exact'
+
+
+def test_file_processed_after_build_is_merged(retrieval):
+    _corpus(retrieval)
+    _file('f3', LATER)
+    _chunk('f3', 0, [1.0, 0.0, 0.0, 0.0])
+    _chunk('f3', 1, [0.8, 0.2, 0.0, 0.0])
+    db.session.commit()
+
+    matches, _ = query._retrieve(QUERY, 3, rag_files(), index_type='ivf', nprobe=1)
+    assert _ids(matches) == ['f3-0', 'f1-0', 'f3-1']
+    assert [score for _, score in matches] == sorted((score for _, score in matches), reverse=True)
+
+
+def test_reprocessed_file_hides_stale_index_entries(retrieval):
+    _corpus(retrieval)
+    # f2 was re-chunked after the build: its indexed chunk is gone and a new one replaced it
+    db.session.query(RAGDocument).filter_by(file_id='f2').delete()
+    db.session.get(UploadedFile, 'f2').processed_at = LATER
+    _chunk('f2', 5, [0.6, 0.4, 0.0, 0.0])
+    db.session.commit()
+
+    matches, _ = query._retrieve(QUERY, 5, rag_files(), index_type='ivf', nprobe=1)
+    assert _ids(matches) == ['f1-0', 'f2-5', 'f1-1']
+
+
+def test_file_still_processing_is_searched_exactly(retrieval):
+    _corpus(retrieval)
+    _file('f4', None)
+    _chunk('f4', 0, [0.95, 0.05, 0.0, 0.0])
+    db.session.commit()
+
+    matches, _ = query._retrieve(QUERY, 2, rag_files(['f1', 'f4']), index_type='ivf', nprobe=1)
+    assert _ids(matches) == ['f4-0', 'f1-0']
+
+
+def test_files_outside_the_query_are_masked(retrieval):
+    _corpus(retrieval)
+    matches, _ = query._retrieve(QUERY, 3, rag_files(['f2']), index_type='ivf', nprobe=1)
+    assert _ids(matches) == ['f2-0']
+
+    # A deleted file is still in the index until the next build
+    db.session.query(RAGDocument).filter_by(file_id='f1').delete()
+    db.session.delete(db.session.get(UploadedFile, 'f1'))
+    db.session.commit()
+    matches, _ = query._retrieve(QUERY, 3, rag_files(), index_type='ivf', nprobe=1)
+    assert _ids(matches) == ['f2-0']
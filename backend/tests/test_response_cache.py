@@ -0,0 +1,94 @@
+from api.helpers.response_cache import ResponseCache, bypass_requested, is_deterministic, response_key
+
+PAYLOAD = {'model': 'phi', 'messages': [{'role': 'user', 'content': 'hi'}], 'temperature': 0, 'max_tokens': 500}
+
+
+def _cache(app, **config):
+    app.config.update(config)
+    return ResponseCache(app)
+
+
+def test_key_ignores_stream_key_order_and_integral_floats():
+    key = response_key('/v1/chat/completions', PAYLOAD)
+    reordered = dict(reversed(list(PAYLOAD.items())), stream=True)
+    assert response_key('/v1/chat/completions', reordered) == key
+    assert response_key('/v1/chat/completions', dict(PAYLOAD, temperature=0.0, max_tokens=500.0)) == key
+
+
+def test_key_depends_on_path_and_payload():
+    key = response_key('/v1/chat/completions', PAYLOAD)
+    assert response_key('/v1/completions', PAYLOAD) != key
+    assert response_key('/v1/chat/completions', dict(PAYLOAD, max_tokens=501)) != key
+    assert response_key('/v1/chat/completions', dict(PAYLOAD, model='qwen')) != key
+
+
+def test_only_greedy_single_choice_is_deterministic():
+    assert is_deterministic({'temperature': 0})
+    assert is_deterministic({'temperature': '0'})
+    assert not is_deterministic({})
+    assert not is_deterministic({'temperature': 0.2})
+    assert not is_deterministic({'temperature': 0, 'n': 2})
+    assert not is_deterministic({'temperature': 'hot'})
+
+
+def test_bypass_headers():
+    assert bypass_requested({'X-Cache-Bypass': 'true'})
+    assert bypass_requested({'Cache-Control': 'no-cache'})
+    assert bypass_requested({'Cache-Control': 'max-age=0, no-store'})
+    assert not bypass_requested({'X-Cache-Bypass': 'no'})
+    assert not bypass_requested({})
+
+
+def test_miss_then_hit(app):
+    cache = _cache(app)
+    status, key, response = cache.lookup('/v1/chat/completions', PAYLOAD, {})
+    assert (status, response) == ('MISS', None)
+    cache.put(key, {'answer': 42})
+    assert cache.lookup('/v1/chat/completions', PAYLOAD, {}) == ('HIT', key, {'answer': 42})
+    assert cache.stats()['hits'] == 1
+
+
+def test_sampled_and_bypassed_requests(app):
+    cache = _cache(app)
+    assert cache.lookup('/v1/chat/completions', dict(PAYLOAD, temperature=0.7), {}) == ('BYPASS', None, None)
+
+    _, key, _ = cache.lookup('/v1/chat/completions', PAYLOAD, {})
+    cache.put(key, {'answer': 'old'})
+    # A bypassed lookup still gets the key so the fresh response replaces the cached one
+    assert cache.lookup('/v1/chat/completions', PAYLOAD, {'X-Cache-Bypass': '1'}) == ('BYPASS', key, None)
+    cache.put(key, {'answer': 'new'})
+    assert cache.lookup('/v1/chat/completions', PAYLOAD, {})[2] == {'answer': 'new'}
+    assert cache.stats()['entries'] == 1
+
+
+def test_expired_entries_miss(app):
+    cache = _cache(app, RESPONSE_CACHE_TTL=0)
+    _, key, _ = cache.lookup('/v1/chat/completions', PAYLOAD, {})
+    cache.put(key, {'answer': 42})
+    assert cache.lookup('/v1/chat/completions', PAYLOAD, {})[0] == 'MISS'
+    assert cache.stats()['expired'] == 1
+
+
+def test_least_recently_used_is_evicted(app):
+    cache = _cache(app, RESPONSE_CACHE_MAX_ENTRIES=2)
+    payloads = []
+    for tokens in (1, 2, 3):
+        payload = dict(PAYLOAD, max_tokens=tokens)
+        _, key, _ = cache.lookup('/v1/chat/completions', payload, {})
+        cache.put(key, {'tokens': tokens})
+        payloads.append(payload)
+        if tokens == 2:
+            # Touch the first entry so the second becomes the oldest
+            assert cache.lookup('/v1/chat/completions', payloads[0], {})[0] == 'HIT'
+    assert cache.lookup('/v1/chat/completions', payloads[0], {})[0] == 'HIT'
+    assert cache.lookup('/v1/chat/completions', payloads[1], {})[0] == 'MISS'
+    assert cache.lookup('/v1/chat/completions', payloads[2], {})[0] == 'HIT'
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget(app):
+    cache = _cache(app, RESPONSE_CACHE_MAX_BYTES=1000)
+    _, key, _ = cache.lookup('/v1/chat/completions', PAYLOAD, {})
+    cache.put(key, {'answer': 'x' * 2000})
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['bytes'] == 0
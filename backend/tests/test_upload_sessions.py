@@ -0,0 +1,113 @@
+import hashlib
+import io
+
+import pytest
+
+from api.helpers.upload_sessions import (
+    UploadRangeError, create_part_file, file_hash, merge_ranges, missing_ranges, parse_content_range, write_chunk
+)
+from api.routes.upload import resumable
+
+
+@pytest.mark.parametrize('ranges, chunk, expected', [
+    ([], (0, 10), [[0, 10]]),
+    ([[0, 10]], (10, 20), [[0, 20]]),
+    ([[0, 10]], (20, 30), [[0, 10], [20, 30]]),
+    ([[20, 30]], (0, 10), [[0, 10], [20, 30]]),
+    ([[0, 10], [20, 30]], (10, 20), [[0, 30]]),
+    ([[0, 10], [20, 30]], (5, 25), [[0, 30]]),
+    ([[0, 30]], (5, 10), [[0, 30]]),
+    ([(0, 10)], (0, 10), [[0, 10]]),
+    (None, (3, 4), [[3, 4]]),
+])
+def test_merge_ranges(ranges, chunk, expected):
+    assert merge_ranges(ranges, *chunk) == expected
+
+
+def test_missing_ranges():
+    assert missing_ranges([], 100) == [[0, 100]]
+    assert missing_ranges([[0, 100]], 100) == []
+    assert missing_ranges([[10, 20], [50, 100]], 100) == [[0, 10], [20, 50]]
+    assert missing_ranges([[0, 20]], 30) == [[20, 30]]
+
+
+def test_parse_content_range():
+    assert parse_content_range('bytes 0-9/100', 100) == (0, 10)
+    assert parse_content_range(' bytes 90-99/* ', 100) == (90, 100)
+    for header in (None, '', 'bytes=0-9', 'bytes 0-9/99', 'bytes 9-8/100', 'bytes 90-100/100'):
+        with pytest.raises(UploadRangeError):
+            parse_content_range(header, 100)
+
+
+def test_chunks_written_out_of_order_hash_like_the_file(tmp_path):
+    data = bytes(range(256)) * 40
+    path = str(tmp_path / 'tmp' / 'upload.part')
+    create_part_file(path, len(data))
+    for start in (8192, 0, 4096):
+        end = min(start + 4096, len(data))
+        assert write_chunk(path, start, end, io.BytesIO(data[start:end])) == end - start
+    assert file_hash(path, len(data)) == hashlib.sha256(data).hexdigest()
+
+
+def test_short_body_reports_bytes_written(tmp_path):
+    path = str(tmp_path / 'upload.part')
+    create_part_file(path, 100)
+    assert write_chunk(path, 0, 50, io.BytesIO(b'x' * 20)) == 20
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    app.config.update(
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        UPLOAD_MAX_SIZE=1024 * 1024,
+        UPLOAD_CHUNK_SIZE=1024,
+        UPLOAD_SESSION_TTL=3600
+    )
+    app.register_blueprint(resumable.bp, url_prefix='/api/uploads')
+    return app
+
+
+def _put(client, upload_id, data, start, end, size):
+    return client.put(
+        f'/api/uploads/{upload_id}', data=data[start:end],
+        headers={'Content-Range': f'bytes {start}-{end - 1}/{size}'}
+    )
+
+
+def test_ranged_upload_resumes_and_completes(uploads, client):
+    data = b'0123456789' * 300
+    size = len(data)
+    upload = client.post('/api/uploads', json={'filename': 'notes.txt', 'size': size, 'user_id': 'u1'}).get_json()
+    upload_id = upload['upload_id']
+    assert upload['missing_ranges'] == [[0, size]]
+
+    assert _put(client, upload_id, data, 2000, size, size).status_code == 200
+    status = _put(client, upload_id, data, 500, 1500, size).get_json()
+    assert status['received_ranges'] == [[500, 1500], [2000, size]]
+    assert status['missing_ranges'] == [[0, 500], [1500, 2000]]
+
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 409
+
+    # Overlapping resends merge rather than double count
+    _put(client, upload_id, data, 0, 1000, size)
+    status = _put(client, upload_id, data, 1000, 2500, size).get_json()
+    assert status['received_ranges'] == [[0, size]]
+    assert status['received_bytes'] == size
+
+    checksum = hashlib.sha256(data).hexdigest()
+    done = client.post(f'/api/uploads/{upload_id}/complete', json={'checksum': checksum.upper()})
+    assert done.status_code == 200
+    body = done.get_json()
+    assert body['checksum'] == checksum
+    assert body['deduplicated'] is False
+    assert client.post(f'/api/uploads/{upload_id}/complete').status_code == 409
+
+
+def test_bad_range_and_checksum(uploads, client):
+    data = b'abc' * 10
+    upload_id = client.post('/api/uploads', json={'filename': 'a.txt', 'size': len(data)}).get_json()['upload_id']
+    assert _put(client, upload_id, data, 0, len(data) + 1, len(data)).status_code == 416
+    assert _put(client, upload_id, data, 0, len(data), len(data)).status_code == 200
+    mismatch = client.post(f'/api/uploads/{upload_id}/complete', json={'checksum': '0' * 64})
+    assert mismatch.status_code == 422
+    assert mismatch.get_json()['checksum'] == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from api.helpers.vector_search import METRICS, as_matrix, normalize_rows, score_matrix, search, top_k
+
+rng = np.random.default_rng(11)
+QUERIES = rng.normal(size=(5, 16)).astype(np.float32)
+CANDIDATES = rng.normal(size=(200, 16)).astype(np.float32)
+
+
+def _reference(query, candidate, metric):
+    """Score one pair the obvious way"""
+    query, candidate = query.astype(np.float64), candidate.astype(np.float64)
+    if metric == 'cosine':
+        return query @ candidate / (np.linalg.norm(query) * np.linalg.norm(candidate))
+    if metric == 'dot_product':
+        return query @ candidate
+    return 1.0 / (1.0 + np.linalg.norm(query - candidate))
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_score_matrix_matches_pairwise_reference(metric):
+    scores = score_matrix(QUERIES, CANDIDATES, metric)
+    expected = np.array([[_reference(q, c, metric) for c in CANDIDATES] for q in QUERIES])
+    assert scores.shape == (5, 200)
+    assert np.allclose(scores, expected, rtol=1e-4, atol=1e-5)
+
+
+def test_euclidean_distance_to_itself_scores_one():
+    assert np.allclose(score_matrix(CANDIDATES[:3], CANDIDATES[:3], 'euclidean').diagonal(), 1.0, atol=1e-3)
+
+
+@pytest.mark.parametrize('k', [1, 7, 199, 200, 500])
+def test_top_k_matches_a_full_sort(k):
+    scores = score_matrix(QUERIES, CANDIDATES)
+    indices, values = top_k(scores, k)
+    expected = np.argsort(-scores, axis=1, kind='stable')[:, :min(k, 200)]
+    assert indices.shape == expected.shape
+    assert (indices == expected).all()
+    assert np.array_equal(values, np.take_along_axis(scores, expected, axis=1))
+
+
+def test_top_k_edge_cases():
+    indices, values = top_k(np.array([3.0, 1.0, 2.0]), 2)
+    assert indices.tolist() == [[0, 2]] and values.tolist() == [[3.0, 2.0]]
+    indices, values = top_k(np.array([[1.0, 2.0]]), 0)
+    assert indices.shape == (1, 0) and indices.dtype == np.int64
+
+
+def test_search_matches_brute_force():
+    results = search(QUERIES[0].tolist(), CANDIDATES, k=3)
+    scored = sorted(((_reference(QUERIES[0], c, 'cosine'), i) for i, c in enumerate(CANDIDATES)), reverse=True)
+    assert [hit['index'] for hit in results[0]] == [i for _, i in scored[:3]]
+    assert [hit['similarity'] for hit in results[0]] == pytest.approx([s for s, _ in scored[:3]], abs=1e-5)
+
+
+def test_inputs_are_validated():
+    with pytest.raises(ValueError, match='Dimension mismatch'):
+        score_matrix(QUERIES, CANDIDATES[:, :8])
+    with pytest.raises(ValueError, match='Unsupported metric'):
+        score_matrix(QUERIES, CANDIDATES, 'manhattan')
+    with pytest.raises(ValueError):
+        as_matrix(np.zeros((2, 2, 2)))
+    assert normalize_rows(np.zeros((1, 3))).tolist() == [[0.0, 0.0, 0.0]]